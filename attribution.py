@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+SPY Momentum Scanner — Signal Attribution
+==========================================
+Joins every logged signal (via the scan history index) to what price did next:
+forward 1/5/10/20-day returns and whether the stop or target_1 was hit first
+within 20 sessions. Outcomes are stored next to the index and summarized by
+signal type, conviction decile, regime and sector.
+
+Returns are signed in the signal's direction, so a bearish signal gains when
+price falls. Several scans on the same day collapse to the last one per
+ticker. If the stop and target are both crossed on the same bar, it counts as
+a stop. NEUTRAL signals have no direction and are skipped.
+
+Each run only processes scans newer than the previous run, plus outcomes that
+were still waiting on future bars.
+
+Usage:
+  python3 attribution.py                       # update + report
+  python3 attribution.py --by signal --by sector
+  python3 attribution.py --rebuild --data-source polygon
+"""
+
+import sys
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import spy_momentum_scanner as scanner
+from spy_momentum_scanner import MARKET_TZ, log
+from backtest import IndicatorPanel
+from scan_history import HistoryStore
+
+HORIZONS = (1, 5, 10, 20)
+GROUPINGS = ("signal", "decile", "regime", "sector")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS outcomes (
+    day TEXT, ticker TEXT, timestamp TEXT, scan_id INTEGER, signal TEXT,
+    direction INTEGER, conviction REAL, regime TEXT, sector TEXT,
+    entry REAL, stop REAL, target REAL,
+    {", ".join(f"ret_{h} REAL" for h in HORIZONS)},
+    exit TEXT, exit_ret REAL, r_multiple REAL, complete INTEGER,
+    PRIMARY KEY (day, ticker)
+);
+CREATE TABLE IF NOT EXISTS attribution_meta (key TEXT PRIMARY KEY, value);
+"""
+
+INPUT_COLUMNS = ["day", "ticker", "timestamp", "scan_id", "signal", "direction", "conviction",
+                 "regime", "sector", "entry", "stop", "target"]
+OUTCOME_COLUMNS = [f"ret_{h}" for h in HORIZONS] + ["exit", "exit_ret", "r_multiple", "complete"]
+
+
+# ─── PENDING SIGNALS ─────────────────────────────────────────────────────────────
+
+def pending_signals(store, rebuild=False):
+    """Signals from scans after the last run plus unresolved outcomes,
+    one row per (day, ticker) → (DataFrame, newest scan id)."""
+    db = store.db
+    db.executescript(SCHEMA)
+    if rebuild:
+        with db:
+            db.execute("DELETE FROM outcomes")
+            db.execute("DELETE FROM attribution_meta")
+    row = db.execute("SELECT value FROM attribution_meta WHERE key = 'last_scan_id'").fetchone()
+    last_id = row[0] if row else 0
+
+    new = pd.read_sql_query(
+        "SELECT s.timestamp, s.scan_id, s.ticker, s.signal, s.signal_strength, s.conviction_score, "
+        "sc.regime, s.sector, s.current_price, s.stop_loss, s.target_1 "
+        "FROM signals s JOIN scans sc ON sc.id = s.scan_id WHERE s.scan_id > ? ORDER BY s.scan_id",
+        db, params=(last_id,))
+    newest = int(new["scan_id"].max()) if len(new) else last_id
+
+    new = new[new["signal_strength"] != 0]
+    stamps = pd.to_datetime(new["timestamp"], utc=True, format="ISO8601").dt.tz_convert(MARKET_TZ)
+    new = pd.DataFrame({
+        # A scan before the close saw the prior session's bar as its last complete one
+        "day": stamps.dt.strftime("%Y-%m-%d"),
+        "after_close": (stamps.dt.hour >= 16).to_numpy(),
+        "ticker": new["ticker"], "timestamp": new["timestamp"], "scan_id": new["scan_id"],
+        "signal": new["signal"], "direction": np.sign(new["signal_strength"]).astype(int),
+        "conviction": new["conviction_score"], "regime": new["regime"], "sector": new["sector"],
+        "entry": new["current_price"], "stop": new["stop_loss"], "target": new["target_1"],
+    })
+
+    waiting = pd.read_sql_query(
+        f"SELECT {', '.join(INPUT_COLUMNS)} FROM outcomes WHERE complete = 0", db)
+    stamps = pd.to_datetime(waiting["timestamp"], utc=True, format="ISO8601").dt.tz_convert(MARKET_TZ)
+    waiting["after_close"] = (stamps.dt.hour >= 16).to_numpy()
+
+    rows = pd.concat([waiting, new], ignore_index=True)
+    rows = rows.drop_duplicates(["day", "ticker"], keep="last").reset_index(drop=True)
+    return rows, newest
+
+
+# ─── OUTCOMES ────────────────────────────────────────────────────────────────────
+
+def compute_outcomes(rows, dates, tickers, high, low, close, today=None):
+    """Vectorized forward returns and stop/target resolution for every row at once.
+
+    `dates`/`tickers`/`high`/`low`/`close` are an aligned panel (IndicatorPanel.align).
+    Rows whose ticker or entry day isn't in the panel are dropped."""
+    col = {t: j for j, t in enumerate(tickers)}
+    j = rows["ticker"].map(col)
+    days = pd.DatetimeIndex(pd.to_datetime(rows["day"]))
+    i = np.where(rows["after_close"], dates.searchsorted(days, "right"),
+                 dates.searchsorted(days, "left")) - 1
+    keep = j.notna().to_numpy() & (i >= 0)
+    if not keep.all():
+        log.warning(f"{int((~keep).sum())} signals have no bars and were skipped")
+    rows = rows[keep].reset_index(drop=True)
+    i, j = i[keep], j[keep].astype(int).to_numpy()
+
+    T = len(dates)
+    entry = rows["entry"].to_numpy(dtype=float)
+    stop = rows["stop"].to_numpy(dtype=float)
+    target = rows["target"].to_numpy(dtype=float)
+    d = rows["direction"].to_numpy(dtype=float)
+
+    out = rows[INPUT_COLUMNS].copy()
+    for h in HORIZONS:
+        k = i + h
+        px = np.where(k < T, close[np.minimum(k, T - 1), j], np.nan)
+        out[f"ret_{h}"] = np.round(d * (px / entry - 1) * 100, 3)
+
+    W = max(HORIZONS)
+    k = i[:, None] + np.arange(1, W + 1)
+    inside = k < T
+    k = np.minimum(k, T - 1)
+    hi = np.where(inside, high[k, j[:, None]], np.nan)
+    lo = np.where(inside, low[k, j[:, None]], np.nan)
+    long = (d > 0)[:, None]
+    stop_hit = np.where(long, lo <= stop[:, None], hi >= stop[:, None])
+    tgt_hit = np.where(long, hi >= target[:, None], lo <= target[:, None])
+    first_stop = np.where(stop_hit.any(1), stop_hit.argmax(1), W)
+    first_tgt = np.where(tgt_hit.any(1), tgt_hit.argmax(1), W)
+
+    today = pd.Timestamp(today or datetime.now(MARKET_TZ).date())
+    last = np.minimum(i + W, T - 1)
+    complete = (i + W < T) & (dates[last] < today)
+    is_stop = (first_stop < W) & (first_stop <= first_tgt)
+    is_tgt = (first_tgt < W) & ~is_stop
+    out["exit"] = np.select([is_stop, is_tgt, complete], ["stop", "target", "time"], "open")
+    exit_ret = np.select(
+        [is_stop, is_tgt, complete],
+        [d * (stop / entry - 1) * 100, d * (target / entry - 1) * 100, out[f"ret_{W}"]], np.nan)
+    out["exit_ret"] = np.round(exit_ret, 3)
+    risk = np.abs(entry - stop)
+    risk = np.where(risk < 0.01, entry * 0.02, risk)
+    out["r_multiple"] = np.round(exit_ret / 100 * entry / risk, 3)
+    out["complete"] = complete.astype(int)
+    return out
+
+
+def save_outcomes(store, outcomes, newest):
+    cols = INPUT_COLUMNS + OUTCOME_COLUMNS
+    values = outcomes[cols].astype(object).where(outcomes[cols].notna(), None).itertuples(index=False)
+    with store.db:
+        store.db.executemany(
+            f"INSERT OR REPLACE INTO outcomes ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            [tuple(v) for v in values])
+        store.db.execute("INSERT OR REPLACE INTO attribution_meta VALUES ('last_scan_id', ?)", (newest,))
+
+
+def load_bars(tickers, first_day, data_source="auto", cache=True):
+    """Daily bars from first_day (minus a buffer) to today, through the bar cache."""
+    if data_source == "polygon" or (data_source == "auto" and scanner.POLYGON_API_KEY):
+        client = scanner.PolygonClient(scanner.POLYGON_API_KEY)
+    else:
+        client = scanner.YahooClient()
+    if cache:
+        client = scanner.CachedClient(client, scanner.BarCache())
+    days = (datetime.now(MARKET_TZ).date() - pd.Timestamp(first_day).date()).days + 10
+    return scanner.fetch_all_bars(client, tickers, days=max(days, 30))
+
+
+def update(store, data_source="auto", cache=True, rebuild=False):
+    """Resolve outcomes for new and still-open signals → number of rows written."""
+    store.sync()
+    rows, newest = pending_signals(store, rebuild)
+    if rows.empty:
+        store.db.execute("INSERT OR REPLACE INTO attribution_meta VALUES ('last_scan_id', ?)", (newest,))
+        store.db.commit()
+        return 0
+    bars = load_bars(sorted(rows["ticker"].unique()), rows["day"].min(), data_source, cache)
+    dates, tickers, _, high, low, close, _ = IndicatorPanel.align(bars)
+    outcomes = compute_outcomes(rows, dates, tickers, high, low, close)
+    save_outcomes(store, outcomes, newest)
+    return len(outcomes)
+
+
+# ─── REPORTING ──────────────────────────────────────────────────────────────────
+
+def load_outcomes(store):
+    store.db.executescript(SCHEMA)
+    df = pd.read_sql_query("SELECT * FROM outcomes", store.db)
+    if len(df):
+        n = min(10, len(df))
+        rank = df["conviction"].rank(method="first")
+        df["decile"] = pd.qcut(rank, n, labels=False) + 1
+    return df
+
+
+def summarize_by(df, by):
+    """Per-group count, mean forward returns, stop/target rates, hit rate and expectancy."""
+    resolved = df[df["exit"] != "open"]
+    g = df.groupby(by)
+    out = pd.DataFrame({"n": g.size()})
+    for h in HORIZONS:
+        out[f"ret_{h}"] = g[f"ret_{h}"].mean()
+    r = resolved.groupby(by)
+    out["resolved"] = r.size()
+    out["target_pct"] = r["exit"].apply(lambda e: (e == "target").mean() * 100)
+    out["stop_pct"] = r["exit"].apply(lambda e: (e == "stop").mean() * 100)
+    # Hit rate: target reached before the stop, among trades that hit either
+    out["hit_rate"] = r["exit"].apply(
+        lambda e: (e == "target").sum() / max(e.isin(["target", "stop"]).sum(), 1) * 100)
+    out["expectancy"] = r["exit_ret"].mean()
+    out["avg_r"] = r["r_multiple"].mean()
+    out = out.fillna({"resolved": 0}).sort_index()
+    if by == "decile":
+        lo, hi = g["conviction"].min(), g["conviction"].max()
+        out.index = [f"D{d} ({lo[d]:.0f}-{hi[d]:.0f})" for d in out.index]
+    return out
+
+
+def format_report(df, groupings=GROUPINGS):
+    L = []
+    L.append("")
+    L.append("█" * 72)
+    resolved = (df["exit"] != "open").sum()
+    L.append(f"  ◈ SIGNAL ATTRIBUTION — {len(df)} signals  |  {resolved} resolved  |  "
+             f"{df['day'].min()} → {df['day'].max()}")
+    L.append("█" * 72)
+    for by in groupings:
+        table = summarize_by(df, by)
+        L.append("")
+        L.append(f"  BY {by.upper()}")
+        L.append("─" * 72)
+        L.append(f"  {'':<16}{'N':>5}" + "".join(f"{f'{h}D':>7}" for h in HORIZONS)
+                 + f"{'TGT':>6}{'STOP':>6}{'HIT':>6}{'EXP':>7}")
+        L.append("  " + "─" * 70)
+        for name, r in table.iterrows():
+            rets = "".join(f"{r[f'ret_{h}']:>+6.1f}%" if r[f"ret_{h}"] == r[f"ret_{h}"] else f"{'—':>7}"
+                           for h in HORIZONS)
+            tail = (f"{r['target_pct']:>5.0f}%{r['stop_pct']:>5.0f}%{r['hit_rate']:>5.0f}%{r['expectancy']:>+6.1f}%"
+                    if r["resolved"] else f"{'—':>6}{'—':>6}{'—':>6}{'—':>7}")
+            L.append(f"  {str(name)[:15]:<16}{int(r['n']):>5}{rets}{tail}")
+    L.append("")
+    L.append("  Returns signed in the signal's direction. HIT = target before stop;")
+    L.append("  EXP = mean return at exit (stop, target or day 20).")
+    L.append("")
+    return "\n".join(L)
+
+
+# ─── MAIN ────────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="SPY Momentum Scanner — Signal Attribution")
+    parser.add_argument("--by", action="append", choices=GROUPINGS,
+                        help="Grouping to report (repeatable; default: all)")
+    parser.add_argument("--data-source", choices=["polygon", "yahoo"], default="auto")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk bar cache")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every outcome from scratch")
+    parser.add_argument("--report-only", action="store_true", help="Skip the update, just report")
+    parser.add_argument("--csv", metavar="FILE", help="Write per-signal outcomes as CSV")
+    args = parser.parse_args()
+
+    store = HistoryStore()
+    if not args.report_only:
+        n = update(store, args.data_source, cache=not args.no_cache, rebuild=args.rebuild)
+        log.info(f"Attribution: {n} signal outcomes updated")
+
+    df = load_outcomes(store)
+    if df.empty:
+        log.error("No outcomes yet — run a scan with --json first.")
+        sys.exit(1)
+    print(format_report(df, args.by or GROUPINGS))
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        log.info(f"Outcomes: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+SPY Momentum Scanner — Backtester
+==================================
+Replays the scanner day by day over years of daily bars: every session it runs
+the real build_signals / determine_regime / generate_orders logic against a
+simulated portfolio, then fills the resulting orders at the next day's open.
+
+Indicators are computed once for the whole history (EMA and Wilder RSI are
+recursive, rolling windows use running sums), so each simulated day only reads
+a row instead of recomputing the 80-bar window. Values therefore use the full
+history as EMA seed rather than the live scan's truncated 80-bar window.
+
+Usage:
+  python3 backtest.py                                  # WATCHLIST, 5 years
+  python3 backtest.py --years 10 --universe sp500.csv  # full universe
+  python3 backtest.py --account 25000 --json backtest.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from dataclasses import dataclass, asdict
+
+import numpy as np
+import pandas as pd
+
+import spy_momentum_scanner as scanner
+from spy_momentum_scanner import (
+    DEFAULT_STRATEGY, SPY_TICKER, WATCHLIST,
+    NumpyEncoder, RiskModel, build_signals, determine_regime, generate_orders, ewm_matrix, log,
+    trend_vote, week_keys,
+)
+
+
+@dataclass
+class Trade:
+    ticker: str
+    signal: str           # entry signal
+    entry_date: str
+    entry_price: float
+    exit_date: str
+    exit_price: float
+    shares: float
+    pnl: float
+    return_pct: float
+    exit_reason: str      # order action that closed it (SELL/EXIT, TAKE PROFIT, END)
+
+
+# ─── INDICATOR PANEL ────────────────────────────────────────────────────────────
+
+class IndicatorPanel:
+    """Every indicator analyze_stock uses, for every (day, ticker), computed once.
+
+    Inputs are date-aligned dates × tickers arrays (NaN before a ticker has data).
+    Only the strategy's EMA and RSI periods affect the panel; the other
+    StrategyConfig fields apply in build_signals/generate_orders.
+    """
+
+    def __init__(self, dates, tickers, open_, high, low, close, volume, strategy=DEFAULT_STRATEGY):
+        self.dates = dates
+        self.tickers = list(tickers)
+        self.strategy = strategy
+        self.open, self.high, self.low, self.close = open_, high, low, close
+
+        self.ema8 = ewm_matrix(close, (strategy.ema_fast - 1) / 2)
+        self.ema21 = ewm_matrix(close, (strategy.ema_mid - 1) / 2)
+        self.ema50 = ewm_matrix(close, (strategy.ema_slow - 1) / 2)
+
+        started = ~np.isnan(close)
+        self.bars_seen = np.cumsum(started, axis=0)
+        delta = np.vstack([np.full((1, close.shape[1]), np.nan), np.diff(close, axis=0)])
+        gain = np.where(started, np.where(delta > 0, delta, 0.0), np.nan)
+        loss = np.where(started, np.where(delta < 0, -delta, 0.0), np.nan)
+        rsi_com = (1 - 1.0 / strategy.rsi_period) / (1.0 / strategy.rsi_period)
+        avg_gain, avg_loss = ewm_matrix(gain, rsi_com), ewm_matrix(loss, rsi_com)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rsi = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+        self.rsi = np.where(np.isnan(rsi) | (self.bars_seen < strategy.rsi_period), 50.0, rsi)
+
+        vol = pd.DataFrame(volume)
+        recent = vol.rolling(5, min_periods=1).mean().to_numpy()
+        avg = vol.rolling(20, min_periods=1).mean().to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.vol_ratio = np.where(avg > 0, recent / avg, 1.0)
+
+        self.resistance = pd.DataFrame(high).rolling(20, min_periods=1).max().to_numpy()
+        self.support = pd.DataFrame(low).rolling(20, min_periods=1).min().to_numpy()
+
+        def change(n):
+            prev = np.full_like(close, np.nan)
+            prev[n:] = close[:-n]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(self.bars_seen > n, (close - prev) / prev * 100, 0.0)
+
+        self.change_1d, self.change_5d, self.change_20d = change(1), change(5), change(20)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.returns = np.diff(np.log(close), axis=0, prepend=np.nan)  # row i: log return into day i
+        self.mtf = self._weekly_vote(close, strategy)
+
+    def _weekly_vote(self, close, strategy):
+        """The scan's weekly vote (mtf_alignment) for every (day, ticker).
+
+        On day i the weekly series is the completed weeks plus the week so far,
+        closing at day i. Weekly EMAs and RSI averages are computed once over the
+        completed weeks; each day takes one more step from the previous week's
+        values with its own close.
+        """
+        keys = week_keys(self.dates)
+        new_week = np.append(True, keys[1:] != keys[:-1])
+        week = np.cumsum(new_week) - 1                 # week number of each day
+        weekly = close[np.append(new_week[1:], True)]  # each week's last close
+        prev = week - 1                                # completed week before day i (-1: none)
+        before = np.vstack([np.full((1, close.shape[1]), np.nan), weekly])[prev + 1]
+
+        def step(com, values, cur):
+            """ewm(adjust=False) advanced one step from the previous week."""
+            last = np.vstack([np.full((1, values.shape[1]), np.nan), ewm_matrix(values, com)])[prev + 1]
+            alpha = 1.0 / (1.0 + com)
+            with np.errstate(invalid="ignore"):
+                upd = ((1.0 - alpha) * last + alpha * cur) / ((1.0 - alpha) + alpha)
+                return np.where(np.isnan(last), cur, np.where(last != cur, upd, last))
+
+        e_fast = step((strategy.ema_fast - 1) / 2, weekly, close)
+        e_mid = step((strategy.ema_mid - 1) / 2, weekly, close)
+        e_slow = step((strategy.ema_slow - 1) / 2, weekly, close)
+
+        # Wilder RSI, same gain/loss construction as wilder_rsi
+        started = ~np.isnan(weekly)
+        delta = np.vstack([np.full((1, weekly.shape[1]), np.nan), np.diff(weekly, axis=0)])
+        gain = np.where(started, np.where(delta > 0, delta, 0.0), np.nan)
+        loss = np.where(started, np.where(delta < 0, -delta, 0.0), np.nan)
+        today = close - before
+        today_started = ~np.isnan(close)
+        today_gain = np.where(today_started, np.where(today > 0, today, 0.0), np.nan)
+        today_loss = np.where(today_started, np.where(today < 0, -today, 0.0), np.nan)
+        rsi_com = (1 - 1.0 / strategy.rsi_period) / (1.0 / strategy.rsi_period)
+        avg_gain, avg_loss = step(rsi_com, gain, today_gain), step(rsi_com, loss, today_loss)
+        seen = np.vstack([np.zeros((1, weekly.shape[1])), np.cumsum(started, axis=0)])[prev + 1]
+        bars = seen + today_started
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rsi = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+        rsi = np.where(np.isnan(rsi) | (bars < strategy.rsi_period), 50.0, rsi)
+        return np.nan_to_num(trend_vote(e_fast, e_mid, e_slow, rsi, bars), nan=0.0)
+
+    @staticmethod
+    def align(bars):
+        """Align {ticker: OHLCV DataFrame} on trading date →
+        (dates, tickers, open, high, low, close, volume) arrays."""
+        bars = {t: df for t, df in bars.items() if not df.empty}
+        days = {t: pd.DatetimeIndex(df["date"]).normalize() for t, df in bars.items()}
+        cols = {}
+        for field in ("open", "high", "low", "close", "volume"):
+            cols[field] = pd.DataFrame({
+                t: pd.Series(df[field].to_numpy(dtype=float), index=days[t])
+                for t, df in bars.items()
+            }).sort_index()
+        # Hold prices through gaps inside a ticker's history (halts, bad rows),
+        # but leave NaN before it lists and after it stops trading
+        raw = cols["close"]
+        close = raw.ffill().where(raw.bfill().notna())
+        return (
+            close.index, list(close.columns),
+            cols["open"].fillna(close).to_numpy(), cols["high"].fillna(close).to_numpy(),
+            cols["low"].fillna(close).to_numpy(), close.to_numpy(), cols["volume"].to_numpy(),
+        )
+
+    @classmethod
+    def from_frames(cls, bars, strategy=DEFAULT_STRATEGY):
+        return cls(*cls.align(bars), strategy=strategy)
+
+    def signals_at(self, i, stocks, account_size):
+        """SignalTable for day i — build_signals on that day's indicator row."""
+        cols = np.fromiter((j for j, _ in stocks), dtype=np.intp, count=len(stocks))
+        keep = (self.bars_seen[i, cols] >= self.strategy.ema_slow + 5) & ~np.isnan(self.close[i, cols])
+        cols = cols[keep]
+        return build_signals(
+            [stock for (_, stock), kept in zip(stocks, keep) if kept], account_size,
+            *(getattr(self, name)[i, cols] for name in (
+                "close", "ema8", "ema21", "ema50", "rsi", "vol_ratio",
+                "change_1d", "change_5d", "change_20d", "support", "resistance")),
+            self.strategy, self.mtf[i, cols],
+        )
+
+
+# ─── SIMULATION ─────────────────────────────────────────────────────────────────
+
+class Backtest:
+    def __init__(self, panel, stocks, starting_cash):
+        self.panel = panel
+        index = {t: j for j, t in enumerate(panel.tickers)}
+        self.stocks = [(index[s["ticker"]], s) for s in stocks if s["ticker"] in index]
+        self.spy = [(index[SPY_TICKER], {"ticker": SPY_TICKER, "name": "S&P 500",
+                                         "weight": 100, "sector": "Index"})] if SPY_TICKER in index else []
+        self.col = index
+        # Last known close, for marking/closing tickers that stopped trading
+        self.mark_px = pd.DataFrame(panel.close).ffill().to_numpy()
+        # One returns matrix for the whole run; each day reads the window ending at it
+        self.risk = RiskModel(panel.tickers, panel.returns)
+        self.starting_cash = starting_cash
+        self.cash = float(starting_cash)
+        self.positions = {}   # generate_orders / load_positions format, plus "signal"
+        self.trades = []
+        self.equity = []
+
+    def _fill_price(self, ticker, i):
+        j = self.col[ticker]
+        px = self.panel.open[i, j]
+        return px if px == px else self.mark_px[i - 1, j]
+
+    def _mark(self, i):
+        return self.cash + sum(
+            p["shares"] * self.mark_px[i, self.col[t]] for t, p in self.positions.items())
+
+    def _close(self, ticker, shares, price, date, reason):
+        pos = self.positions[ticker]
+        shares = min(shares, pos["shares"])
+        self.cash += shares * price
+        pnl = (price - pos["entry_price"]) * shares
+        self.trades.append(Trade(
+            ticker=ticker, signal=pos["signal"], entry_date=pos["entry_date"],
+            entry_price=round(pos["entry_price"], 2), exit_date=date,
+            exit_price=round(price, 2), shares=round(shares, 4), pnl=round(pnl, 2),
+            return_pct=round((price / pos["entry_price"] - 1) * 100, 2), exit_reason=reason,
+        ))
+        pos["shares"] -= shares
+        if pos["shares"] <= 1e-9:
+            del self.positions[ticker]
+
+    def run(self, start=0, stop=None):
+        """Simulate days [start, stop) — earlier bars still warm up the indicators."""
+        panel = self.panel
+        start = max(start, panel.strategy.ema_slow + 5)
+        last = min(stop or len(panel.dates), len(panel.dates)) - 1
+        for i in range(start, last):
+            equity = self._mark(i)
+            self.equity.append((panel.dates[i], equity))
+            account = max(1, int(equity))
+
+            signals = panel.signals_at(i, self.stocks, account)
+            if not signals:
+                continue
+            spy_sig = next(iter(panel.signals_at(i, self.spy, account)), None)
+            regime = determine_regime(signals, spy_sig)
+            buys, sells, manage = generate_orders(signals, regime, account, positions=self.positions,
+                                                  strategy=panel.strategy, risk=self.risk.as_of(i))
+
+            # Orders come off day i's close; fill them at day i+1's open
+            fill_date = panel.dates[i + 1].strftime("%Y-%m-%d")
+            for o in sells:
+                self._close(o.ticker, self.positions[o.ticker]["shares"],
+                            self._fill_price(o.ticker, i + 1), fill_date, o.action)
+            for o in manage:
+                pos = self.positions[o.ticker]
+                if o.action.startswith("TAKE PROFIT"):
+                    self._close(o.ticker, o.shares, self._fill_price(o.ticker, i + 1),
+                                fill_date, "TAKE PROFIT")
+                    if o.ticker in self.positions:
+                        pos["stop_loss"], pos["target"] = o.stop_loss, o.target
+                elif o.action == "TIGHTEN STOP":
+                    pos["stop_loss"] = o.stop_loss
+            for o in buys:
+                price = self._fill_price(o.ticker, i + 1)
+                dollars = min(o.dollar_amount, self.cash)
+                if dollars < 1 or not price > 0:
+                    continue
+                shares = dollars / price
+                self.cash -= dollars
+                self.positions[o.ticker] = {
+                    "entry_price": price, "shares": shares, "stop_loss": o.stop_loss,
+                    "target": o.target, "direction": "LONG", "dollar_amount": dollars,
+                    "entry_date": fill_date, "signal": o.signal,
+                }
+
+        end_date = panel.dates[last].strftime("%Y-%m-%d")
+        for t in list(self.positions):
+            self._close(t, self.positions[t]["shares"], self.mark_px[last, self.col[t]], end_date, "END")
+        self.equity.append((panel.dates[last], self.cash))
+        return self
+
+
+# ─── REPORTING ──────────────────────────────────────────────────────────────────
+
+def summarize(bt):
+    dates = [d for d, _ in bt.equity]
+    curve = np.array([e for _, e in bt.equity])
+    years = max((dates[-1] - dates[0]).days / 365.25, 1 / 365.25) if dates else 1
+    final = curve[-1] if len(curve) else bt.starting_cash
+    peak = np.maximum.accumulate(curve) if len(curve) else np.array([1.0])
+    pnls = np.array([t.pnl for t in bt.trades])
+    daily = np.diff(curve) / curve[:-1] if len(curve) > 1 else np.array([0.0])
+    sharpe = float(daily.mean() / daily.std() * np.sqrt(252)) if daily.std() > 0 else 0.0
+
+    by_signal = {}
+    for t in bt.trades:
+        d = by_signal.setdefault(t.signal, {"trades": 0, "wins": 0, "pnl": 0.0, "returns": []})
+        d["trades"] += 1
+        d["wins"] += t.pnl > 0
+        d["pnl"] += t.pnl
+        d["returns"].append(t.return_pct)
+
+    return {
+        "start": dates[0].strftime("%Y-%m-%d") if dates else None,
+        "end": dates[-1].strftime("%Y-%m-%d") if dates else None,
+        "starting_cash": bt.starting_cash,
+        "final_equity": round(float(final), 2),
+        "total_return_pct": round((final / bt.starting_cash - 1) * 100, 2),
+        "cagr_pct": round(((final / bt.starting_cash) ** (1 / years) - 1) * 100, 2),
+        "max_drawdown_pct": round(float(((curve - peak) / peak).min()) * 100, 2) if len(curve) else 0.0,
+        "sharpe": round(sharpe, 2),
+        "trades": len(bt.trades),
+        "win_rate_pct": round(float((pnls > 0).mean()) * 100, 1) if len(pnls) else 0.0,
+        "by_signal": {
+            sig: {
+                "trades": d["trades"],
+                "win_rate_pct": round(d["wins"] / d["trades"] * 100, 1),
+                "avg_return_pct": round(sum(d["returns"]) / d["trades"], 2),
+                "pnl": round(d["pnl"], 2),
+            }
+            for sig, d in sorted(by_signal.items(), key=lambda x: -x[1]["pnl"])
+        },
+    }
+
+
+def format_report(summary, elapsed, n_tickers):
+    L = []
+    L.append("")
+    L.append("█" * 72)
+    L.append(f"  ◈ BACKTEST — {summary['start']} → {summary['end']}  |  {n_tickers} tickers")
+    L.append("█" * 72)
+    L.append("")
+    L.append(f"  Start:        ${summary['starting_cash']:,.2f}")
+    L.append(f"  End:          ${summary['final_equity']:,.2f}  ({summary['total_return_pct']:+.1f}%)")
+    L.append(f"  CAGR:         {summary['cagr_pct']:+.2f}%")
+    L.append(f"  Max drawdown: {summary['max_drawdown_pct']:.2f}%")
+    L.append(f"  Sharpe:       {summary['sharpe']:.2f}")
+    L.append(f"  Trades:       {summary['trades']}  |  Win rate: {summary['win_rate_pct']:.1f}%")
+    L.append("")
+    L.append("─" * 72)
+    L.append("  BY ENTRY SIGNAL")
+    L.append("─" * 72)
+    L.append(f"  {'SIGNAL':<16}{'TRADES':>8}{'WIN%':>8}{'AVG RET':>10}{'P&L':>14}")
+    L.append("  " + "─" * 56)
+    for sig, d in summary["by_signal"].items():
+        L.append(f"  {sig:<16}{d['trades']:>8}{d['win_rate_pct']:>7.1f}%"
+                 f"{d['avg_return_pct']:>+9.2f}%  ${d['pnl']:>11,.2f}")
+    L.append("")
+    L.append(f"  Simulated in {elapsed:.1f}s")
+    L.append("")
+    return "\n".join(L)
+
+
+# ─── MAIN ────────────────────────────────────────────────────────────────────────
+
+def load_history(stocks, years, data_source="auto", cache=True):
+    """Daily bars for the universe plus SPY over `years`, through the bar cache."""
+    if data_source == "polygon" or (data_source == "auto" and scanner.POLYGON_API_KEY):
+        client = scanner.PolygonClient(scanner.POLYGON_API_KEY)
+    else:
+        client = scanner.YahooClient()
+    if cache:
+        client = scanner.CachedClient(client, scanner.BarCache())
+    tickers = [s["ticker"] for s in stocks if s["ticker"] != SPY_TICKER] + [SPY_TICKER]
+    return scanner.fetch_all_bars(client, tickers, days=int(years * 365))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SPY Momentum Scanner — Backtester")
+    parser.add_argument("--years", type=float, default=5, help="Years of history (default: 5)")
+    parser.add_argument("--account", type=int, default=scanner.ACCOUNT_SIZE,
+                        help=f"Starting cash (default: ${scanner.ACCOUNT_SIZE:,})")
+    parser.add_argument("--universe", metavar="FILE", help="Constituents CSV/JSON (default: WATCHLIST)")
+    parser.add_argument("--data-source", choices=["polygon", "yahoo"], default="auto")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk bar cache")
+    parser.add_argument("--json", metavar="FILE", help="Write summary, trades and equity curve as JSON")
+    args = parser.parse_args()
+
+    if args.account <= 0:
+        parser.error("--account must be a positive integer")
+    if args.years <= 0:
+        parser.error("--years must be positive")
+
+    stocks = scanner.load_universe(args.universe) if args.universe else WATCHLIST
+    if args.data_source == "polygon" and not scanner.POLYGON_API_KEY:
+        parser.error("No POLYGON_API_KEY. Use --data-source yahoo or add to .env")
+    bars = load_history(stocks, args.years, args.data_source, cache=not args.no_cache)
+
+    t0 = time.perf_counter()
+    panel = IndicatorPanel.from_frames(bars)
+    if not len(panel.dates):
+        log.error("No data. Check API.")
+        sys.exit(1)
+    bt = Backtest(panel, stocks, args.account).run()
+    summary = summarize(bt)
+    elapsed = time.perf_counter() - t0
+
+    print(format_report(summary, elapsed, len(bt.stocks)))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "summary": summary,
+                "trades": [asdict(t) for t in bt.trades],
+                "equity": [[d.strftime("%Y-%m-%d"), round(e, 2)] for d, e in bt.equity],
+            }, f, indent=2, cls=NumpyEncoder)
+        log.info(f"Backtest: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+SPY Momentum Scanner — Benchmarks
+==================================
+Times the engine's hot paths on synthetic OHLCV so regressions show up before
+they reach the morning cron. No network: bars come from a seeded random walk,
+and the fetch pipeline runs against an in-memory stub provider.
+
+Each case runs at every size in the matrix (tickers × bars per ticker). Cases
+that only see signals (regime, orders, formatting, JSON writes) run once per
+ticker count. Every case reports:
+
+  time       best of several runs
+  tickers/s  throughput at that time
+  peak MB    tracemalloc peak during one extra run
+  blocks     memory blocks still allocated afterwards (net allocations)
+
+A cold-start check times `import spy_momentum_scanner` in a fresh interpreter
+against IMPORT_BUDGET and fails if it loads numpy, pandas or requests.
+
+Results are compared with benchmark_baseline.json. A case more than
+--tolerance slower, or using that much more peak memory, is flagged, and the
+exit status is 1. Record a new baseline on the machine you compare against;
+the default 50% tolerance absorbs the run-to-run noise of a busy machine.
+
+A change that makes a case slower on purpose doesn't re-record the baseline.
+It adds the case to the baseline's "accepted" section with the new time and
+the reason. That case is then compared with the accepted time, and the
+report lists every accepted slowdown.
+
+Usage:
+  python3 benchmark.py                      # 15/500 tickers × 80 bars/10 years
+  python3 benchmark.py --quick              # 80 bars only
+  python3 benchmark.py --full               # adds 5,000 tickers (needs ~2 GB)
+  python3 benchmark.py --case analyze --tickers 500 --bars 80,2520
+  python3 benchmark.py --case cold_start  # import-time budget only
+  python3 benchmark.py --save-baseline
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import spy_momentum_scanner as scanner
+from spy_momentum_scanner import (
+    SPY_INFO, SPY_TICKER, RiskModel, analyze_stock, analyze_universe, calc_ema, calc_rsi,
+    determine_regime, fetch_all_bars, format_order_book, generate_orders,
+    save_scan_log, write_latest_scan, log,
+)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(SCRIPT_DIR, "benchmark_baseline.json")
+
+IMPORT_BUDGET = 0.15       # seconds for `import spy_momentum_scanner`, interpreter start-up excluded
+HEAVY_MODULES = ("numpy", "pandas", "requests")   # must not load until a scan needs them
+
+TICKERS = (15, 500)
+FULL_TICKERS = (15, 500, 5000)
+BARS = (80, 2520)          # one scan window, ten years
+ACCOUNT = 25000
+SECTORS = ("Tech", "Consumer", "Finance", "Health", "Energy", "Industrial")
+
+
+# ─── SYNTHETIC DATA ─────────────────────────────────────────────────────────────
+
+def synthetic_bars(n_tickers, n_bars, seed=0):
+    """{ticker: OHLCV DataFrame} for n_tickers plus SPY, shaped like the
+    clients' output. Each ticker is a geometric random walk with its own drift
+    and volatility, so the universe produces a mix of signals."""
+    rng = np.random.default_rng(seed)
+    n = n_tickers + 1
+    dates = pd.bdate_range(end="2026-01-02", periods=n_bars)
+    drift = rng.normal(0.0004, 0.0015, n)
+    vol = rng.uniform(0.008, 0.03, n)
+    returns = rng.normal(drift, vol, (n_bars, n))
+    close = (20 + 300 * rng.random(n)) * np.exp(np.cumsum(returns, axis=0))
+    open_ = close * (1 + rng.normal(0, 0.004, close.shape))
+    spread = np.abs(rng.normal(0, 0.008, close.shape)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.lognormal(15, 0.6, close.shape).round()
+    tickers = [f"S{j:04d}" for j in range(n_tickers)] + [SPY_TICKER]
+    return {
+        t: pd.DataFrame({"date": dates, "open": open_[:, j], "high": high[:, j], "low": low[:, j],
+                         "close": close[:, j], "volume": volume[:, j]})
+        for j, t in enumerate(tickers)
+    }
+
+
+def synthetic_stocks(bars):
+    return [{"ticker": t, "name": t, "weight": round(1 + j % 7 * 0.5, 2), "sector": SECTORS[j % len(SECTORS)]}
+            for j, t in enumerate(bars) if t != SPY_TICKER]
+
+
+class StubClient:
+    """In-memory provider: serves synthetic bars through the real fetch pipeline."""
+    PROVIDER = "synthetic"
+    MAX_WORKERS = 8
+
+    def __init__(self, bars):
+        self.bars = bars
+
+    def get_daily_bars(self, ticker, days=scanner.LOOKBACK_DAYS, start=None):
+        return self.bars[ticker].tail(days).reset_index(drop=True)
+
+    def rate_limit_pause(self):
+        pass
+
+
+class Fixture:
+    """Inputs for every case at one size, built once and shared."""
+
+    def __init__(self, n_tickers, n_bars, tmpdir):
+        self.n_tickers, self.n_bars = n_tickers, n_bars
+        self.bars = synthetic_bars(n_tickers, n_bars)
+        self.stocks = synthetic_stocks(self.bars)
+        self.closes = [self.bars[s["ticker"]]["close"] for s in self.stocks]
+        self.signals = analyze_universe(self.bars, self.stocks, ACCOUNT)
+        self.spy = next(iter(analyze_universe(self.bars, [SPY_INFO], ACCOUNT)), None)
+        self.regime = determine_regime(self.signals, self.spy)
+        # A few open positions so the sell/manage branches run too
+        self.positions = {
+            s.ticker: {"entry_price": s.current_price * 0.95, "shares": 10, "stop_loss": s.stop_loss,
+                       "target": s.target_1, "direction": "LONG", "dollar_amount": s.current_price * 9.5,
+                       "entry_date": "2025-12-01"}
+            for s in self.signals[:5]
+        }
+        self.orders = generate_orders(self.signals, self.regime, ACCOUNT, self.positions)
+        self.risk = RiskModel.from_bars(self.bars)
+        self.tmpdir = tmpdir
+
+
+# ─── CASES ──────────────────────────────────────────────────────────────────────
+
+def _calc_ema(fx):
+    for close in fx.closes:
+        calc_ema(close, 21)
+
+
+def _calc_rsi(fx):
+    for close in fx.closes:
+        calc_rsi(close)
+
+
+def _analyze_stock(fx):
+    for stock in fx.stocks:
+        analyze_stock(fx.bars[stock["ticker"]], stock, ACCOUNT)
+
+
+def _analyze_universe(fx):
+    analyze_universe(fx.bars, fx.stocks, ACCOUNT)
+
+
+def _pipeline(fx):
+    client = StubClient(fx.bars)
+    bars = fetch_all_bars(client, [s["ticker"] for s in fx.stocks] + [SPY_TICKER], days=fx.n_bars)
+    analyze_universe(bars, fx.stocks, ACCOUNT)
+
+
+def _determine_regime(fx):
+    determine_regime(fx.signals, fx.spy)
+
+
+def _generate_orders(fx):
+    generate_orders(fx.signals, fx.regime, ACCOUNT, fx.positions)
+
+
+def _risk_model(fx):
+    RiskModel.from_bars(fx.bars)
+
+
+def _allocate(fx):
+    generate_orders(fx.signals, fx.regime, ACCOUNT, fx.positions, risk=fx.risk)
+
+
+def _format_order_book(fx):
+    format_order_book(*fx.orders, fx.signals, fx.regime, ACCOUNT)
+
+
+def _save_scan_log(fx):
+    save_scan_log(fx.signals, fx.regime, *fx.orders, output_dir=fx.tmpdir)
+
+
+def _write_latest_scan(fx):
+    write_latest_scan(fx.signals, fx.regime, *fx.orders)
+
+
+# name → (function, scales with bars per ticker)
+CASES = {
+    "calc_ema":          (_calc_ema, True),
+    "calc_rsi":          (_calc_rsi, True),
+    "analyze_stock":     (_analyze_stock, True),
+    "analyze_universe":  (_analyze_universe, True),
+    "fetch+analyze":     (_pipeline, True),
+    "determine_regime":  (_determine_regime, False),
+    "generate_orders":   (_generate_orders, False),
+    "risk_model":        (_risk_model, False),
+    "allocate":          (_allocate, False),
+    "format_order_book": (_format_order_book, False),
+    "save_scan_log":     (_save_scan_log, False),
+    "write_latest_scan": (_write_latest_scan, False),
+}
+
+
+# ─── MEASUREMENT ────────────────────────────────────────────────────────────────
+
+def measure(fn, fx, min_runs=5, min_time=1.0, max_runs=50):
+    """Best wall time over at least min_runs runs (more, up to max_runs, until
+    min_time has been spent), then one traced run for peak memory and net
+    allocated blocks."""
+    best, spent, runs = float("inf"), 0.0, 0
+    while runs < max_runs and (runs < min_runs or spent < min_time):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(fx)
+        elapsed = time.perf_counter() - t0
+        best, spent, runs = min(best, elapsed), spent + elapsed, runs + 1
+
+    gc.collect()
+    blocks0 = sys.getallocatedblocks()
+    tracemalloc.start()
+    fn(fx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    return {"seconds": best, "runs": runs, "peak_mb": peak / 1e6,
+            "blocks": sys.getallocatedblocks() - blocks0}
+
+
+def run(cases, tickers, bars):
+    """{"case tickersxbars": result} over the matrix."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # write_latest_scan writes under SCRIPT_DIR/frontend/data — keep it out of the repo
+        scanner.SCRIPT_DIR = tmpdir
+        for n_tickers in tickers:
+            for i, n_bars in enumerate(sorted(bars)):
+                t0 = time.perf_counter()
+                fx = Fixture(n_tickers, n_bars, tmpdir)
+                print(f"  {n_tickers:,} tickers × {n_bars:,} bars "
+                      f"(data built in {time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+                for name in cases:
+                    fn, per_bar = CASES[name]
+                    if not per_bar and i > 0:
+                        continue
+                    result = measure(fn, fx)
+                    result["tickers_per_sec"] = n_tickers / result["seconds"]
+                    size = f"{n_tickers}x{n_bars}" if per_bar else f"{n_tickers}"
+                    results[f"{name} {size}"] = result
+                del fx
+                gc.collect()
+    return results
+
+
+# ─── COLD START ─────────────────────────────────────────────────────────────────
+
+def _best_wall(cmd, runs):
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=SCRIPT_DIR, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def cold_start(runs=5):
+    """Fresh-interpreter timings: the scanner import on its own (against
+    IMPORT_BUDGET), which heavy modules it loaded, and a whole --show-last."""
+    probe = ("import sys, time; t0 = time.perf_counter(); import spy_momentum_scanner; "
+             "print(time.perf_counter() - t0); print(*[m for m in %r if m in sys.modules])" % (HEAVY_MODULES,))
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", probe], cwd=SCRIPT_DIR, capture_output=True,
+                             text=True, check=True).stdout.split("\n")
+        timings.append(float(out[0]))
+    result = {
+        "interpreter": _best_wall([sys.executable, "-c", "pass"], runs),
+        "import": min(timings),
+        "heavy": out[1].split(),
+    }
+    if os.path.exists(os.path.join(SCRIPT_DIR, "frontend", "data", "latest-scan.json")):
+        result["show_last"] = _best_wall([sys.executable, "spy_momentum_scanner.py", "--show-last"], runs)
+    return result
+
+
+def format_cold_start(result):
+    over = result["import"] > IMPORT_BUDGET or result["heavy"]
+    L = []
+    L.append(f"  COLD START   import {result['import'] * 1000:.0f}ms (budget {IMPORT_BUDGET * 1000:.0f}ms)"
+             + (f"   --show-last {result['show_last'] * 1000:.0f}ms" if "show_last" in result else "")
+             + f"   bare interpreter {result['interpreter'] * 1000:.0f}ms")
+    L.append(f"               heavy modules loaded by import: {', '.join(result['heavy']) or 'none'}"
+             + ("  ✗ over budget" if over else ""))
+    L.append("")
+    return "\n".join(L), bool(over)
+
+
+# ─── BASELINE ───────────────────────────────────────────────────────────────────
+
+def machine():
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "platform": platform.platform(), "cpu": platform.processor() or platform.machine(),
+            "cores": os.cpu_count()}
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    data = {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"), "machine": machine(),
+            "results": {k: {m: round(v, 6) if isinstance(v, float) else v for m, v in r.items()}
+                        for k, r in results.items()}}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def regressions(result, base, tolerance):
+    """Which of time/memory got worse than base by more than tolerance. Tiny
+    absolute differences (timer and allocator noise) never count."""
+    worse = []
+    if result["seconds"] > base["seconds"] * (1 + tolerance) and result["seconds"] - base["seconds"] > 0.002:
+        worse.append("time")
+    if result["peak_mb"] > base["peak_mb"] * (1 + tolerance) and result["peak_mb"] - base["peak_mb"] > 1:
+        worse.append("memory")
+    return worse
+
+
+def format_results(results, baseline=None, tolerance=0.5):
+    accepted = (baseline or {}).get("accepted", {})
+    base = {k: {**r, **accepted.get(k, {})} for k, r in (baseline or {}).get("results", {}).items()}
+    L = []
+    L.append("")
+    L.append("═" * 92)
+    L.append("  BENCHMARKS")
+    if baseline:
+        L.append(f"  vs baseline {baseline.get('created', '?')} "
+                 f"(python {baseline.get('machine', {}).get('python', '?')}, "
+                 f"pandas {baseline.get('machine', {}).get('pandas', '?')}), tolerance {tolerance:.0%}")
+    L.append("═" * 92)
+    L.append(f"  {'CASE':<20}{'SIZE':<12}{'TIME':>10}{'TICKERS/S':>13}{'PEAK MB':>10}{'BLOCKS':>10}{'VS BASE':>10}")
+    L.append("  " + "─" * 90)
+    flagged = []
+    for key, r in results.items():
+        name, size = key.split(" ")
+        seconds = r["seconds"]
+        shown = f"{seconds * 1000:.1f}ms" if seconds < 1 else f"{seconds:.2f}s"
+        line = (f"  {name:<20}{size.replace('x', '×'):<12}{shown:>10}{r['tickers_per_sec']:>13,.0f}"
+                f"{r['peak_mb']:>10.1f}{r['blocks']:>+10,}")
+        if key in base:
+            line += f"{base[key]['seconds'] / seconds:>9.2f}×"
+            worse = regressions(r, base[key], tolerance)
+            if worse:
+                line += "  ✗ " + "/".join(worse)
+                flagged.append(key)
+            elif key in accepted:
+                line += "  (accepted)"
+        L.append(line)
+    L.append("")
+    shown = [k for k in accepted if k in results]
+    if shown:
+        L.append("  Accepted slowdowns (compared with the accepted time, not the original):")
+        L.extend(f"    {k}: {accepted[k]['reason']}" for k in shown)
+        L.append("")
+    if baseline:
+        L.append(f"  {len(flagged)} regression(s)" + (": " + ", ".join(flagged) if flagged else ""))
+        L.append("")
+    return "\n".join(L), flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SPY Momentum Scanner — Benchmarks")
+    parser.add_argument("--case", action="append", metavar="NAME",
+                        help=f"Run only cases containing NAME (repeatable): {', '.join(CASES)}, cold_start")
+    parser.add_argument("--tickers", help=f"Comma-separated ticker counts (default: {','.join(map(str, TICKERS))})")
+    parser.add_argument("--bars", help=f"Comma-separated bars per ticker (default: {','.join(map(str, BARS))})")
+    parser.add_argument("--quick", action="store_true", help=f"Only {BARS[0]} bars per ticker")
+    parser.add_argument("--full", action="store_true", help="Include 5,000 tickers")
+    parser.add_argument("--baseline", default=BASELINE_FILE, metavar="FILE", help="Baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed slowdown / memory growth before flagging (default: 0.5)")
+    parser.add_argument("--json", metavar="FILE", help="Also write raw results to FILE")
+    args = parser.parse_args()
+
+    try:
+        tickers = [int(x) for x in args.tickers.split(",")] if args.tickers else \
+            list(FULL_TICKERS if args.full else TICKERS)
+        bars = [int(x) for x in args.bars.split(",")] if args.bars else \
+            list(BARS[:1] if args.quick else BARS)
+    except ValueError:
+        parser.error("--tickers/--bars take comma-separated integers")
+    if min(bars) < scanner.EMA_SLOW + 5:
+        parser.error(f"--bars must be at least {scanner.EMA_SLOW + 5} for signals to be produced")
+    cases = [name for name in CASES if not args.case or any(c in name for c in args.case)]
+    cold = not args.case or any(c in "cold_start" for c in args.case)
+    if not cases and not cold:
+        parser.error(f"--case matched nothing; cases: {', '.join(CASES)}, cold_start")
+
+    log.setLevel(logging.WARNING)
+    results = run(cases, tickers, bars) if cases else {}
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    report, flagged = format_results(results, baseline, args.tolerance) if results else ("", [])
+    print(report)
+    if cold:
+        report, over = format_cold_start(cold_start())
+        print(report)
+        if over:
+            flagged.append("cold_start")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=2)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"  Baseline saved: {args.baseline}")
+    elif flagged:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
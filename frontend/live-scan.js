@@ -8,10 +8,10 @@ function LiveScanView() {
   const [expandedTicker, setExpandedTicker] = useStateLive(null);
 
   useEffectLive(() => {
-    fetch('data/latest-scan.json')
-      .then(r => { if (!r.ok) throw new Error('No scan data'); return r.json(); })
+    loadScan()
       .then(data => { setScanData(data); setLoading(false); })
       .catch(err => { setError(err.message); setLoading(false); });
+    return subscribeScan(data => { setScanData(data); setError(null); });
   }, []);
 
   if (loading) return (
@@ -25,10 +25,10 @@ function PortfolioView() {
 
   // Load scan data for live prices
   useEffectPort(() => {
-    fetch('data/latest-scan.json')
-      .then(r => r.ok ? r.json() : null)
+    loadScan()
       .then(data => setScanData(data))
       .catch(() => {});
+    return subscribeScan(setScanData);
   }, []);
 
   // On load: fetch portfolio.json (source of truth from GitHub Pages).
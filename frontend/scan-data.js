@@ -0,0 +1,102 @@
+/* Scan data loader — decodes the columnar latest-scan.json into row objects
+   and keeps it current from the server's /api/events push channel */
+const SCAN_FORMAT_VERSION = 2;
+const SCAN_TABLES = ['signals', 'buy_orders', 'sell_orders', 'manage_orders'];
+
+// { field: [values...] } → [{ field: value }, ...]
+function decodeTable(cols) {
+  cols = cols || {};
+  const fields = Object.keys(cols);
+  const n = fields.length ? cols[fields[0]].length : 0;
+  const rows = new Array(n);
+  for (let i = 0; i < n; i++) {
+    const row = {};
+    for (let f = 0; f < fields.length; f++) row[fields[f]] = cols[fields[f]][i];
+    rows[i] = row;
+  }
+  return rows;
+}
+
+// v2 stores each table column-wise; v1 (no "version") is already row-wise
+function decodeScan(data) {
+  const version = data.version || 1;
+  if (version === 1) return data;
+  if (version !== SCAN_FORMAT_VERSION) throw new Error('Unsupported scan format v' + version);
+  const out = Object.assign({}, data);
+  SCAN_TABLES.forEach(function(key) { out[key] = decodeTable(data[key]); });
+  return out;
+}
+
+// Apply a server diff (scan_format.diff) → new scan object
+function applyScanDiff(scan, diff) {
+  const bySymbol = {};
+  scan.signals.forEach(function(s) { bySymbol[s.ticker] = s; });
+  decodeTable(diff.signals).forEach(function(s) { bySymbol[s.ticker] = s; });
+  (diff.removed || []).forEach(function(t) { delete bySymbol[t]; });
+  const order = diff.tickers || scan.signals.map(function(s) { return s.ticker; });
+  const out = Object.assign({}, scan, { timestamp: diff.to });
+  out.signals = order.filter(function(t) { return bySymbol[t]; }).map(function(t) { return bySymbol[t]; });
+  if (diff.regime) out.regime = diff.regime;
+  SCAN_TABLES.slice(1).forEach(function(key) {
+    if (diff[key]) out[key] = decodeTable(diff[key]);
+  });
+  return out;
+}
+
+let latestScan = null;
+const scanListeners = new Set();
+let scanEvents = null;
+
+function publishScan(scan) {
+  latestScan = scan;
+  scanListeners.forEach(function(fn) { fn(scan); });
+}
+
+function loadScan() {
+  return fetch('data/latest-scan.json')
+    .then(function(r) { if (!r.ok) throw new Error('No scan data'); return r.json(); })
+    .then(function(data) {
+      latestScan = decodeScan(data);
+      if (scanListeners.size) openScanEvents();
+      return latestScan;
+    });
+}
+
+// Subscribe from the loaded scan's timestamp, so the server knows which diff applies
+function openScanEvents() {
+  if (scanEvents || !latestScan || typeof EventSource === 'undefined') return;
+  scanEvents = new EventSource('api/events?since=' + encodeURIComponent(latestScan.timestamp));
+  scanEvents.addEventListener('diff', function(e) {
+    const diff = JSON.parse(e.data);
+    if (latestScan && latestScan.timestamp === diff.from) publishScan(applyScanDiff(latestScan, diff));
+    else loadScan().then(publishScan).catch(function() {});
+  });
+  scanEvents.addEventListener('reset', function() {
+    loadScan().then(publishScan).catch(function() {});
+  });
+  // Static hosting (GitHub Pages) has no /api/events — the browser gives up on
+  // a non-200 response, so the page just keeps the data it fetched
+  scanEvents.onerror = function() {
+    if (scanEvents && scanEvents.readyState === EventSource.CLOSED) {
+      scanEvents = null;
+    }
+  };
+}
+
+// Call fn with each new scan the server pushes; returns an unsubscribe function
+function subscribeScan(fn) {
+  scanListeners.add(fn);
+  openScanEvents();
+  return function() {
+    scanListeners.delete(fn);
+    if (!scanListeners.size && scanEvents) {
+      scanEvents.close();
+      scanEvents = null;
+    }
+  };
+}
+
+window.decodeScan = decodeScan;
+window.applyScanDiff = applyScanDiff;
+window.loadScan = loadScan;
+window.subscribeScan = subscribeScan;
@@ -8,10 +8,10 @@ function SpyMomentumScanner() {
   const [showPlaybook, setShowPlaybook] = useStateDetail(false);
 
   useEffectDetail(() => {
-    fetch('data/latest-scan.json')
-      .then(r => { if (!r.ok) throw new Error('No data'); return r.json(); })
+    loadScan()
       .then(d => { setScanData(d); setLoading(false); })
       .catch(() => setLoading(false));
+    return subscribeScan(setScanData);
   }, []);
 
   if (loading) return (
@@ -1,7 +1,8 @@
-const CACHE_NAME = "spy-scanner-v7";
+const CACHE_NAME = "spy-scanner-v9";
 const ASSETS = [
   "./",
   "./index.html",
+  "./scan-data.js",
   "./spy-momentum-scanner.js",
   "./swing-trader-dashboard.js",
   "./live-scan.js",
@@ -29,6 +30,9 @@ self.addEventListener("activate", (e) => {
 self.addEventListener("fetch", (e) => {
   const url = new URL(e.request.url);
 
+  // API calls and the live event stream always go straight to the server
+  if (url.pathname.includes("/api/")) return;
+
   // Network-first for scan data (always get fresh data)
   if (url.pathname.endsWith("latest-scan.json")) {
     e.respondWith(
@@ -9,10 +9,10 @@ function SwingTraderDashboard() {
   const [showRules, setShowRules] = useStateST(false);
 
   useEffectST(() => {
-    fetch('data/latest-scan.json')
-      .then(r => { if (!r.ok) throw new Error('No data'); return r.json(); })
+    loadScan()
       .then(d => { setScanData(d); setLoading(false); })
       .catch(() => setLoading(false));
+    return subscribeScan(setScanData);
   }, []);
 
   const filtered = useMemoST(() => {
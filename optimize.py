@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+SPY Momentum Scanner — Parameter Optimizer
+===========================================
+Grid-searches StrategyConfig over the backtester on every core. Bar data is
+placed in shared memory once and mapped read-only by each worker, so tasks only
+carry their parameter set.
+
+The simulated history is split into --folds consecutive segments, each
+backtested from fresh cash. Combinations are ranked on in-sample segments
+(all but the last) with the held-out last segment alongside, and a walk-forward
+pass re-selects the best combination on segments 1..k and scores it on k+1 to
+show how much of the edge survives out of sample.
+
+Usage:
+  python3 optimize.py                                        # default grid
+  python3 optimize.py --param ema_fast=5,8,13 --param vol_surge=1.2,1.3,1.5
+  python3 optimize.py --universe sp500.csv --years 10 --folds 5 --csv results.csv
+"""
+
+import os
+import csv
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields, replace
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import spy_momentum_scanner as scanner
+from spy_momentum_scanner import DEFAULT_STRATEGY, WATCHLIST, StrategyConfig, log
+from backtest import Backtest, IndicatorPanel, load_history, summarize
+
+DEFAULT_GRID = {
+    "ema_fast": [5, 8, 10],
+    "vol_surge": [1.2, 1.3, 1.5],
+    "pullback_high": [0.5, 1.0],
+    "max_positions": [3, 5, 8],
+}
+
+METRICS = ("sharpe", "cagr_pct", "total_return_pct")
+
+
+# ─── WORKERS ─────────────────────────────────────────────────────────────────────
+
+_worker = {}
+
+
+def _init_worker(shm_name, shape, dates, tickers, stocks, account, bounds):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    data.flags.writeable = False
+    _worker.update(shm=shm, data=data, dates=dates, tickers=tickers, stocks=stocks,
+                   account=account, bounds=bounds, panel_key=None, panel=None)
+
+
+def _panel_for(strategy):
+    # Only the EMA/RSI periods change the panel; keep the last one per worker
+    key = (strategy.ema_fast, strategy.ema_mid, strategy.ema_slow, strategy.rsi_period)
+    if _worker["panel_key"] != key:
+        o, h, l, c, v = _worker["data"]
+        _worker["panel"] = IndicatorPanel(_worker["dates"], _worker["tickers"], o, h, l, c, v,
+                                          strategy=strategy)
+        _worker["panel_key"] = key
+    return _worker["panel"]
+
+
+def evaluate(strategy):
+    """Backtest one StrategyConfig on every fold → list of summary dicts."""
+    panel = _panel_for(strategy)
+    return [
+        summarize(Backtest(panel, _worker["stocks"], _worker["account"]).run(start, stop))
+        for start, stop in _worker["bounds"]
+    ]
+
+
+# ─── GRID ────────────────────────────────────────────────────────────────────────
+
+def parse_grid(specs):
+    """["ema_fast=5,8,13", ...] → {field: [values]} typed like StrategyConfig."""
+    types = {f.name: f.type for f in fields(StrategyConfig)}
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        name = name.strip()
+        if name not in types:
+            raise ValueError(f"unknown parameter '{name}' (choose from {', '.join(types)})")
+        cast = int if types[name] in (int, "int") else float
+        grid[name] = [cast(v) for v in values.split(",") if v.strip()]
+        if not grid[name]:
+            raise ValueError(f"no values for '{name}'")
+    return grid
+
+
+def expand_grid(grid):
+    names = list(grid)
+    out = []
+    for combo in itertools.product(*(grid[n] for n in names)):
+        st = replace(DEFAULT_STRATEGY, **dict(zip(names, combo)))
+        if st.ema_fast < st.ema_mid < st.ema_slow and st.pullback_low < st.pullback_high:
+            out.append(st)
+    # Group combinations sharing a panel so workers rebuild it rarely
+    out.sort(key=lambda s: (s.ema_fast, s.ema_mid, s.ema_slow, s.rsi_period))
+    return out
+
+
+def fold_bounds(n_days, folds, warmup):
+    edges = np.linspace(warmup, n_days, folds + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+
+# ─── REPORTING ──────────────────────────────────────────────────────────────────
+
+def rank(results, metric):
+    """Rows sorted by mean in-sample metric, with the held-out fold alongside."""
+    rows = []
+    for strategy, folds in results:
+        ins = [f[metric] for f in folds[:-1]] or [folds[-1][metric]]
+        rows.append({
+            "strategy": strategy,
+            "in_sample": round(float(np.mean(ins)), 2),
+            "out_of_sample": folds[-1][metric],
+            "oos_max_drawdown_pct": folds[-1]["max_drawdown_pct"],
+            "oos_trades": folds[-1]["trades"],
+        })
+    rows.sort(key=lambda r: r["in_sample"], reverse=True)
+    return rows
+
+
+def walk_forward(results, metric):
+    """Pick the best combination on folds [0, k), score it on fold k."""
+    steps = []
+    for k in range(1, len(results[0][1])):
+        best, folds = max(results, key=lambda r: np.mean([f[metric] for f in r[1][:k]]))
+        steps.append((k, best, folds[k]))
+    return steps
+
+
+def _changed(strategy):
+    diff = {k: v for k, v in asdict(strategy).items() if getattr(DEFAULT_STRATEGY, k) != v}
+    return " ".join(f"{k}={v}" for k, v in diff.items()) or "(defaults)"
+
+
+def format_report(rows, steps, metric, top, elapsed, n_combos, workers):
+    L = []
+    L.append("")
+    L.append("█" * 72)
+    L.append(f"  ◈ OPTIMIZER — {n_combos} combinations  |  {workers} workers  |  {elapsed:.1f}s")
+    L.append("█" * 72)
+    L.append("")
+    L.append(f"  RANKED BY IN-SAMPLE {metric.upper()} (top {min(top, len(rows))})")
+    L.append("─" * 72)
+    L.append(f"  {'#':>3}  {'IN':>8}{'OOS':>8}{'OOS DD':>9}{'TRADES':>8}  PARAMETERS")
+    L.append("  " + "─" * 68)
+    for n, r in enumerate(rows[:top], start=1):
+        L.append(f"  {n:>3}  {r['in_sample']:>8.2f}{r['out_of_sample']:>8.2f}"
+                 f"{r['oos_max_drawdown_pct']:>8.1f}%{r['oos_trades']:>8}  {_changed(r['strategy'])}")
+
+    if steps:
+        L.append("")
+        L.append("─" * 72)
+        L.append("  WALK-FORWARD (best on folds before k, scored on fold k)")
+        L.append("─" * 72)
+        for k, strategy, fold in steps:
+            L.append(f"  fold {k}: {fold['start']} → {fold['end']}  {metric}: {fold[metric]:>7.2f}"
+                     f"  CAGR: {fold['cagr_pct']:+.1f}%  |  {_changed(strategy)}")
+        oos = np.mean([fold[metric] for _, _, fold in steps])
+        L.append(f"  Mean out-of-sample {metric}: {oos:.2f}")
+    L.append("")
+    return "\n".join(L)
+
+
+# ─── MAIN ────────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="SPY Momentum Scanner — Parameter Optimizer")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="StrategyConfig field to sweep (repeatable; default: built-in grid)")
+    parser.add_argument("--years", type=float, default=5, help="Years of history (default: 5)")
+    parser.add_argument("--account", type=int, default=scanner.ACCOUNT_SIZE,
+                        help=f"Starting cash per fold (default: ${scanner.ACCOUNT_SIZE:,})")
+    parser.add_argument("--universe", metavar="FILE", help="Constituents CSV/JSON (default: WATCHLIST)")
+    parser.add_argument("--data-source", choices=["polygon", "yahoo"], default="auto")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk bar cache")
+    parser.add_argument("--folds", type=int, default=4, help="Walk-forward segments (default: 4)")
+    parser.add_argument("--metric", choices=METRICS, default="sharpe", help="Ranking metric")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes (default: all cores)")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print (default: 20)")
+    parser.add_argument("--csv", metavar="FILE", help="Write the full ranked table as CSV")
+    args = parser.parse_args()
+
+    if args.folds < 2:
+        parser.error("--folds must be at least 2")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    try:
+        grid = parse_grid(args.param) if args.param else DEFAULT_GRID
+    except ValueError as e:
+        parser.error(f"--param: {e}")
+    combos = expand_grid(grid)
+    if not combos:
+        parser.error("--param: no valid combinations (need ema_fast < ema_mid < ema_slow)")
+
+    stocks = scanner.load_universe(args.universe) if args.universe else WATCHLIST
+    bars = load_history(stocks, args.years, args.data_source, cache=not args.no_cache)
+    dates, tickers, *arrays = IndicatorPanel.align(bars)
+    warmup = max(s.ema_slow for s in combos) + 5
+    if len(dates) < warmup + args.folds * 20:
+        parser.error("not enough history for that many folds — raise --years")
+    bounds = fold_bounds(len(dates), args.folds, warmup)
+
+    data = np.stack(arrays)
+    shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+    try:
+        np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+        del data, arrays, bars
+        log.info(f"Optimizing {len(combos)} combinations × {args.folds} folds on {args.workers} workers")
+
+        t0 = time.perf_counter()
+        initargs = (shm.name, (5, len(dates), len(tickers)), dates, tickers, stocks, args.account, bounds)
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            chunk = max(1, len(combos) // (args.workers * 4))
+            results = list(zip(combos, pool.map(evaluate, combos, chunksize=chunk)))
+        elapsed = time.perf_counter() - t0
+    finally:
+        shm.close()
+        shm.unlink()
+
+    rows = rank(results, args.metric)
+    steps = walk_forward(results, args.metric)
+    print(format_report(rows, steps, args.metric, args.top, elapsed, len(combos), args.workers))
+
+    if args.csv:
+        names = [f.name for f in fields(StrategyConfig)]
+        with open(args.csv, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["rank", f"in_sample_{args.metric}", f"oos_{args.metric}",
+                        "oos_max_drawdown_pct", "oos_trades"] + names)
+            for n, r in enumerate(rows, start=1):
+                w.writerow([n, r["in_sample"], r["out_of_sample"], r["oos_max_drawdown_pct"],
+                            r["oos_trades"]] + [getattr(r["strategy"], k) for k in names])
+        log.info(f"Results: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+SPY Momentum Scanner — Portfolio Store
+=======================================
+Positions and closed trades live in an append-only journal, portfolio.jsonl:
+one JSON event per line (open, close, delete), preceded by a snapshot of the
+whole portfolio. Writers take an exclusive lock, append their events in one
+write, then regenerate frontend/data/portfolio.json for the static dashboard.
+A write costs one short append instead of rewriting the full history, and two
+writers (a --record session, a trade workflow run, a manual edit) can no
+longer overwrite each other's changes.
+
+Every COMPACT_EVERY events the journal is rewritten as a single snapshot.
+Readers need no lock: the journal is only ever appended to or atomically
+replaced, and a half-written last line is ignored until it is complete.
+
+The first write seeds the journal from an existing portfolio.json, so
+upgrading keeps the portfolio. After that, portfolio.json is an export —
+change positions through this API (or the CLI below), not by editing it.
+
+Only the standard library is used here.
+
+Usage:
+  python3 portfolio_store.py buy AAPL --price 190.50 --shares 10
+  python3 portfolio_store.py sell AAPL --price 201.25
+  python3 portfolio_store.py delete AAPL
+  python3 portfolio_store.py --show
+  python3 portfolio_store.py --export       # regenerate portfolio.json
+  python3 portfolio_store.py --compact      # rewrite the journal as one snapshot
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PORTFOLIO_JOURNAL = os.path.join(SCRIPT_DIR, "portfolio.jsonl")
+PORTFOLIO_FILE = os.path.join(SCRIPT_DIR, "frontend", "data", "portfolio.json")
+
+COMPACT_EVERY = 500   # events after the snapshot before the journal is compacted
+
+
+def empty_portfolio():
+    return {"starting_cash": 1000, "positions": [], "history": []}
+
+
+def _json_default(value):
+    if hasattr(value, "item"):   # NumPy scalars from scanner orders
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def apply_event(portfolio, event):
+    """Apply one journal event to `portfolio` in place."""
+    op = event["op"]
+    if op == "snapshot":
+        portfolio.clear()
+        portfolio.update(event["portfolio"])
+        return
+    ticker = event.get("ticker")
+    positions = portfolio.setdefault("positions", [])
+    if op == "open":
+        positions.append(event["position"])
+    elif op == "close":
+        found = next(p for p in positions if p.get("ticker") == ticker)
+        portfolio["positions"] = [p for p in positions if p.get("ticker") != ticker]
+        portfolio.setdefault("history", []).append({
+            **found,
+            "closePrice": event["price"],
+            "closeDate": event["date"],
+            "pnl": round((event["price"] - found["buyPrice"]) * found["shares"], 2),
+        })
+    elif op == "delete":
+        portfolio["positions"] = [p for p in positions if p.get("ticker") != ticker]
+    else:
+        raise ValueError(f"unknown portfolio journal event {op!r}")
+    portfolio["last_updated"] = event["date"]
+
+
+class Transaction:
+    """The portfolio inside PortfolioStore.transaction(). Each call checks the
+    current state, records an event and applies it, so later calls see it."""
+
+    def __init__(self, portfolio):
+        self.portfolio = portfolio
+        self.events = []
+
+    def _record(self, event):
+        event = {"ts": datetime.now().isoformat(timespec="seconds"),
+                 "date": datetime.now().strftime("%Y-%m-%d"), **event}
+        apply_event(self.portfolio, event)
+        self.events.append(event)
+        return event
+
+    def position(self, ticker):
+        return next((p for p in self.portfolio.get("positions", []) if p.get("ticker") == ticker), None)
+
+    def open(self, ticker, price, shares, stop_loss=None, target=None):
+        position = {
+            "id": int(time.time() * 1000),
+            "ticker": ticker,
+            "buyPrice": price,
+            "shares": shares,
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "cost": round(price * shares, 2),
+        }
+        if stop_loss is not None:
+            position["stopLoss"] = stop_loss
+        if target is not None:
+            position["target"] = target
+        self._record({"op": "open", "ticker": ticker, "position": position})
+        return position
+
+    def close(self, ticker, price):
+        """Close the position in `ticker` at `price` → its history entry."""
+        if self.position(ticker) is None:
+            raise ValueError(f"No open position for {ticker}")
+        self._record({"op": "close", "ticker": ticker, "price": price})
+        return self.portfolio["history"][-1]
+
+    def delete(self, ticker):
+        """Drop `ticker` from the open positions without recording a trade."""
+        if self.position(ticker) is None:
+            raise ValueError(f"No position found for {ticker}")
+        self._record({"op": "delete", "ticker": ticker})
+
+
+class PortfolioStore:
+    def __init__(self, journal=PORTFOLIO_JOURNAL, export_path=PORTFOLIO_FILE, compact_every=COMPACT_EVERY):
+        self.journal = journal
+        self.export_path = export_path
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._portfolio = None
+        self._file_id = None      # (device, inode) the cached state was read from
+        self._offset = 0          # bytes of the journal applied to _portfolio
+        self._events = 0          # events since the last snapshot
+
+    # ── reading ──
+
+    def _refresh(self):
+        """Bring the cached portfolio up to date, reading only new journal bytes."""
+        try:
+            st = os.stat(self.journal)
+        except FileNotFoundError:
+            self._portfolio, self._file_id, self._offset, self._events = self._seed(), None, 0, 0
+            return
+        if (st.st_dev, st.st_ino) != self._file_id or st.st_size < self._offset:
+            self._portfolio, self._file_id, self._offset, self._events = empty_portfolio(), (st.st_dev, st.st_ino), 0, 0
+        if st.st_size == self._offset:
+            return
+        with open(self.journal, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]   # a partial last line is still being written
+        for n, line in enumerate(complete.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{self.journal}: bad event after byte {self._offset}, line {n}: {e}") from None
+            apply_event(self._portfolio, event)
+            self._events = 0 if event["op"] == "snapshot" else self._events + 1
+        self._offset += len(complete)
+
+    def _seed(self):
+        """The starting portfolio when there is no journal yet: portfolio.json if present."""
+        try:
+            with open(self.export_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return empty_portfolio()
+
+    def load(self):
+        """Current portfolio (starting_cash, positions, history). Takes no file lock."""
+        with self._lock:
+            self._refresh()
+            return json.loads(json.dumps(self._portfolio))
+
+    # ── writing ──
+
+    @contextmanager
+    def _exclusive(self):
+        """Process lock (threads) plus a file lock (other processes)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal)), exist_ok=True)
+        with self._lock, open(self.journal + ".lock", "a") as lock_file:
+            _lock_file(lock_file)
+            try:
+                yield
+            finally:
+                _unlock_file(lock_file)
+
+    @contextmanager
+    def transaction(self, export=True):
+        """Locked read-modify-write. Yields a Transaction; its events are
+        appended together when the block exits, or dropped if it raises."""
+        with self._exclusive():
+            self._refresh()
+            tx = Transaction(json.loads(json.dumps(self._portfolio)))
+            yield tx
+            if not tx.events:
+                return
+            lines = [] if self._file_id else [{"op": "snapshot", "portfolio": self._portfolio}]
+            lines += tx.events
+            self._append(lines)
+            if self._events >= self.compact_every:
+                self._compact()
+            if export:
+                self.export()
+
+    def _append(self, events):
+        body = "".join(json.dumps(e, separators=(",", ":"), default=_json_default) + "\n" for e in events)
+        with open(self.journal, "ab") as f:
+            if f.tell() > self._offset:   # drop a partial line left by a crashed writer
+                f.truncate(self._offset)
+            f.write(body.encode())
+            f.flush()
+            os.fsync(f.fileno())
+        self._refresh()
+
+    def _compact(self):
+        directory = os.path.dirname(os.path.abspath(self.journal))
+        snapshot = json.dumps({"op": "snapshot", "portfolio": self._portfolio},
+                              separators=(",", ":"), default=_json_default) + "\n"
+        _atomic_write(self.journal, snapshot.encode(), directory)
+        self._file_id = None
+        self._refresh()
+
+    def compact(self):
+        """Rewrite the journal as one snapshot of the current portfolio (creating it if missing)."""
+        with self._exclusive():
+            self._refresh()
+            self._compact()
+
+    def export(self, path=None):
+        """Regenerate portfolio.json from the journal (atomic replace)."""
+        path = path or self.export_path
+        portfolio = self.load()
+        body = json.dumps(portfolio, indent=2, default=_json_default) + "\n"
+        _atomic_write(path, body.encode(), os.path.dirname(os.path.abspath(path)))
+        return path
+
+
+def _atomic_write(path, body, directory):
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _lock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    except ImportError:   # Windows
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SPY Momentum Scanner — Portfolio Store")
+    parser.add_argument("action", nargs="?", choices=["buy", "sell", "delete"])
+    parser.add_argument("ticker", nargs="?")
+    parser.add_argument("--price", type=float, help="Fill price (buy/sell)")
+    parser.add_argument("--shares", type=float, help="Shares bought (buy)")
+    parser.add_argument("--stop", type=float, help="Stop loss to record with a buy")
+    parser.add_argument("--target", type=float, help="Target to record with a buy")
+    parser.add_argument("--show", action="store_true", help="Print open positions and closed-trade count")
+    parser.add_argument("--export", action="store_true", help="Regenerate portfolio.json from the journal")
+    parser.add_argument("--compact", action="store_true", help="Rewrite the journal as a single snapshot")
+    parser.add_argument("--journal", default=PORTFOLIO_JOURNAL, help="Journal file (default: %(default)s)")
+    parser.add_argument("--portfolio", default=PORTFOLIO_FILE, help="Exported JSON (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.action and not args.ticker:
+        parser.error(f"{args.action} needs a TICKER")
+    if args.action in ("buy", "sell") and args.price is None:
+        parser.error(f"{args.action} needs --price")
+    if args.action == "buy" and args.shares is None:
+        parser.error("buy needs --shares")
+
+    store = PortfolioStore(args.journal, args.portfolio)
+    if args.action:
+        ticker = args.ticker.upper().strip()
+        try:
+            with store.transaction() as tx:
+                if args.action == "buy":
+                    tx.open(ticker, args.price, args.shares, args.stop, args.target)
+                    print(f"Added BUY: {args.shares:g} shares of {ticker} @ ${args.price}")
+                elif args.action == "sell":
+                    closed = tx.close(ticker, args.price)
+                    print(f"Closed {ticker}: P&L ${closed['pnl']:+.2f}")
+                else:
+                    tx.delete(ticker)
+                    print(f"Deleted {ticker} from positions")
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+    if args.compact:
+        store.compact()
+    if args.export:
+        print(f"Exported {store.export()}")
+    if args.action or args.show:
+        portfolio = store.load()
+        print(f"Open positions: {len(portfolio['positions'])}")
+        for p in portfolio["positions"]:
+            print(f"  {p['ticker']:<7} {p['shares']:g} @ ${p['buyPrice']}  ({p.get('date', '')})")
+        print(f"Closed trades: {len(portfolio['history'])}")
+    if not (args.action or args.show or args.export or args.compact):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+SPY Momentum Scanner — Scan File Format
+========================================
+latest-scan.json and scan_logs/*.json are stored column-wise: each table
+(signals and the three order lists) keeps its field names once and one value
+array per field, so a 500-ticker scan doesn't repeat 20+ keys per row.
+
+  {"version": 2, "timestamp": "...", "regime": {...},
+   "signals": {"ticker": ["NVDA", "AAPL"], "current_price": [222.82, 231.1], ...},
+   "buy_orders": {...}, "sell_orders": {...}, "manage_orders": {...}}
+
+Version 1 is the original row-wise layout (a list of objects per table, no
+"version" key). decode() accepts both and returns the row-wise dict, which is
+what every reader works with.
+
+Only the standard library is used here, so history tools can read scans
+without importing pandas. Brotli copies need the optional `brotli` package.
+"""
+
+import os
+import json
+import gzip
+import tempfile
+
+SCHEMA_VERSION = 2
+TABLES = ("signals", "buy_orders", "sell_orders", "manage_orders")
+
+
+def encode(scan):
+    """Row-wise scan dict → columnar version-2 dict. A table that is already
+    a {field: [values]} dict (the scanner's SignalTable.to_columns()) is kept."""
+    out = {"version": SCHEMA_VERSION}
+    for key, value in scan.items():
+        out[key] = _columns(value) if key in TABLES and not isinstance(value, dict) else value
+    return out
+
+
+def decode(data):
+    """Scan dict in any known version → row-wise dict (tables as lists of dicts)."""
+    version = data.get("version", 1)
+    if version == 1:
+        return data
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"unsupported scan format version {version}")
+    out = {k: v for k, v in data.items() if k != "version"}
+    for key in TABLES:
+        cols = data.get(key) or {}
+        out[key] = [dict(zip(cols, vals)) for vals in zip(*cols.values())]
+    return out
+
+
+def _columns(rows):
+    fields = list(rows[0]) if rows else []
+    return {f: [row[f] for row in rows] for f in fields}
+
+
+def diff(old, new):
+    """What changed between two row-wise scans, for pushing to live clients.
+
+    Changed signal rows go in "signals" (columnar), tickers that dropped out
+    in "removed", and "tickers" gives the new row order when it changed.
+    The regime and each order list are included whole, and only if they
+    changed. "from"/"to" are the scans' timestamps."""
+    before = {s["ticker"]: s for s in old.get("signals", [])}
+    after = new.get("signals", [])
+    out = {
+        "from": old.get("timestamp"),
+        "to": new.get("timestamp"),
+        "signals": _columns([s for s in after if before.get(s["ticker"]) != s]),
+        "removed": sorted(set(before) - {s["ticker"] for s in after}),
+    }
+    order = [s["ticker"] for s in after]
+    if order != [s["ticker"] for s in old.get("signals", [])]:
+        out["tickers"] = order
+    if new.get("regime") != old.get("regime"):
+        out["regime"] = new.get("regime")
+    for key in TABLES[1:]:
+        if new.get(key) != old.get(key):
+            out[key] = _columns(new.get(key, []))
+    return out
+
+
+def load(path):
+    with open(path) as f:
+        return decode(json.load(f))
+
+
+def write(path, scan, cls=None, precompress=False):
+    """Atomically write `scan` (row-wise) as compact columnar JSON.
+
+    With precompress, path.gz (and path.br when brotli is installed) are
+    written alongside for servers that serve pre-encoded files."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    body = json.dumps(encode(scan), separators=(",", ":"), cls=cls).encode()
+    copies = {path: body}
+    if precompress:
+        copies[path + ".gz"] = gzip.compress(body, compresslevel=9, mtime=0)
+        try:
+            import brotli
+            copies[path + ".br"] = brotli.compress(body, quality=11)
+        except ImportError:
+            pass
+    # The .json goes first: a compressed copy older than it is treated as stale
+    for target in copies:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(copies[target])
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
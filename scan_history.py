@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+SPY Momentum Scanner — Scan History Index
+==========================================
+SQLite index over scan_logs/*.json. Every logged signal and order becomes a
+row indexed on (ticker, timestamp) and (signal, timestamp), so historical
+questions don't require parsing every log file. The JSON logs stay the source
+of truth: files not yet indexed are imported on each query, and --rebuild
+re-imports everything.
+
+Usage:
+  python3 scan_history.py --history NVDA --since 2026-01-01
+  python3 scan_history.py --signal "PULLBACK BUY" --since 2026-04-01
+  python3 scan_history.py --rebuild
+"""
+
+import os
+import sys
+import json
+import glob
+import sqlite3
+import argparse
+
+import scan_format
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCAN_LOG_DIR = os.path.join(SCRIPT_DIR, "scan_logs")
+HISTORY_DB = os.path.join(SCRIPT_DIR, "cache", "scan_history.sqlite")
+
+SIGNAL_COLUMNS = [
+    "ticker", "name", "sector", "weight", "current_price", "ema8", "ema21", "ema50",
+    "rsi", "vol_ratio", "change_1d", "change_5d", "change_20d", "signal",
+    "signal_strength", "stop_loss", "target_1", "target_2", "risk_per_share",
+    "support", "resistance", "conviction_score",
+]
+ORDER_COLUMNS = [
+    "action", "ticker", "price", "shares", "dollar_amount", "portfolio_pct",
+    "stop_loss", "target", "signal", "conviction", "reason",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY, file TEXT UNIQUE, timestamp TEXT,
+    regime TEXT, bull_count INTEGER, bear_count INTEGER, neutral_count INTEGER,
+    avg_rsi REAL, regime_multiplier REAL, spy_above_21ema INTEGER
+);
+CREATE TABLE IF NOT EXISTS signals (
+    scan_id INTEGER, timestamp TEXT, {", ".join(SIGNAL_COLUMNS)}, data TEXT
+);
+CREATE TABLE IF NOT EXISTS orders (
+    scan_id INTEGER, timestamp TEXT, kind TEXT, {", ".join(ORDER_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS signals_ticker_ts ON signals (ticker, timestamp);
+CREATE INDEX IF NOT EXISTS signals_signal_ts ON signals (signal, timestamp);
+CREATE INDEX IF NOT EXISTS orders_ticker_ts ON orders (ticker, timestamp);
+CREATE INDEX IF NOT EXISTS scans_ts ON scans (timestamp);
+"""
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def add_scan(self, scan, file):
+        """Append one scan (the save_scan_log dict). Returns False if `file`
+        was already indexed."""
+        regime = scan.get("regime", {})
+        ts = scan.get("timestamp", "")
+        with self.db:
+            cur = self.db.execute(
+                "INSERT OR IGNORE INTO scans (file, timestamp, regime, bull_count, bear_count, "
+                "neutral_count, avg_rsi, regime_multiplier, spy_above_21ema) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file, ts, regime.get("regime"), regime.get("bull_count"), regime.get("bear_count"),
+                 regime.get("neutral_count"), regime.get("avg_rsi"), regime.get("regime_multiplier"),
+                 regime.get("spy_above_21ema")))
+            if cur.rowcount == 0:
+                return False
+            scan_id = cur.lastrowid
+            self.db.executemany(
+                f"INSERT INTO signals VALUES (?, ?, {', '.join('?' * len(SIGNAL_COLUMNS))}, ?)",
+                [(scan_id, ts, *(s.get(c) for c in SIGNAL_COLUMNS), json.dumps(s))
+                 for s in scan.get("signals", [])])
+            self.db.executemany(
+                f"INSERT INTO orders VALUES (?, ?, ?, {', '.join('?' * len(ORDER_COLUMNS))})",
+                [(scan_id, ts, kind, *(o.get(c) for c in ORDER_COLUMNS))
+                 for kind in ("buy", "sell", "manage")
+                 for o in scan.get(f"{kind}_orders", [])])
+        return True
+
+    def import_file(self, path):
+        return self.add_scan(scan_format.load(path), os.path.basename(path))
+
+    def sync(self, log_dir=SCAN_LOG_DIR):
+        """Import scan logs that aren't indexed yet. Returns how many were added."""
+        known = {r[0] for r in self.db.execute("SELECT file FROM scans")}
+        added = 0
+        for path in sorted(glob.glob(os.path.join(log_dir, "scan_*.json"))):
+            if os.path.basename(path) in known:
+                continue
+            try:
+                added += self.import_file(path)
+            except (OSError, ValueError) as e:
+                print(f"  skipped {os.path.basename(path)}: {e}", file=sys.stderr)
+        return added
+
+    def rebuild(self, log_dir=SCAN_LOG_DIR):
+        with self.db:
+            for table in ("scans", "signals", "orders"):
+                self.db.execute(f"DELETE FROM {table}")
+        return self.sync(log_dir)
+
+    # ── queries ──
+
+    def ticker_history(self, ticker, since="", until="9999"):
+        return self.db.execute(
+            "SELECT timestamp, signal, signal_strength, conviction_score, current_price, rsi, "
+            "vol_ratio, stop_loss, target_1 FROM signals "
+            "WHERE ticker = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (ticker.upper(), since, until)).fetchall()
+
+    def ticker_orders(self, ticker, since="", until="9999"):
+        return self.db.execute(
+            "SELECT timestamp, kind, action, price, shares, stop_loss, target, signal FROM orders "
+            "WHERE ticker = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (ticker.upper(), since, until)).fetchall()
+
+    def signal_counts(self, ticker=None, since="", until="9999"):
+        """{signal: count} over the window, optionally for one ticker."""
+        if ticker:
+            rows = self.db.execute(
+                "SELECT signal, COUNT(*) FROM signals WHERE ticker = ? AND timestamp >= ? "
+                "AND timestamp < ? GROUP BY signal", (ticker.upper(), since, until))
+        else:
+            rows = self.db.execute(
+                "SELECT signal, COUNT(*) FROM signals WHERE timestamp >= ? AND timestamp < ? "
+                "GROUP BY signal", (since, until))
+        return dict(rows.fetchall())
+
+    def signal_tickers(self, signal, since="", until="9999"):
+        """[(ticker, count, last_seen)] for one signal type, most frequent first."""
+        return self.db.execute(
+            "SELECT ticker, COUNT(*) AS n, MAX(timestamp) FROM signals "
+            "WHERE signal = ? AND timestamp >= ? AND timestamp < ? "
+            "GROUP BY ticker ORDER BY n DESC, ticker", (signal.upper(), since, until)).fetchall()
+
+    def scan_count(self, since="", until="9999"):
+        return self.db.execute("SELECT COUNT(*) FROM scans WHERE timestamp >= ? AND timestamp < ?",
+                               (since, until)).fetchone()[0]
+
+
+# ─── OUTPUT ──────────────────────────────────────────────────────────────────────
+
+def format_ticker_history(store, ticker, since="", until="9999"):
+    rows = store.ticker_history(ticker, since, until)
+    total = store.scan_count(since, until)
+    L = []
+    L.append("")
+    L.append("─" * 72)
+    L.append(f"  {ticker.upper()} — {len(rows)} appearances in {total} scans"
+             f"{' since ' + since if since else ''}")
+    L.append("─" * 72)
+    counts = store.signal_counts(ticker, since, until)
+    for sig, n in sorted(counts.items(), key=lambda x: -x[1]):
+        L.append(f"  {sig:<16}{n:>5}  ({n / max(len(rows), 1) * 100:.0f}%)")
+    L.append("")
+    L.append(f"  {'DATE':<17}{'SIGNAL':<16}{'SCORE':>6}{'PRICE':>10}{'RSI':>6}{'VOL':>6}{'STOP':>10}{'T1':>10}")
+    L.append("  " + "─" * 70)
+    for r in rows:
+        L.append(f"  {r['timestamp'][:16].replace('T', ' '):<17}{r['signal']:<16}{r['conviction_score']:>6.0f}"
+                 f"{r['current_price']:>10.2f}{r['rsi']:>6.1f}{r['vol_ratio']:>5.1f}x"
+                 f"{r['stop_loss']:>10.2f}{r['target_1']:>10.2f}")
+    orders = store.ticker_orders(ticker, since, until)
+    if orders:
+        L.append("")
+        L.append(f"  ORDERS ({len(orders)})")
+        for o in orders:
+            L.append(f"  {o['timestamp'][:10]}  {o['action']:<24}${o['price']:>9.2f}  {o['shares']}sh")
+    L.append("")
+    return "\n".join(L)
+
+
+def format_signal_tickers(store, signal, since="", until="9999"):
+    rows = store.signal_tickers(signal, since, until)
+    L = []
+    L.append("")
+    L.append("─" * 72)
+    L.append(f"  {signal.upper()} — {sum(r[1] for r in rows)} signals across {len(rows)} tickers"
+             f"{' since ' + since if since else ''}")
+    L.append("─" * 72)
+    for ticker, n, last in rows:
+        L.append(f"  {ticker:<8}{n:>5}   last: {last[:10]}")
+    L.append("")
+    return "\n".join(L)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SPY Momentum Scanner — Scan History")
+    parser.add_argument("--history", metavar="TICKER", help="Signal/order history for one ticker")
+    parser.add_argument("--signal", metavar="NAME", help='Tickers that printed a signal, e.g. "PULLBACK BUY"')
+    parser.add_argument("--since", default="", metavar="YYYY-MM-DD", help="Start date (inclusive)")
+    parser.add_argument("--until", default="9999", metavar="YYYY-MM-DD", help="End date (exclusive)")
+    parser.add_argument("--rebuild", action="store_true", help="Re-import every scan log")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore()
+    added = store.rebuild() if args.rebuild else store.sync()
+    if added:
+        print(f"  Indexed {added} scan log(s)", file=sys.stderr)
+
+    if args.history:
+        print(format_ticker_history(store, args.history, args.since, args.until))
+    if args.signal:
+        print(format_signal_tickers(store, args.signal, args.since, args.until))
+    if not (args.history or args.signal or args.rebuild):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+SPY Momentum Scanner — Run Profiling
+=====================================
+Where one scan spends its time, so you can tell whether a run is
+network-bound (long fetches, little CPU) or CPU-bound (analysis, orders,
+formatting) as the universe grows.
+
+  stages    wall-clock and process-CPU seconds for fetch, analyze, orders, ...
+  tickers   per ticker: fetch latency, time spent waiting on the rate
+            limiter, HTTP requests, bytes downloaded, cache hit/miss and
+            analysis time
+  counters  requests made outside any ticker (grouped ingest, SPY quotes)
+
+The scanner's --profile prints format_table(); --profile-out writes
+to_dict() as JSON, or as a Prometheus textfile (for node_exporter's textfile
+collector) when the path ends in .prom. A disabled Profiler records nothing,
+so the hooks stay in place on normal runs.
+
+Only the standard library is used here.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+def _percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _number(value):
+    return str(value) if isinstance(value, int) else repr(round(float(value), 6))
+
+
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}     # name → [wall, cpu]
+        self.tickers = {}    # ticker → {metric: value}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start()
+
+    def _start(self):
+        self.started = time.time()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    def enable(self):
+        self.enabled = True
+        self._start()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage (wall and process CPU, all threads)."""
+        if not self.enabled:
+            yield
+            return
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            with self._lock:
+                acc = self.stages.setdefault(name, [0.0, 0.0])
+                acc[0] += wall
+                acc[1] += cpu
+
+    @contextmanager
+    def track(self, ticker, metric):
+        """Time a block as `metric` seconds for `ticker`. add() calls made on
+        this thread inside the block are attributed to `ticker` as well."""
+        if not self.enabled:
+            yield
+            return
+        outer = getattr(self._local, "ticker", None)
+        self._local.ticker = ticker
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.ticker = outer
+            self.add(ticker, **{metric: time.perf_counter() - t0})
+
+    def carry(self, fn):
+        """Wrap fn so add() calls it makes on a worker thread count toward the
+        ticker being tracked on this one."""
+        ticker = getattr(self._local, "ticker", None)
+        if not self.enabled or ticker is None:
+            return fn
+
+        def call(*args, **kwargs):
+            outer = getattr(self._local, "ticker", None)
+            self._local.ticker = ticker
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.ticker = outer
+
+        return call
+
+    def add(self, ticker=None, **values):
+        """Accumulate values for `ticker` — by default the one being tracked on
+        this thread, or the run-wide counters when there is none."""
+        if not self.enabled:
+            return
+        ticker = ticker or getattr(self._local, "ticker", None)
+        with self._lock:
+            row = self.tickers.setdefault(ticker, {}) if ticker else self.counters
+            for key, value in values.items():
+                row[key] = row.get(key, 0) + value
+
+    # ── reporting ──
+
+    def _column(self, metric):
+        return {t: row[metric] for t, row in self.tickers.items() if metric in row}
+
+    def _total(self, metric):
+        return sum(self._column(metric).values()) + self.counters.get(metric, 0)
+
+    def bound(self):
+        """"network" when fetching dominates wall time but barely uses the CPU
+        ("rate-limit" if most of the fetch time was spent waiting on the
+        limiter), "cpu" otherwise; None before anything was timed."""
+        wall = sum(w for w, _ in self.stages.values())
+        if not wall:
+            return None
+        fetch_wall, fetch_cpu = self.stages.get("fetch", (0.0, 0.0))
+        if fetch_wall >= wall - fetch_wall and fetch_cpu < 0.5 * fetch_wall:
+            fetch = sum(self._column("fetch").values())
+            return "rate-limit" if fetch and self._total("throttle") >= 0.5 * fetch else "network"
+        return "cpu"
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                "wall": round(time.perf_counter() - self._wall0, 6),
+                "cpu": round(time.process_time() - self._cpu0, 6),
+                "bound": self.bound(),
+                "stages": {name: {"wall": round(w, 6), "cpu": round(c, 6)}
+                           for name, (w, c) in self.stages.items()},
+                "counters": dict(self.counters),
+                "tickers": {t: {k: round(v, 6) if isinstance(v, float) else v for k, v in row.items()}
+                            for t, row in self.tickers.items()},
+            }
+
+    def format_table(self, slowest=5):
+        data = self.to_dict()
+        fetch = self._column("fetch")
+        analyze = self._column("analyze")
+        L = []
+        L.append("")
+        L.append("─" * 72)
+        L.append(f"  PROFILE — {len(self.tickers)} tickers, {data['wall']:.2f}s wall, "
+                 f"{data['cpu']:.2f}s CPU")
+        L.append("─" * 72)
+        L.append(f"  {'STAGE':<14}{'WALL':>10}{'CPU':>10}{'CPU%':>7}{'SHARE':>8}")
+        for name, st in data["stages"].items():
+            wall, cpu = st["wall"], st["cpu"]
+            L.append(f"  {name:<14}{wall:>9.3f}s{cpu:>9.3f}s{cpu / wall * 100 if wall else 0:>6.0f}%"
+                     f"{wall / data['wall'] * 100 if data['wall'] else 0:>7.0f}%")
+        L.append("")
+        if fetch:
+            values = list(fetch.values())
+            L.append(f"  FETCH     p50 {_percentile(values, 0.5) * 1000:.0f}ms   "
+                     f"p95 {_percentile(values, 0.95) * 1000:.0f}ms   max {max(values) * 1000:.0f}ms   "
+                     f"{self._total('requests'):.0f} requests   {self._total('bytes') / 1e6:.2f} MB")
+            if self._total("throttle"):
+                L.append(f"            {self._total('throttle'):.2f}s waiting on the rate limiter (summed over threads)")
+        hits, misses = self._total("cache_hit"), self._total("cache_miss")
+        if hits or misses:
+            L.append(f"  CACHE     {hits:.0f} hit / {misses:.0f} miss")
+        if analyze:
+            values = list(analyze.values())
+            L.append(f"  ANALYZE   mean {sum(values) / len(values) * 1000:.2f}ms   "
+                     f"max {max(values) * 1000:.2f}ms per ticker")
+        if fetch:
+            worst = sorted(fetch.items(), key=lambda x: -x[1])[:slowest]
+            L.append("  SLOWEST   " + "   ".join(f"{t} {s * 1000:.0f}ms" for t, s in worst))
+        bound = data["bound"]
+        if bound:
+            fetch_wall = data["stages"].get("fetch", {}).get("wall", 0)
+            L.append("")
+            L.append(f"  Bound: {bound} — fetch is {fetch_wall / data['wall'] * 100 if data['wall'] else 0:.0f}% "
+                     f"of wall time; the process used {data['cpu'] / data['wall'] * 100 if data['wall'] else 0:.0f}% "
+                     f"of one core overall")
+        L.append("")
+        return "\n".join(L)
+
+    def to_prometheus(self, prefix="scanner"):
+        data = self.to_dict()
+        L = []
+
+        def metric(name, kind, help_text, samples):
+            L.append(f"# HELP {prefix}_{name} {help_text}")
+            L.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                L.append(f"{prefix}_{name}{labels} {_number(value)}")
+
+        metric("run_timestamp_seconds", "gauge", "Unix time the profiled scan started.",
+               [("", self.started)])
+        metric("run_seconds", "gauge", "Wall-clock seconds for the whole scan.", [("", data["wall"])])
+        metric("run_cpu_seconds", "gauge", "Process CPU seconds for the whole scan.", [("", data["cpu"])])
+        metric("stage_seconds", "gauge", "Wall-clock seconds per scan stage.",
+               [(f'{{stage="{n}"}}', s["wall"]) for n, s in data["stages"].items()])
+        metric("stage_cpu_seconds", "gauge", "Process CPU seconds per scan stage.",
+               [(f'{{stage="{n}"}}', s["cpu"]) for n, s in data["stages"].items()])
+        metric("tickers", "gauge", "Tickers fetched or analyzed.", [("", len(self.tickers))])
+        fetch = list(self._column("fetch").values())
+        if fetch:
+            metric("fetch_seconds", "summary", "Per-ticker fetch latency.",
+                   [(f'{{quantile="{q}"}}', _percentile(fetch, q)) for q in (0.5, 0.95, 1.0)])
+            L.append(f"{prefix}_fetch_seconds_sum {_number(sum(fetch))}")
+            L.append(f"{prefix}_fetch_seconds_count {len(fetch)}")
+        metric("throttle_seconds", "gauge", "Seconds spent waiting on provider rate limiters.",
+               [("", self._total("throttle"))])
+        metric("http_requests", "gauge", "HTTP requests made during the scan.",
+               [("", self._total("requests"))])
+        metric("http_bytes", "gauge", "Response bytes downloaded (on the wire).",
+               [("", self._total("bytes"))])
+        metric("cache_lookups", "gauge", "Bar cache lookups by result.",
+               [('{result="hit"}', self._total("cache_hit")), ('{result="miss"}', self._total("cache_miss"))])
+        return "\n".join(L) + "\n"
+
+    def write(self, path):
+        """Write JSON, or Prometheus text format if `path` ends in .prom.
+        Atomic, so a textfile collector never reads a partial file."""
+        if path.endswith(".prom"):
+            body = self.to_prometheus()
+        else:
+            body = json.dumps(self.to_dict(), indent=2) + "\n"
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
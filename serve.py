@@ -1,43 +1,392 @@
 #!/usr/bin/env python3
 """
-Simple HTTP server for the SPY Momentum Scanner frontend.
-Serves the frontend/ directory on http://localhost:8080
+HTTP server for the SPY Momentum Scanner frontend.
+Serves the frontend/ directory on http://localhost:8080, plus a small JSON API:
+
+  /api/scan/latest          latest scan (columnar format, see scan_format.py)
+  /api/signals/{ticker}     one ticker's signal and any orders for it
+  /api/portfolio            portfolio.json
+  /api/events               Server-Sent Events: a diff each time a new scan lands
+
+Files and API responses are held in memory with their gzip (and, if a fresh
+.br copy exists, brotli) encodings, and are reloaded only when the file on disk
+changes. Every response carries an ETag (one per encoding) and Last-Modified,
+so repeat polls get a body-less 304. Requests are handled on a thread per connection with HTTP/1.1
+keep-alive.
+
+A watcher thread checks latest-scan.json every WATCH_INTERVAL seconds. When
+the scanner publishes, every /api/events subscriber is sent one "diff" event
+(scan_format.diff) with the changed signals and orders. A client whose last
+event id isn't the previous scan gets a "reset" and refetches instead.
 
 Usage:
   python3 serve.py           # default port 8080
   python3 serve.py 3000      # custom port
+  python3 serve.py --quiet   # no per-request log lines
 """
 
-import http.server
 import os
-import sys
+import gzip
+import json
+import hashlib
+import argparse
+import mimetypes
+import posixpath
+import threading
+import time
+import http.server
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import scan_format
 
-PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
 DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+DATA_DIR = os.path.join(DIRECTORY, "data")
+SCAN_FILE = os.path.join(DATA_DIR, "latest-scan.json")
+PORTFOLIO_FILE = os.path.join(DATA_DIR, "portfolio.json")
+
+COMPRESSIBLE = ("application/javascript", "application/json", "text/", "image/svg+xml",
+                "application/manifest+json")
+MIN_GZIP_SIZE = 512
+
+# Scan data and the service worker must revalidate every time (a 304 is cheap);
+# the app shell and icons can sit in the browser cache for a day.
+NO_CACHE = "no-cache"
+STATIC_CACHE = "public, max-age=86400, stale-while-revalidate=604800"
+
+WATCH_INTERVAL = 0.5   # seconds between latest-scan.json checks
+HEARTBEAT = 15         # seconds between SSE keep-alive comments
+
+
+class Asset:
+    """A response body kept in memory with its encodings and validators."""
+    __slots__ = ("body", "gzip", "br", "digest", "mtime", "content_type")
+
+    def __init__(self, body, content_type, mtime, br=None):
+        self.body = body
+        self.content_type = content_type
+        self.mtime = mtime
+        self.digest = hashlib.sha1(body).hexdigest()[:20]
+        self.br = br
+        self.gzip = None
+        if len(body) >= MIN_GZIP_SIZE and content_type.startswith(COMPRESSIBLE):
+            self.gzip = gzip.compress(body, compresslevel=6, mtime=0)
+
+    def encoded(self, accepted):
+        """(body, Content-Encoding or None, ETag) for an Accept-Encoding value.
+
+        Each encoding is a different byte sequence, so it gets its own strong
+        ETag ("<hash>-gz", "<hash>-br"); a cache revalidating one never gets a
+        304 that blesses another."""
+        if self.br and "br" in accepted:
+            return self.br, "br", f'"{self.digest}-br"'
+        if self.gzip and "gzip" in accepted:
+            return self.gzip, "gzip", f'"{self.digest}-gz"'
+        return self.body, None, f'"{self.digest}"'
+
+    @classmethod
+    def from_json(cls, obj, mtime):
+        return cls(json.dumps(obj, separators=(",", ":")).encode(), "application/json", mtime)
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _fresh_br(path, mtime):
+    """Contents of path.br if it was written after path (see scan_format.write)."""
+    try:
+        if os.path.getmtime(path + ".br") >= mtime:
+            with open(path + ".br", "rb") as f:
+                return f.read()
+    except OSError:
+        pass
+    return None
+
+
+class FileCache:
+    """Static files in memory, re-read when their mtime or size changes."""
+
+    def __init__(self, root):
+        self.root = root
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        key = _stat_key(path)
+        if key is None or not os.path.isfile(path):
+            return None
+        cached = self._assets.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        with open(path, "rb") as f:
+            body = f.read()
+        mtime = key[0] / 1e9
+        ctype = "application/javascript" if path.endswith(".js") else (
+            mimetypes.guess_type(path)[0] or "application/octet-stream")
+        asset = Asset(body, ctype, mtime, br=_fresh_br(path, mtime))
+        with self._lock:
+            self._assets[path] = (key, asset)
+        return asset
+
+
+class ScanStore:
+    """API responses built from latest-scan.json and portfolio.json,
+    rebuilt only when the scanner (or trade workflow) rewrites them."""
+
+    def __init__(self, scan_file=SCAN_FILE, portfolio_file=PORTFOLIO_FILE):
+        self.scan_file = scan_file
+        self.portfolio_file = portfolio_file
+        self._lock = threading.Lock()
+        self._scan_key = self._portfolio_key = None
+        self.scan = self.portfolio = None
+        self.signals = {}
+        # Push state: current scan timestamp and the diff that produced it
+        self.changed = threading.Condition()
+        self.version = None
+        self.diff = None
+        self._decoded = None
 
+    def _reload_scan(self):
+        key = _stat_key(self.scan_file)
+        if key == self._scan_key:
+            return
+        with self._lock:
+            if key == self._scan_key:
+                return
+            if key is None:
+                self.scan, self.signals = None, {}
+            else:
+                try:
+                    with open(self.scan_file, "rb") as f:
+                        raw = f.read()
+                    scan = scan_format.decode(json.loads(raw))
+                except (OSError, ValueError) as e:
+                    # Keep serving the previous scan; retry on the next request
+                    print(f"  Could not load {self.scan_file}: {e}")
+                    return
+                mtime = key[0] / 1e9
+                orders = {}
+                for kind in ("buy_orders", "sell_orders", "manage_orders"):
+                    for o in scan.get(kind, []):
+                        orders.setdefault(o["ticker"], []).append(dict(o, kind=kind[:-7]))
+                self.signals = {
+                    s["ticker"]: Asset.from_json({
+                        "timestamp": scan.get("timestamp"),
+                        "signal": s,
+                        "orders": orders.get(s["ticker"], []),
+                    }, mtime)
+                    for s in scan.get("signals", [])
+                }
+                self.scan = Asset(raw, "application/json", mtime, br=_fresh_br(self.scan_file, mtime))
+                self._publish(scan)
+            self._scan_key = key
 
-class Handler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DIRECTORY, **kwargs)
+    def _publish(self, scan):
+        old, self._decoded = self._decoded, scan
+        if old is not None and old.get("timestamp") == scan.get("timestamp"):
+            return
+        diff = scan_format.diff(old, scan) if old is not None else None
+        with self.changed:
+            self.version = scan.get("timestamp")
+            self.diff = (diff["from"], json.dumps(diff, separators=(",", ":"))) if diff else None
+            self.changed.notify_all()
 
-    def end_headers(self):
-        # Allow Babel standalone to work with proper MIME types
+    def _reload_portfolio(self):
+        key = _stat_key(self.portfolio_file)
+        if key == self._portfolio_key:
+            return
+        with self._lock:
+            if key == self._portfolio_key:
+                return
+            if key is None:
+                self.portfolio = None
+            else:
+                with open(self.portfolio_file, "rb") as f:
+                    self.portfolio = Asset(f.read(), "application/json", key[0] / 1e9)
+            self._portfolio_key = key
+
+    def watch(self, interval=WATCH_INTERVAL):
+        """Poll the scan file forever so subscribers hear about new scans."""
+        while True:
+            self._reload_scan()
+            time.sleep(interval)
+
+    def latest(self):
+        self._reload_scan()
+        return self.scan
+
+    def signal(self, ticker):
+        self._reload_scan()
+        return self.signals.get(ticker.upper())
+
+    def get_portfolio(self):
+        self._reload_portfolio()
+        return self.portfolio
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SPYScanner/2"
+    files = FileCache(DIRECTORY)
+    store = ScanStore()
+    quiet = False
+
+    def do_GET(self):
+        self._dispatch(head=False)
+
+    def do_HEAD(self):
+        self._dispatch(head=True)
+
+    def _dispatch(self, head):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if path == "/api/events" and not head:
+            return self._events(parse_qs(url.query).get("since", [""])[0])
+        if path.startswith("/api/"):
+            asset = self._api(path)
+            cache = NO_CACHE
+        else:
+            asset, cache = self._static(path)
+        if asset is None:
+            return self._send_error(404, "Not found")
+        self._send_asset(asset, cache, head)
+
+    def _api(self, path):
+        parts = [p for p in path.split("/") if p]
+        if parts == ["api", "scan", "latest"]:
+            return self.store.latest()
+        if len(parts) == 3 and parts[:2] == ["api", "signals"]:
+            return self.store.signal(parts[2])
+        if parts == ["api", "portfolio"]:
+            return self.store.get_portfolio()
+        return None
+
+    def _events(self, since):
+        """Hold the connection open and stream scan diffs as they're published."""
+        store = self.store
+        store.latest()
+        version = self.headers.get("Last-Event-ID") or since
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
         self.send_header("Access-Control-Allow-Origin", "*")
-        super().end_headers()
+        self.end_headers()
+        try:
+            self.wfile.write(b"retry: 3000\n\n")
+            self.wfile.flush()
+            while True:
+                with store.changed:
+                    if store.version == version:
+                        store.changed.wait(HEARTBEAT)
+                    current, diff = store.version, store.diff
+                if current == version:
+                    self.wfile.write(b": ping\n\n")
+                elif diff and diff[0] == version:
+                    self.wfile.write(f"id: {current}\nevent: diff\ndata: {diff[1]}\n\n".encode())
+                else:
+                    self.wfile.write(f"id: {current}\nevent: reset\ndata: {{}}\n\n".encode())
+                self.wfile.flush()
+                version = current
+        except (BrokenPipeError, ConnectionResetError):
+            return
 
-    def guess_type(self, path):
-        if path.endswith(".js"):
-            return "application/javascript"
-        return super().guess_type(path)
+    def _static(self, path):
+        path = posixpath.normpath(path)
+        if path in ("/", "/."):
+            path = "/index.html"
+        rel = path.lstrip("/")
+        if rel.startswith("..") or any(p.startswith(".") for p in rel.split("/")):
+            return None, None
+        full = os.path.join(self.files.root, *rel.split("/"))
+        asset = self.files.get(full)
+        revalidate = full.endswith((".json", ".html", "sw.js"))
+        return asset, NO_CACHE if revalidate else STATIC_CACHE
 
+    def _not_modified(self, asset, etag):
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+            return "*" in tags or etag in tags
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                return int(asset.mtime) <= parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
 
-if __name__ == "__main__":
-    with http.server.HTTPServer(("", PORT), Handler) as httpd:
-        print(f"\n  \u25C8 SPY Momentum Scanner")
-        print(f"  Dashboard: http://localhost:{PORT}")
+    def _send_asset(self, asset, cache, head):
+        body, encoding, etag = asset.encoded(self.headers.get("Accept-Encoding", ""))
+        if self._not_modified(asset, etag):
+            self.send_response(304)
+            self._common_headers(asset, cache, etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self._common_headers(asset, cache, etag)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _common_headers(self, asset, cache, etag):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(asset.mtime, usegmt=True))
+        self.send_header("Cache-Control", cache)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Access-Control-Allow-Origin", "*")
+
+    def _send_error(self, code, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SPY Momentum Scanner — dashboard server")
+    parser.add_argument("port", nargs="?", type=int, default=8080, help="Port (default: 8080)")
+    parser.add_argument("--host", default="", help="Bind address (default: all interfaces)")
+    parser.add_argument("--quiet", action="store_true", help="No per-request log lines")
+    args = parser.parse_args()
+    Handler.quiet = args.quiet
+
+    threading.Thread(target=Handler.store.watch, daemon=True).start()
+    with Server((args.host, args.port), Handler) as httpd:
+        print(f"\n  ◈ SPY Momentum Scanner")
+        print(f"  Dashboard: http://localhost:{args.port}")
+        print(f"  API:       http://localhost:{args.port}/api/scan/latest")
+        print(f"  Live:      http://localhost:{args.port}/api/events")
         print(f"  Serving:   {DIRECTORY}")
         print(f"\n  Press Ctrl+C to stop.\n")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n  Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
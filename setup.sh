@@ -12,7 +12,7 @@ echo "================================"
 # 1. Install Python dependencies
 echo ""
 echo "[1/4] Installing Python dependencies..."
-pip install requests python-dotenv twilio pandas
+pip install -r requirements.txt twilio
 
 # 2. Create .env from template
 if [ ! -f .env ]; then
@@ -2,21 +2,30 @@
 """
 SPY Momentum Scanner — Daily Order Book Engine
 ================================================
-Scans top 15 SPY holdings → generates explicit BUY/SELL orders each morning.
-Allocates portfolio % across multiple setups, tracks open positions, and
-texts you exactly what to do.
+Scans the top SPY holdings (or any --universe file) → generates explicit
+BUY/SELL/MANAGE orders each morning. Sizes new buys across setups by risk
+(correlation, sector caps), tracks open positions, and texts you exactly
+what to do.
 
 Usage:
-  python spy_momentum_scanner.py                    # console scan
+  python spy_momentum_scanner.py                    # console scan of WATCHLIST
   python spy_momentum_scanner.py --sms              # scan + text alert
   python spy_momentum_scanner.py --weekly            # Sunday deep review
   python spy_momentum_scanner.py --account 50000     # custom account size
+  python spy_momentum_scanner.py --universe sp500.csv  # scan a constituents file
+  python spy_momentum_scanner.py --accounts accounts.json  # one scan, orders per account
+  python spy_momentum_scanner.py --intraday          # add 15m/1h trend votes
+  python spy_momentum_scanner.py --daemon --sms      # intraday polling, alert on changed orders
+  python spy_momentum_scanner.py --profile           # stage/ticker timings to stderr
+  python spy_momentum_scanner.py --show-last         # reprint the last scan, no fetching
+  python spy_momentum_scanner.py --history NVDA      # a ticker's logged signals/orders
 
 Cron (6 AM PST Mon-Fri):
   0 6 * * 1-5 cd /path/to/scanner && python3 spy_momentum_scanner.py --sms --json >> scanner.log 2>&1
 
 Requirements:
-  pip install requests python-dotenv twilio pandas
+  pip install -r requirements.txt   # requests, python-dotenv, pandas, numpy
+  pip install twilio                # optional — for SMS alerts
 
 .env file:
   POLYGON_API_KEY=your_key        # or leave blank to auto-use Yahoo Finance
@@ -28,20 +37,50 @@ Requirements:
 
 import os
 import sys
+import csv
 import json
 import time
+import random
 import argparse
 import logging
-import tempfile
+import sqlite3
+import threading
+import importlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, astuple, field, fields, replace
 from typing import Optional
+from zoneinfo import ZoneInfo
 
-import requests
-import numpy as np
-import pandas as pd
 from dotenv import load_dotenv
 
+import scan_format
+import scan_profile
+import portfolio_store
+
+
+class _LazyModule:
+    """Stands in for a heavy module until its first attribute access, then
+    imports it and replaces itself in this module's globals.
+
+    numpy, pandas and requests make up most of the scanner's start-up time,
+    and paths like --show-last and --history never use them. The import
+    lock makes the first access safe from fetch worker threads."""
+
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+np = _LazyModule("numpy", "np")
+pd = _LazyModule("pandas", "pd")
+requests = _LazyModule("requests", "requests")
+
 load_dotenv()
 
 
@@ -61,6 +100,9 @@ class NumpyEncoder(json.JSONEncoder):
 # ─── CONFIG ──────────────────────────────────────────────────────────────────────
 
 POLYGON_API_KEY = os.getenv("POLYGON_API_KEY", "")
+POLYGON_RATE_LIMIT = float(os.getenv("POLYGON_RATE_LIMIT", "4"))  # req/sec (free tier: 0.083)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "8"))    # keep-alive connections per host
+HTTP2 = os.getenv("HTTP2", "").lower() in ("1", "true", "yes")  # needs `pip install h2`
 TWILIO_SID = os.getenv("TWILIO_ACCOUNT_SID", "")
 TWILIO_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
 TWILIO_FROM = os.getenv("TWILIO_FROM_NUMBER", "")
@@ -85,6 +127,10 @@ WATCHLIST = [
 ]
 
 SPY_TICKER = "SPY"
+SPY_INFO = {"ticker": SPY_TICKER, "name": "S&P 500", "weight": 100, "sector": "Index"}
+MARKET_TZ = ZoneInfo("America/New_York")
+
+WATCHLIST_DISPLAY_LIMIT = 40  # rows in the FULL WATCHLIST table for large universes
 
 # Strategy parameters
 EMA_FAST = 8
@@ -98,10 +144,34 @@ RISK_PCT = 0.02           # 2% risk per individual trade
 MAX_PORTFOLIO_RISK = 0.10 # 10% max total portfolio at risk
 MAX_POSITIONS = 5         # max simultaneous open positions
 ACCOUNT_SIZE = 1000       # default — override with --account
+DAEMON_INTERVAL = 60      # seconds between intraday polls in --daemon mode
+DAEMON_ALERT_MOVE = 0.01  # re-alert an order once its stop or target moves this far (1%)
+
+# Multi-timeframe confirmation — weekly bars are resampled from the daily bars,
+# 1h from 15m (--intraday), so no timeframe costs a download of its own
+MTF_WEIGHT = 10           # conviction points for full alignment (taken away when opposed)
+MTF_MIN_BARS = 10         # bars a timeframe needs before it gets a vote
+INTRADAY_MINUTES = 15     # --intraday bar size
+INTRADAY_DAYS = 5         # calendar days of intraday history per ticker
+
+# Allocator — covariance of daily log returns over this many sessions
+COV_WINDOW = 60
+COV_MIN_RETURNS = 20      # fewer returns than this → treated as unknown (median vol, no correlation)
+COV_SHRINK = 0.1          # pull covariances this far toward zero when sizing (keeps Σ invertible)
+
+GROUPED_MIN_TICKERS = 50  # Polygon universes this large ingest via grouped-daily
+
+# Bar cache staleness policy
+CACHE_FRESH_MINUTES = 30     # serve straight from cache if topped up this recently
+CACHE_FULL_REFRESH_DAYS = 7  # re-download the full window weekly (split/dividend adjustments)
+CACHE_ADJUST_TOLERANCE = 1e-3  # re-downloaded closes this far off the cached ones → history was re-adjusted
+SPLIT_SUSPECT_MOVE = 0.2     # grouped close this far (either way) from the last cached one → maybe a split
 
 # Resolve paths relative to the script location
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PORTFOLIO_FILE = os.path.join(SCRIPT_DIR, "frontend", "data", "portfolio.json")
+PORTFOLIO_JOURNAL = os.path.join(SCRIPT_DIR, "portfolio.jsonl")
+BAR_CACHE_FILE = os.path.join(SCRIPT_DIR, "cache", "bars.sqlite")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -110,42 +180,203 @@ logging.basicConfig(
 )
 log = logging.getLogger("scanner")
 
+# Per-stage/per-ticker timings — records nothing unless --profile enables it
+PROFILE = scan_profile.Profiler()
+
 
 # ─── DATA MODELS ─────────────────────────────────────────────────────────────────
 
-@dataclass
+@dataclass(frozen=True)
+class StrategyConfig:
+    """Tunable strategy constants. Defaults are the module-level parameters
+    above; the optimizer sweeps modified copies (dataclasses.replace)."""
+    ema_fast: int = EMA_FAST
+    ema_mid: int = EMA_MID
+    ema_slow: int = EMA_SLOW
+    rsi_period: int = RSI_PERIOD
+    rsi_overbought: float = RSI_OVERBOUGHT
+    rsi_oversold: float = RSI_OVERSOLD
+    risk_pct: float = RISK_PCT
+    max_portfolio_risk: float = MAX_PORTFOLIO_RISK
+    max_positions: int = MAX_POSITIONS
+    pullback_low: float = -1.5    # PULLBACK BUY band: pullback_low < dist_to_8 < pullback_high
+    pullback_high: float = 0.5    # (mirrored for PULLBACK SELL)
+    vol_quiet: float = 1.0        # vol_ratio below this = declining volume
+    vol_surge: float = 1.3        # vol_ratio above this = volume surge
+    max_correlation: float = 0.8  # skip a buy this correlated with a holding or earlier pick
+    max_sector_pct: float = 0.4   # cap on one sector's share of the account (held + new)
+    vol_target: float = 0.0       # annualized portfolio volatility cap (0 = off)
+
+
+DEFAULT_STRATEGY = StrategyConfig()
+
+
+# StockSignal fields → NumPy dtype, in the order scans are serialized.
+# "signal" and "action_note" follow from signal_strength (SIGNAL_TYPES), so a
+# SignalTable only stores them when it was loaded from a saved scan.
+SIGNAL_FIELDS = {
+    "ticker": "O", "name": "O", "weight": "f8", "sector": "O",
+    "current_price": "f8", "ema8": "f8", "ema21": "f8", "ema50": "f8",
+    "rsi": "f8", "vol_ratio": "f8", "change_1d": "f8", "change_5d": "f8", "change_20d": "f8",
+    "bull_stacked": "?", "bear_stacked": "?",
+    "ema_spread": "f8", "dist_to_8": "f8", "dist_to_21": "f8",
+    "is_pullback_buy": "?", "is_pullback_sell": "?",
+    "signal": "O", "signal_strength": "i1", "action_note": "O",
+    "stop_loss": "f8", "target_1": "f8", "target_2": "f8",
+    "risk_per_share": "f8", "position_size": "i8",
+    "support": "f8", "resistance": "f8", "conviction_score": "f8",
+    "mtf_alignment": "f8",
+}
+
+# signal_strength → (signal, action note template over the row's fields)
+SIGNAL_TYPES = {
+    5: ("PULLBACK BUY", "Price at 8 EMA (${ema8:.2f}) in uptrend + declining vol ({vol_ratio:.1f}x). A+ call entry."),
+    4: ("STRONG BUY", "Bull stack + volume surge ({vol_ratio:.1f}x). Enter calls on intraday dip."),
+    3: ("BUY", "Trend up, EMAs stacked. Wait for pullback to 8 EMA (${ema8:.2f})."),
+    2: ("LEAN BULL", "Developing bullish trend. Wait for full EMA stack."),
+    0: ("NEUTRAL", "No trend — EMAs tangled. Stay flat."),
+    -2: ("LEAN BEAR", "Bearish momentum developing. Wait for full stack."),
+    -3: ("SELL", "Trend down. Wait for bounce to 8 EMA (${ema8:.2f}) for puts."),
+    -4: ("STRONG SELL", "Bear stack + volume surge ({vol_ratio:.1f}x). Enter puts on bounce."),
+    -5: ("PULLBACK SELL", "Price at 8 EMA (${ema8:.2f}) in downtrend + low vol ({vol_ratio:.1f}x). A+ put entry."),
+}
+
+
+class SignalTable:
+    """A scan's StockSignals stored column-wise: one NumPy array per field.
+
+    Sorting, filtering, regime counts and serialization work on whole
+    columns. Iterating, or indexing with an int, yields StockSignal row views
+    for code that handles one signal at a time; indexing with a slice, mask
+    or index array returns a smaller table.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, rows):
+        """Row dicts (asdict-style, e.g. from a saved scan) → table."""
+        columns = {}
+        for name, dtype in SIGNAL_FIELDS.items():
+            if name in ("signal", "action_note") and not (rows and name in rows[0]):
+                continue
+            default = "" if dtype == "O" else 0
+            columns[name] = np.array([r.get(name, default) for r in rows], dtype=dtype)
+        return cls(columns)
+
+    @classmethod
+    def of(cls, signals):
+        """`signals` as a table: a SignalTable as-is, a list of StockSignals gathered."""
+        if isinstance(signals, cls):
+            return signals
+        return cls.from_records([s.to_dict() for s in signals])
+
+    def __len__(self):
+        return len(self.columns["ticker"])
+
+    def __iter__(self):
+        return (StockSignal(self, i) for i in range(len(self)))
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            n = len(self)
+            if not -n <= key < n:
+                raise IndexError("signal index out of range")
+            return StockSignal(self, int(key) % n)
+        return SignalTable({name: col[key] for name, col in self.columns.items()})
+
+    def column(self, name):
+        col = self.columns.get(name)
+        if col is None:
+            if name == "signal":
+                names = np.array([SIGNAL_TYPES.get(k, ("",))[0] for k in range(-5, 6)], dtype=object)
+                col = names[self.columns["signal_strength"].astype(int) + 5]
+            elif name == "action_note":
+                col = np.array([self.note(i) for i in range(len(self))], dtype=object)
+            else:
+                raise KeyError(name)
+            self.columns[name] = col
+        return col
+
+    def note(self, i):
+        c = self.columns
+        if "action_note" in c:
+            return c["action_note"][i]
+        # build_signals keeps the unrounded inputs so notes read as they always have
+        ema8, vol_ratio = c.get("_ema8", c["ema8"]), c.get("_vol_ratio", c["vol_ratio"])
+        return SIGNAL_TYPES[int(c["signal_strength"][i])][1].format(ema8=ema8[i], vol_ratio=vol_ratio[i])
+
+    def where(self, mask):
+        return self[np.asarray(mask, dtype=bool)]
+
+    def sort(self, by, descending=False):
+        """Stable sort on a numeric column (ties keep their order, like sorted())."""
+        col = self.column(by)
+        return self[np.argsort(-col if descending else col, kind="stable")]
+
+    def top(self, by, k):
+        """The k rows with the largest `by`, same as sort(by, descending=True)[:k]
+        but without sorting the whole table."""
+        col = self.column(by)
+        if k < len(col):
+            kth = np.partition(col, len(col) - k)[len(col) - k] if k > 0 else np.inf
+            rows = np.flatnonzero(col >= kth)
+            return self[rows[np.argsort(-col[rows], kind="stable")[:k]]]
+        return self.sort(by, descending=True)
+
+    def for_account(self, account_size, risk_pct):
+        """The same signals sized for another account — only position_size
+        depends on account size, so every other column is shared."""
+        rps = self.columns.get("_risk_per_share", self.columns["risk_per_share"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            size = np.where(rps > 0, np.trunc(account_size * risk_pct / rps), 0)
+        return SignalTable({**self.columns, "position_size": np.nan_to_num(size, nan=0.0).astype(np.int64)})
+
+    def to_columns(self):
+        """{field: [values]} with plain Python values — scan_format's layout."""
+        return {name: self.column(name).tolist() for name in SIGNAL_FIELDS}
+
+    def to_records(self):
+        cols = self.to_columns()
+        return [dict(zip(cols, vals)) for vals in zip(*cols.values())]
+
+
 class StockSignal:
-    ticker: str
-    name: str
-    weight: float
-    sector: str
-    current_price: float
-    ema8: float
-    ema21: float
-    ema50: float
-    rsi: float
-    vol_ratio: float
-    change_1d: float
-    change_5d: float
-    change_20d: float
-    bull_stacked: bool
-    bear_stacked: bool
-    ema_spread: float
-    dist_to_8: float
-    dist_to_21: float
-    is_pullback_buy: bool
-    is_pullback_sell: bool
-    signal: str
-    signal_strength: int
-    action_note: str
-    stop_loss: float
-    target_1: float
-    target_2: float
-    risk_per_share: float
-    position_size: int
-    support: float
-    resistance: float
-    conviction_score: float = 0.0
+    """One row of a SignalTable, with the old dataclass's attribute access.
+
+    StockSignal(ticker=..., name=..., ...) builds a standalone one-row table.
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table=None, row=0, **fields):
+        if table is None:
+            table, row = SignalTable.from_records([fields]), 0
+        self.table = table
+        self.row = row
+
+    def __getattr__(self, name):
+        if name not in SIGNAL_FIELDS:
+            raise AttributeError(name)
+        if name == "action_note":
+            return self.table.note(self.row)
+        return self.table.column(name).item(self.row)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in SIGNAL_FIELDS}
+
+    def _key(self):
+        # Field values with NaN as None, so a row equals (and hashes like) itself
+        return tuple(None if v != v else v for v in self.to_dict().values())
+
+    def __eq__(self, other):
+        return isinstance(other, StockSignal) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"StockSignal({self.ticker}, {self.signal}, conviction={self.conviction_score})"
 
 
 @dataclass
@@ -179,43 +410,60 @@ class MarketRegime:
     description: str
     regime_multiplier: float
     spy_above_21ema: Optional[bool] = None
+    weighted_bull_pct: Optional[float] = None
+
 
+# ─── UNIVERSE ───────────────────────────────────────────────────────────────────
 
-# ─── POSITION TRACKER (reads/writes frontend/data/portfolio.json) ──────────────
+def load_universe(path):
+    """Load a constituents file into WATCHLIST-style dicts.
 
-def _load_portfolio() -> dict:
-    """Load the full portfolio.json (starting_cash, positions, history)."""
-    if os.path.exists(PORTFOLIO_FILE):
+    CSV needs a header row; JSON is a list of objects or {"constituents": [...]}.
+    Only `ticker` is required — name defaults to the ticker, weight to 0 and
+    sector to "Other". Duplicates and blank rows are dropped.
+    """
+    with open(path, newline="") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+            if isinstance(rows, dict):
+                rows = rows.get("constituents", [])
+        else:
+            rows = list(csv.DictReader(f))
+
+    stocks, seen = [], set()
+    for row in rows:
+        row = {str(k).strip().lower(): v for k, v in row.items() if k}
+        ticker = str(row.get("ticker") or row.get("symbol") or "").strip().upper()
+        if not ticker or ticker in seen:
+            continue
+        seen.add(ticker)
         try:
-            with open(PORTFOLIO_FILE, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
-    return {"starting_cash": 1000, "positions": [], "history": []}
-
-
-def _save_portfolio(portfolio: dict):
-    """Atomically write portfolio.json."""
-    dir_name = os.path.dirname(os.path.abspath(PORTFOLIO_FILE))
-    os.makedirs(dir_name, exist_ok=True)
-    fd, tmp_path = tempfile.mkstemp(dir=dir_name, suffix=".tmp")
-    try:
-        with os.fdopen(fd, "w") as f:
-            json.dump(portfolio, f, indent=2, cls=NumpyEncoder)
-            f.write("\n")
-        os.replace(tmp_path, PORTFOLIO_FILE)
-    except Exception:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-        raise
+            weight = float(row.get("weight") or 0)
+        except ValueError:
+            weight = 0.0
+        stocks.append({
+            "ticker": ticker,
+            "name": str(row.get("name") or ticker).strip(),
+            "weight": weight,
+            "sector": str(row.get("sector") or "Other").strip(),
+        })
+    return stocks
+
+
+# ─── POSITION TRACKER (portfolio.jsonl journal → portfolio.json) ────────────────
+
+def open_portfolio():
+    """The PortfolioStore behind portfolio.json — the same API trade.yml uses."""
+    return portfolio_store.PortfolioStore(PORTFOLIO_JOURNAL, PORTFOLIO_FILE)
 
 
-def load_positions() -> dict:
-    """Load positions from portfolio.json, converting to scanner dict format.
+def load_positions(store=None) -> dict:
+    """Load open positions from the portfolio journal, converting to scanner dict format.
+    `store` is a PortfolioStore (default: open_portfolio()).
 
     Returns dict keyed by ticker: {entry_price, shares, stop_loss, target, direction, dollar_amount}
     """
-    portfolio = _load_portfolio()
+    portfolio = (store or open_portfolio()).load()
     positions = {}
     for p in portfolio.get("positions", []):
         ticker = p.get("ticker", "")
@@ -233,103 +481,902 @@ def load_positions() -> dict:
     return positions
 
 
-def add_position(ticker, entry_price, shares, stop_loss, target, direction, dollar_amount):
-    portfolio = _load_portfolio()
-    portfolio["positions"].append({
-        "id": int(datetime.now().timestamp() * 1000),
-        "ticker": ticker,
-        "buyPrice": entry_price,
-        "shares": shares,
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "cost": round(entry_price * shares, 2),
-        "stopLoss": stop_loss,
-        "target": target,
-    })
-    _save_portfolio(portfolio)
+# ─── DATA CLIENTS ───────────────────────────────────────────────────────────────
 
+def fetch_errors():
+    """Errors a provider request can raise: transport/HTTP failures and
+    malformed payloads. A function so that importing the scanner doesn't
+    import requests."""
+    return (requests.exceptions.RequestException, KeyError, IndexError, TypeError, ValueError)
 
-def remove_position(ticker):
-    portfolio = _load_portfolio()
-    portfolio["positions"] = [p for p in portfolio["positions"] if p.get("ticker") != ticker]
-    _save_portfolio(portfolio)
 
+class _ConnTimes(threading.local):
+    tcp = 0.0       # set by the connection when it dials (0 on a reused socket)
+    connect = 0.0   # TCP + TLS handshake
+
+
+_conn_times = _ConnTimes()
+
+
+def _timed_connection(base):
+    """Subclass a urllib3 connection class to record dial and handshake times."""
+    class TimedConnection(base):
+        def _new_conn(self):
+            t0 = time.perf_counter()
+            sock = super()._new_conn()
+            _conn_times.tcp = time.perf_counter() - t0
+            return sock
+
+        def connect(self):
+            t0 = time.perf_counter()
+            super().connect()
+            _conn_times.connect = time.perf_counter() - t0
+
+    return TimedConnection
+
+
+def _timed_adapter(**kwargs):
+    """requests HTTPAdapter whose connection pools use timed connections."""
+    class TimedAdapter(requests.adapters.HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+            self.poolmanager.pool_classes_by_scheme = {
+                scheme: type(f"Timed{pool.__name__}", (pool,),
+                             {"ConnectionCls": _timed_connection(pool.ConnectionCls)})
+                for scheme, pool in (("http", HTTPConnectionPool), ("https", HTTPSConnectionPool))
+            }
+
+    return TimedAdapter(**kwargs)
+
+
+class HttpPool:
+    """One keep-alive requests.Session shared by every data client.
+
+    Connections are pooled per host (pool_size each, matched to fetch
+    concurrency in main) and reused across tickers and providers. Responses
+    are decompressed transparently: gzip/deflate always, plus br/zstd when the
+    brotli/zstandard packages are installed. HTTP2=1 in .env switches to
+    urllib3's HTTP/2 support when `h2` is installed.
+
+    Each get() records where its time went, per provider:
+      connect  — TCP dial (0 when a pooled connection was reused)
+      tls      — TLS handshake
+      wait     — request sent → response headers received
+      transfer — reading and decoding the body
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, http2=HTTP2):
+        self.pool_size = pool_size
+        self.http2 = http2
+        self._session = None
+        self._lock = threading.Lock()
+        self.timings = {}
+
+    @property
+    def session(self):
+        # Built on first request, so runs that never hit the network don't import requests
+        with self._lock:
+            if self._session is None:
+                if self.http2:
+                    try:
+                        import urllib3.http2
+                        urllib3.http2.inject_into_urllib3()
+                    except ImportError:
+                        log.warning("HTTP2=1 needs `pip install h2` — using HTTP/1.1")
+                self._session = requests.Session()
+                self._mount()
+            return self._session
+
+    def _mount(self):
+        adapter = _timed_adapter(pool_connections=4, pool_maxsize=self.pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def resize(self, pool_size):
+        if pool_size == self.pool_size:
+            return
+        self.pool_size = pool_size
+        if self._session is not None:
+            self._mount()
+
+    def get(self, provider, url, **kwargs):
+        _conn_times.tcp = _conn_times.connect = 0.0
+        t0 = time.perf_counter()
+        resp = self.session.get(url, **kwargs)
+        total = time.perf_counter() - t0
+        headers = resp.elapsed.total_seconds()
+        tcp, connect = _conn_times.tcp, _conn_times.connect
+        row = (tcp, max(connect - tcp, 0.0), max(headers - connect, 0.0), max(total - headers, 0.0),
+               int(resp.headers.get("Content-Length") or len(resp.content)), len(resp.content))
+        with self._lock:
+            self.timings.setdefault(provider, []).append(row)
+        PROFILE.add(requests=1, bytes=row[4])
+        return resp
+
+    def format_timings(self):
+        L = [f"  {'PROVIDER':<10}{'REQ':>6}{'NEW CONN':>10}{'CONNECT':>9}{'TLS':>7}{'WAIT':>7}"
+             f"{'XFER':>7}{'WIRE':>9}{'DECODED':>9}   (means)"]
+        with self._lock:
+            for provider, rows in self.timings.items():
+                a = np.array(rows)
+                new = a[:, 0] > 0
+                L.append(f"  {provider:<10}{len(a):>6}{int(new.sum()):>10}"
+                         f"{a[new, 0].mean() * 1000 if new.any() else 0:>7.0f}ms"
+                         f"{a[new, 1].mean() * 1000 if new.any() else 0:>5.0f}ms"
+                         f"{a[:, 2].mean() * 1000:>5.0f}ms{a[:, 3].mean() * 1000:>5.0f}ms"
+                         f"{a[:, 4].sum() / 1e6:>7.1f}MB{a[:, 5].sum() / 1e6:>7.1f}MB")
+        return "\n".join(L)
+
+
+HTTP = HttpPool()
+
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter.
+
+    Holds up to `burst` tokens and refills at `rate` tokens/second. Each
+    acquire() takes one token, sleeping (outside the lock) until one is free.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    if waited:
+                        PROFILE.add(throttle=waited)
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
 
-# ─── DATA CLIENTS ───────────────────────────────────────────────────────────────
 
 class PolygonClient:
+    PROVIDER = "polygon"
     BASE_URL = "https://api.polygon.io"
+    RATE_LIMIT = POLYGON_RATE_LIMIT  # requests/second sustained
+    RATE_BURST = 4        # requests allowed back-to-back
+    MAX_WORKERS = 4       # concurrent fetches
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, http=None):
         self.api_key = api_key
-        self.session = requests.Session()
-        self.session.params = {"apiKey": self.api_key}
+        self.http = http or HTTP
+        self.limiter = TokenBucket(self.RATE_LIMIT, self.RATE_BURST)
 
-    def get_daily_bars(self, ticker, days=LOOKBACK_DAYS):
+    def _get(self, url, params, timeout=15):
+        return self.http.get(self.PROVIDER, url, params={**params, "apiKey": self.api_key}, timeout=timeout)
+
+    def fetch_daily_bars(self, ticker, days=LOOKBACK_DAYS, start=None):
+        """Like get_daily_bars, but request/parse errors propagate (fetch_errors())."""
         end_date = datetime.now().strftime("%Y-%m-%d")
-        start_date = (datetime.now() - timedelta(days=days + 30)).strftime("%Y-%m-%d")
+        start = start or datetime.now() - timedelta(days=days + 30)
+        start_date = start.strftime("%Y-%m-%d")
         url = f"{self.BASE_URL}/v2/aggs/ticker/{ticker}/range/1/day/{start_date}/{end_date}"
         params = {"adjusted": "true", "sort": "asc", "limit": days + 30}
+        resp = self._get(url, params)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("resultsCount", 0) == 0:
+            return pd.DataFrame()
+        df = pd.DataFrame(data.get("results", []))
+        df = df.rename(columns={"o": "open", "h": "high", "l": "low", "c": "close", "v": "volume", "t": "timestamp"})
+        df["date"] = pd.to_datetime(df["timestamp"], unit="ms")
+        df = df.sort_values("date").reset_index(drop=True)
+        if len(df) > days:
+            df = df.tail(days).reset_index(drop=True)
+        return df[["date", "open", "high", "low", "close", "volume"]]
+
+    def get_daily_bars(self, ticker, days=LOOKBACK_DAYS, start=None):
         try:
-            resp = self.session.get(url, params=params, timeout=15)
+            return self.fetch_daily_bars(ticker, days, start)
+        except fetch_errors() as e:
+            log.error(f"Polygon error for {ticker}: {type(e).__name__}")
+            return pd.DataFrame()
+
+    def get_intraday_bar(self, ticker):
+        """Today's regular-session bar so far, aggregated from minute bars.
+        Returns {open, high, low, close, volume} or None."""
+        day = datetime.now(MARKET_TZ).strftime("%Y-%m-%d")
+        url = f"{self.BASE_URL}/v2/aggs/ticker/{ticker}/range/1/minute/{day}/{day}"
+        try:
+            resp = self._get(url, {"adjusted": "true", "sort": "asc", "limit": 50000})
+            resp.raise_for_status()
+            results = resp.json().get("results") or []
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(f"Polygon intraday error for {ticker}: {type(e).__name__}")
+            return None
+        session = [r for r in results if _in_session(r["t"] / 1000)]
+        if not session:
+            return None
+        return {"open": session[0]["o"], "high": max(r["h"] for r in session),
+                "low": min(r["l"] for r in session), "close": session[-1]["c"],
+                "volume": sum(r["v"] for r in session)}
+
+    def get_intraday_bars(self, ticker, minutes=INTRADAY_MINUTES, days=INTRADAY_DAYS):
+        """Regular-session `minutes`-minute bars for the last `days` calendar
+        days, as a daily-bars-shaped DataFrame (empty on failure)."""
+        end = datetime.now(MARKET_TZ)
+        start = (end - timedelta(days=days)).strftime("%Y-%m-%d")
+        url = f"{self.BASE_URL}/v2/aggs/ticker/{ticker}/range/{minutes}/minute/{start}/{end:%Y-%m-%d}"
+        try:
+            resp = self._get(url, {"adjusted": "true", "sort": "asc", "limit": 50000})
+            resp.raise_for_status()
+            results = resp.json().get("results") or []
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(f"Polygon intraday error for {ticker}: {type(e).__name__}")
+            return pd.DataFrame()
+        session = [r for r in results if _in_session(r["t"] / 1000, any_day=True)]
+        if not session:
+            return pd.DataFrame()
+        return pd.DataFrame({
+            "date": pd.to_datetime([r["t"] for r in session], unit="ms"),
+            "open": [r["o"] for r in session], "high": [r["h"] for r in session],
+            "low": [r["l"] for r in session], "close": [r["c"] for r in session],
+            "volume": [r["v"] for r in session],
+        })
+
+    def get_grouped_daily(self, day):
+        """Every US stock's bar for one trading day in a single request.
+
+        Returns a DataFrame with a `ticker` column (empty on weekends/holidays),
+        or None if the request failed.
+        """
+        url = f"{self.BASE_URL}/v2/aggs/grouped/locale/us/market/stocks/{day}"
+        try:
+            resp = self._get(url, {"adjusted": "true"}, timeout=30)
             resp.raise_for_status()
             data = resp.json()
-            if data.get("resultsCount", 0) == 0:
-                return pd.DataFrame()
-            df = pd.DataFrame(data.get("results", []))
-            df = df.rename(columns={"o": "open", "h": "high", "l": "low", "c": "close", "v": "volume", "t": "timestamp"})
-            df["date"] = pd.to_datetime(df["timestamp"], unit="ms")
-            df = df.sort_values("date").reset_index(drop=True)
-            if len(df) > days:
-                df = df.tail(days).reset_index(drop=True)
-            return df[["date", "open", "high", "low", "close", "volume"]]
-        except requests.exceptions.RequestException as e:
-            log.error(f"Polygon error for {ticker}: {type(e).__name__}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(f"Polygon grouped error for {day}: {type(e).__name__}")
+            return None
+        if data.get("resultsCount", 0) == 0:
             return pd.DataFrame()
+        df = pd.DataFrame(data.get("results", []))
+        df = df.rename(columns={"T": "ticker", "o": "open", "h": "high", "l": "low",
+                                "c": "close", "v": "volume", "t": "timestamp"})
+        df["date"] = pd.to_datetime(df["timestamp"], unit="ms")
+        return df.dropna(subset=["close"])[["ticker", "date", "open", "high", "low", "close", "volume"]]
+
+    def ingest_grouped(self, cache, days=LOOKBACK_DAYS + 30, refresh=False):
+        """Backfill the bar store from grouped-daily responses — one request per
+        trading day regardless of how many tickers are scanned. Days already
+        ingested are skipped, so a daily run costs a single request.
+
+        Grouped bars are split-adjusted as of the day they were fetched, so a
+        split leaves the cached history unadjusted. A ticker whose close jumps
+        by SPLIT_SUSPECT_MOVE or more against its last cached close is
+        flagged, and CachedClient re-downloads its full window per ticker
+        (dropping the stale history, see BarCache.store). refresh=True
+        (--refresh-cache) re-ingests the whole window. Returns the number of
+        requests made.
+        """
+        today = datetime.now().date()
+        done = set() if refresh else cache.grouped_days(self.PROVIDER)
+        pending = [
+            d.strftime("%Y-%m-%d")
+            for d in (today - timedelta(days=n) for n in range(days, -1, -1))
+            if d.weekday() < 5 and d.strftime("%Y-%m-%d") not in done
+        ]
+        suspects = set()
+        for day in pending:
+            self.rate_limit_pause()
+            df = self.get_grouped_daily(day)
+            if df is None:
+                continue
+            # Today's bar may be missing or partial — fetch it again next run
+            suspects.update(cache.store_grouped(self.PROVIDER, day, df, final=day != today.strftime("%Y-%m-%d")))
+        log.info(f"Grouped ingest: {len(pending)} day(s) fetched")
+        if suspects:
+            log.info(f"Grouped ingest: {len(suspects)} ticker(s) flagged for a full re-download (possible split)")
+        return len(pending)
 
     def rate_limit_pause(self):
-        time.sleep(0.25)
+        self.limiter.acquire()
 
 
 class YahooClient:
-    def get_daily_bars(self, ticker, days=LOOKBACK_DAYS):
+    PROVIDER = "yahoo"
+    BASE_URL = "https://query1.finance.yahoo.com"
+    RATE_LIMIT = 2.0
+    RATE_BURST = 4
+    MAX_WORKERS = 4
+
+    def __init__(self, http=None):
+        self.http = http or HTTP
+        self.limiter = TokenBucket(self.RATE_LIMIT, self.RATE_BURST)
+
+    def _get(self, url, params, timeout=15):
+        return self.http.get(self.PROVIDER, url, params=params, headers={"User-Agent": "Mozilla/5.0"},
+                             timeout=timeout)
+
+    def fetch_daily_bars(self, ticker, days=LOOKBACK_DAYS, start=None):
+        """Like get_daily_bars, but request/parse errors propagate (fetch_errors())."""
         yahoo_ticker = ticker.replace(".", "-")
         end_ts = int(datetime.now().timestamp())
-        start_ts = int((datetime.now() - timedelta(days=days + 30)).timestamp())
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{yahoo_ticker}"
+        start = start or datetime.now() - timedelta(days=days + 30)
+        start_ts = int(start.timestamp())
+        url = f"{self.BASE_URL}/v8/finance/chart/{yahoo_ticker}"
         params = {"period1": start_ts, "period2": end_ts, "interval": "1d", "includeAdjustedClose": "true"}
+        resp = self._get(url, params)
+        resp.raise_for_status()
+        data = resp.json()
+        chart = data.get("chart", {})
+        results = chart.get("result")
+        if not results:
+            log.error(f"No chart results for {ticker}")
+            return pd.DataFrame()
+        result = results[0]
+        if "timestamp" not in result:
+            log.error(f"No timestamp data for {ticker}")
+            return pd.DataFrame()
+        indicators = result.get("indicators", {})
+        quotes_list = indicators.get("quote")
+        if not quotes_list:
+            log.error(f"No quote data for {ticker}")
+            return pd.DataFrame()
+        quotes = quotes_list[0]
+        df = pd.DataFrame({
+            "date": pd.to_datetime(result["timestamp"], unit="s"),
+            "open": quotes["open"], "high": quotes["high"],
+            "low": quotes["low"], "close": quotes["close"], "volume": quotes["volume"],
+        }).dropna(subset=["close"]).reset_index(drop=True)
+        if len(df) > days:
+            df = df.tail(days).reset_index(drop=True)
+        return df
+
+    def get_daily_bars(self, ticker, days=LOOKBACK_DAYS, start=None):
         try:
-            resp = requests.get(url, params=params, headers={"User-Agent": "Mozilla/5.0"}, timeout=15)
+            return self.fetch_daily_bars(ticker, days, start)
+        except fetch_errors() as e:
+            log.error(f"Yahoo error for {ticker}: {type(e).__name__}: {e}")
+            return pd.DataFrame()
+
+    def get_intraday_bar(self, ticker):
+        """Today's regular-session bar so far, aggregated from minute bars.
+        Returns {open, high, low, close, volume} or None."""
+        url = f"{self.BASE_URL}/v8/finance/chart/{ticker.replace('.', '-')}"
+        params = {"range": "1d", "interval": "1m"}
+        try:
+            resp = self._get(url, params)
             resp.raise_for_status()
-            data = resp.json()
-            chart = data.get("chart", {})
-            results = chart.get("result")
-            if not results:
-                log.error(f"No chart results for {ticker}")
-                return pd.DataFrame()
-            result = results[0]
-            if "timestamp" not in result:
-                log.error(f"No timestamp data for {ticker}")
-                return pd.DataFrame()
-            indicators = result.get("indicators", {})
-            quotes_list = indicators.get("quote")
-            if not quotes_list:
-                log.error(f"No quote data for {ticker}")
-                return pd.DataFrame()
-            quotes = quotes_list[0]
+            result = resp.json()["chart"]["result"][0]
+            quote = result["indicators"]["quote"][0]
+            rows = [
+                (o, h, l, c, v)
+                for ts, o, h, l, c, v in zip(result["timestamp"], quote["open"], quote["high"],
+                                             quote["low"], quote["close"], quote["volume"])
+                if c is not None and _in_session(ts)
+            ]
+        except (requests.exceptions.RequestException, KeyError, IndexError, TypeError, ValueError) as e:
+            log.error(f"Yahoo intraday error for {ticker}: {type(e).__name__}")
+            return None
+        if not rows:
+            return None
+        return {"open": rows[0][0], "high": max(r[1] for r in rows), "low": min(r[2] for r in rows),
+                "close": rows[-1][3], "volume": sum(r[4] or 0 for r in rows)}
+
+    def get_intraday_bars(self, ticker, minutes=INTRADAY_MINUTES, days=INTRADAY_DAYS):
+        """Regular-session `minutes`-minute bars for the last `days` calendar
+        days, as a daily-bars-shaped DataFrame (empty on failure)."""
+        url = f"{self.BASE_URL}/v8/finance/chart/{ticker.replace('.', '-')}"
+        end = datetime.now()
+        params = {"period1": int((end - timedelta(days=days)).timestamp()), "period2": int(end.timestamp()),
+                  "interval": f"{minutes}m"}
+        try:
+            resp = self._get(url, params)
+            resp.raise_for_status()
+            result = resp.json()["chart"]["result"][0]
+            quote = result["indicators"]["quote"][0]
             df = pd.DataFrame({
-                "date": pd.to_datetime(result["timestamp"], unit="s"),
-                "open": quotes["open"], "high": quotes["high"],
-                "low": quotes["low"], "close": quotes["close"], "volume": quotes["volume"],
-            }).dropna(subset=["close"]).reset_index(drop=True)
-            if len(df) > days:
-                df = df.tail(days).reset_index(drop=True)
+                "date": result["timestamp"], "open": quote["open"], "high": quote["high"],
+                "low": quote["low"], "close": quote["close"], "volume": quote["volume"],
+            })
+        except (requests.exceptions.RequestException, KeyError, IndexError, TypeError, ValueError) as e:
+            log.error(f"Yahoo intraday error for {ticker}: {type(e).__name__}")
+            return pd.DataFrame()
+        df = df[df["close"].notna() & df["date"].map(lambda ts: _in_session(ts, any_day=True))].reset_index(drop=True)
+        df["date"] = pd.to_datetime(df["date"], unit="s")
+        return df
+
+    def rate_limit_pause(self):
+        self.limiter.acquire()
+
+
+class CircuitBreaker:
+    """Stops calls to a failing provider.
+
+    Opens after `threshold` consecutive failures. While open, one trial request
+    is let through every `cooldown` seconds; a success closes it again.
+    record(None) is a neutral outcome: it ends a trial without counting either way.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return "closed" if self.opened_at is None else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self.opened_at >= self.cooldown:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok is None:
+                return
+            if ok:
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    log.warning(f"Circuit open after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+class ProviderStats:
+    """Per-provider request counters and latencies for the end-of-run report."""
+    COUNTERS = ("requests", "errors", "empty", "retries", "skipped", "hedges", "hedge_wins", "failovers")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def add(self, latency=None, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def percentile(self, q):
+        with self._lock:
+            return float(np.percentile(self.latencies, q)) if self.latencies else 0.0
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+def _not_found(e):
+    """A 404: the provider doesn't know this ticker, which says nothing about its health."""
+    return (isinstance(e, requests.exceptions.HTTPError) and e.response is not None
+            and e.response.status_code == 404)
+
+
+def _transient(e):
+    """Worth retrying: timeouts, dropped connections, 429/5xx, truncated bodies."""
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError, ValueError))
+
+
+class ProviderRegistry:
+    """Several data clients behind the single-client interface, in priority order.
+
+    Each daily-bar request goes to the first provider, retrying transient
+    errors with jittered exponential backoff. If that provider fails or has
+    no data for the ticker, the next one is tried. If the current provider
+    takes longer than `hedge_after` seconds, the next provider is started in
+    parallel and the first non-empty answer wins. Each provider has a
+    CircuitBreaker, so one that keeps failing is skipped until it cools down.
+    The provider that served a frame is named in its attrs["provider"], so
+    CachedClient can file it under that provider.
+
+    The registry paces each provider's own limiter per attempt, so its
+    rate_limit_pause() is a no-op, like CachedClient's.
+    """
+    RETRIES = 2
+    BACKOFF = 0.5       # seconds before the first retry, doubled each time
+    HEDGE_AFTER = 2.0   # seconds before racing the next provider (0 = never)
+
+    def __init__(self, clients, retries=RETRIES, backoff=BACKOFF, hedge_after=HEDGE_AFTER,
+                 breaker_threshold=5, breaker_cooldown=30.0):
+        self.clients = list(clients)
+        self.primary = self.clients[0]
+        self.PROVIDER = self.primary.PROVIDER
+        self.MAX_WORKERS = self.primary.MAX_WORKERS
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.breakers = {c.PROVIDER: CircuitBreaker(breaker_threshold, breaker_cooldown) for c in self.clients}
+        self.stats = {c.PROVIDER: ProviderStats() for c in self.clients}
+        self._pool = ThreadPoolExecutor(max_workers=max(8, 4 * self.MAX_WORKERS),
+                                        thread_name_prefix="provider")
+
+    def _attempt(self, client, ticker, days, start):
+        """One provider with retries → DataFrame (possibly empty), or raises."""
+        stats, breaker = self.stats[client.PROVIDER], self.breakers[client.PROVIDER]
+        for attempt in range(self.retries + 1):
+            if not breaker.allow():
+                stats.add(skipped=1)
+                raise CircuitOpen(client.PROVIDER)
+            client.rate_limit_pause()
+            t0 = time.perf_counter()
+            try:
+                df = client.fetch_daily_bars(ticker, days, start)
+            except fetch_errors() as e:
+                stats.add(time.perf_counter() - t0, requests=1, errors=1)
+                # Timeouts, 5xx and 401/403 (a bad key fails every request)
+                # count against the provider; a 404 counts neither way
+                breaker.record(None if _not_found(e) else False)
+                if attempt == self.retries or not _transient(e):
+                    raise
+                stats.add(retries=1)
+                time.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+                continue
+            stats.add(time.perf_counter() - t0, requests=1, empty=int(df.empty))
+            breaker.record(True)
             return df
-        except (requests.exceptions.RequestException, KeyError, IndexError, ValueError) as e:
-            log.error(f"Yahoo error for {ticker}: {type(e).__name__}: {e}")
+
+    def get_daily_bars(self, ticker, days=LOOKBACK_DAYS, start=None):
+        queue = list(self.clients)
+        pending = {}
+        empty, error = None, None
+
+        def launch(reason):
+            client = queue.pop(0)
+            if reason == "hedge":
+                self.stats[client.PROVIDER].add(hedges=1)
+            pending[self._pool.submit(PROFILE.carry(self._attempt), client, ticker, days, start)] = (client, reason)
+
+        launch("primary")
+        while pending:
+            budget = self.hedge_after if (self.hedge_after and queue) else None
+            done, _ = wait(pending, timeout=budget, return_when=FIRST_COMPLETED)
+            if not done:
+                log.warning(f"{ticker}: {pending[next(iter(pending))][0].PROVIDER} over "
+                            f"{self.hedge_after:.1f}s, hedging to {queue[0].PROVIDER}")
+                launch("hedge")
+                continue
+            for future in done:
+                client, reason = pending.pop(future)
+                try:
+                    df = future.result()
+                except (CircuitOpen, *fetch_errors()) as e:
+                    error = e
+                    continue
+                if not df.empty:
+                    df.attrs["provider"] = client.PROVIDER
+                    if reason != "primary":
+                        self.stats[client.PROVIDER].add(**{"hedge_wins" if reason == "hedge" else "failovers": 1})
+                    return df
+                empty = df
+            if not pending and queue:
+                launch("failover")
+        if empty is None:
+            log.error(f"All providers failed for {ticker}: {type(error).__name__}: {error}")
             return pd.DataFrame()
+        return empty
+
+    def get_intraday_bar(self, ticker):
+        for client in self.clients:
+            if not self.breakers[client.PROVIDER].allow():
+                continue
+            client.rate_limit_pause()
+            t0 = time.perf_counter()
+            bar = client.get_intraday_bar(ticker)
+            self.stats[client.PROVIDER].add(time.perf_counter() - t0, requests=1, empty=int(bar is None))
+            if bar:
+                return bar
+        return None
+
+    def get_intraday_bars(self, ticker, minutes=INTRADAY_MINUTES, days=INTRADAY_DAYS):
+        for client in self.clients:
+            if not self.breakers[client.PROVIDER].allow():
+                continue
+            client.rate_limit_pause()
+            t0 = time.perf_counter()
+            df = client.get_intraday_bars(ticker, minutes, days)
+            self.stats[client.PROVIDER].add(time.perf_counter() - t0, requests=1, empty=int(df.empty))
+            if not df.empty:
+                return df
+        return pd.DataFrame()
 
     def rate_limit_pause(self):
-        time.sleep(0.5)
+        pass
+
+    def close(self):
+        """Stop the worker threads; a hedge still in flight is abandoned."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def format_metrics(self):
+        L = [f"  {'PROVIDER':<10}{'REQ':>6}{'ERR':>5}{'EMPTY':>6}{'RETRY':>6}{'SKIP':>5}{'HEDGE':>6}"
+             f"{'WON':>5}{'FAILOVER':>9}{'P50':>8}{'P95':>8}  CIRCUIT"]
+        for client in self.clients:
+            st = self.stats[client.PROVIDER]
+            L.append(f"  {client.PROVIDER:<10}{st.requests:>6}{st.errors:>5}{st.empty:>6}{st.retries:>6}"
+                     f"{st.skipped:>5}{st.hedges:>6}{st.hedge_wins:>5}{st.failovers:>9}"
+                     f"{st.percentile(50) * 1000:>6.0f}ms{st.percentile(95) * 1000:>6.0f}ms"
+                     f"  {self.breakers[client.PROVIDER].state}")
+        return "\n".join(L)
+
+
+def _in_session(epoch_s, any_day=False):
+    """True if a timestamp falls in today's regular session (9:30–16:00 ET),
+    or in any day's with any_day=True."""
+    t = datetime.fromtimestamp(epoch_s, MARKET_TZ)
+    return ((any_day or t.date() == datetime.now(MARKET_TZ).date())
+            and (9, 30) <= (t.hour, t.minute) < (16, 0))
+
+
+def market_open(now=None):
+    now = now or datetime.now(MARKET_TZ)
+    return now.weekday() < 5 and (9, 30) <= (now.hour, now.minute) < (16, 0)
+
+
+# ─── BAR CACHE ──────────────────────────────────────────────────────────────────
+
+class BarCache:
+    """Persistent OHLCV store in SQLite, keyed by (provider, ticker, day)."""
+
+    def __init__(self, path=BAR_CACHE_FILE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS bars (
+                provider TEXT, ticker TEXT, day TEXT, ts INTEGER,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (provider, ticker, day)
+            );
+            CREATE TABLE IF NOT EXISTS fetches (
+                provider TEXT, ticker TEXT, topped_up REAL, full_refresh REAL,
+                PRIMARY KEY (provider, ticker)
+            );
+            CREATE TABLE IF NOT EXISTS grouped_days (
+                provider TEXT, day TEXT, PRIMARY KEY (provider, day)
+            );
+            CREATE TABLE IF NOT EXISTS indicator_state (
+                provider TEXT, ticker TEXT, state TEXT, PRIMARY KEY (provider, ticker)
+            );
+        """)
+
+    def load(self, provider, ticker, days=None):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ts, open, high, low, close, volume FROM bars "
+                "WHERE provider = ? AND ticker = ? ORDER BY day",
+                (provider, ticker)).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=["date", "open", "high", "low", "close", "volume"])
+        df["date"] = pd.to_datetime(df["date"], unit="s")
+        if days and len(df) > days:
+            df = df.tail(days).reset_index(drop=True)
+        return df
+
+    def store(self, provider, ticker, df, full=False):
+        """Upsert bars (a re-fetched day replaces the partial bar) and stamp the fetch.
+
+        With full=True, `df` is a re-downloaded window: cached days inside it
+        that the provider no longer returns are dropped, but older history
+        (e.g. the backtester's multi-year download) is kept — unless the
+        window's closes no longer match the cached ones (a split or dividend
+        re-adjusted the series). Then the older bars and the ticker's
+        indicator state are dropped too, to be rebuilt from adjusted data."""
+        now = time.time()
+        rows = [
+            (provider, ticker, d.strftime("%Y-%m-%d"), int(d.timestamp()), o, h, l, c, v)
+            for d, o, h, l, c, v in zip(df["date"], df["open"], df["high"], df["low"],
+                                        df["close"], df["volume"])
+        ]
+        with self._lock, self._db:
+            if full and rows:
+                start = rows[0][2] if not self._readjusted(provider, ticker, rows) else ""
+                self._db.execute("DELETE FROM bars WHERE provider = ? AND ticker = ? AND day >= ?",
+                                 (provider, ticker, start))
+            self._db.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            prev = self.fetch_times(provider, ticker, locked=True)
+            self._db.execute(
+                "INSERT OR REPLACE INTO fetches VALUES (?, ?, ?, ?)",
+                (provider, ticker, now, now if full else prev[1]))
+
+    def _readjusted(self, provider, ticker, rows):
+        """True if re-downloaded `rows` disagree with the cached closes on the
+        first days they share (the cached last day is skipped: it may have
+        been a partial bar). Drops the ticker's indicator state when so."""
+        cached = self._db.execute(
+            "SELECT day, close FROM bars WHERE provider = ? AND ticker = ? AND day >= ? ORDER BY day",
+            (provider, ticker, rows[0][2])).fetchall()[:-1]
+        fresh = {r[2]: r[7] for r in rows}
+        ratios = [fresh[day] / close for day, close in cached if day in fresh and close][:5]
+        if not ratios or abs(float(np.median(ratios)) - 1) <= CACHE_ADJUST_TOLERANCE:
+            return False
+        log.info(f"{ticker}: cached {provider} history was re-adjusted, dropping bars before {rows[0][2]}")
+        self._db.execute("DELETE FROM indicator_state WHERE provider = ? AND ticker = ?", (provider, ticker))
+        return True
+
+    def store_grouped(self, provider, day, df, final=True):
+        """Scatter one grouped-daily response into per-ticker rows in a single
+        transaction. Every ticker in it counts as freshly fetched, except one
+        whose close moved SPLIT_SUSPECT_MOVE or more from its previous cached
+        close: its full-refresh stamp is zeroed (and stays zeroed until a
+        per-ticker full download) so CachedClient re-fetches it adjusted.
+        Returns the flagged tickers."""
+        now = time.time()
+        rows = [
+            (provider, t, d.strftime("%Y-%m-%d"), int(d.timestamp()), o, h, l, c, v)
+            for t, d, o, h, l, c, v in zip(df["ticker"], df["date"], df["open"], df["high"],
+                                           df["low"], df["close"], df["volume"])
+        ] if len(df) else []
+        with self._lock, self._db:
+            prev = dict(self._db.execute(
+                "SELECT b.ticker, b.close FROM bars b JOIN "
+                "(SELECT ticker, MAX(day) AS day FROM bars WHERE provider = ? AND day < ? GROUP BY ticker) last "
+                "ON b.ticker = last.ticker AND b.day = last.day WHERE b.provider = ?",
+                (provider, day, provider)))
+            ratios = {r[1]: r[7] / prev[r[1]] for r in rows if prev.get(r[1]) and r[7]}
+            suspects = {t for t, x in ratios.items() if max(x, 1 / x) >= 1 + SPLIT_SUSPECT_MOVE}
+            self._db.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.executemany(
+                "INSERT INTO fetches VALUES (?, ?, ?, ?) ON CONFLICT (provider, ticker) DO UPDATE SET "
+                "topped_up = excluded.topped_up, "
+                "full_refresh = CASE WHEN fetches.full_refresh = 0 THEN 0 ELSE excluded.full_refresh END",
+                [(provider, t, now, 0 if t in suspects else now) for t in {r[1] for r in rows}])
+            if final:
+                self._db.execute("INSERT OR REPLACE INTO grouped_days VALUES (?, ?)", (provider, day))
+        return suspects
+
+    def grouped_days(self, provider):
+        with self._lock:
+            return {r[0] for r in self._db.execute(
+                "SELECT day FROM grouped_days WHERE provider = ?", (provider,))}
+
+    def load_states(self, provider):
+        """{ticker: IndicatorState} for every ticker with persisted state."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ticker, state FROM indicator_state WHERE provider = ?", (provider,)).fetchall()
+        return {t: IndicatorState(**json.loads(st)) for t, st in rows}
+
+    def save_states(self, provider, states):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO indicator_state VALUES (?, ?, ?)",
+                [(provider, t, json.dumps(vars(st))) for t, st in states.items()])
+
+    def fetch_times(self, provider, ticker, locked=False):
+        """(last top-up, last full refresh) as epoch seconds, 0 if never."""
+        query = "SELECT topped_up, full_refresh FROM fetches WHERE provider = ? AND ticker = ?"
+        if locked:
+            row = self._db.execute(query, (provider, ticker)).fetchone()
+        else:
+            with self._lock:
+                row = self._db.execute(query, (provider, ticker)).fetchone()
+        return row or (0, 0)
+
+
+class CachedClient:
+    """Wraps a data client so each run only downloads bars after the last cached day.
+
+    Staleness policy:
+      - topped up within CACHE_FRESH_MINUTES → served from disk, no request
+      - otherwise → fetch from the last cached day onward (that day is re-fetched
+        because it may have been a partial, intraday bar) and upsert
+      - no cache, cached history not covering the window, or last full
+        download older than CACHE_FULL_REFRESH_DAYS → full window re-download
+
+    Bars are cached under the provider that served them (attrs["provider"],
+    set by ProviderRegistry), never mixed into another vendor's series, whose
+    split/dividend adjustments may differ. When a fallback serves a top-up,
+    this run splices it onto the primary's cached history; the primary's
+    series itself is left for its next successful fetch.
+    """
+
+    def __init__(self, client, cache, refresh=False, trust_cache=False):
+        self.client = client
+        self.cache = cache
+        self.refresh = refresh
+        self.trust_cache = trust_cache  # store topped up elsewhere (grouped ingest); staleness still applies
+        self.PROVIDER = client.PROVIDER
+        self.MAX_WORKERS = client.MAX_WORKERS
+        self.hits = 0
+        self.misses = 0
+
+    def get_daily_bars(self, ticker, days=LOOKBACK_DAYS):
+        provider = self.PROVIDER
+        cached = self.cache.load(provider, ticker)
+        topped_up, full_refresh = self.cache.fetch_times(provider, ticker)
+        now = time.time()
+
+        # A full download spans days + 30 calendar days; allow a week of slack
+        # for weekends/holidays at the start of that window.
+        window_start = datetime.now() - timedelta(days=days + 30 - 7)
+        full = (self.refresh or cached.empty or cached["date"].iloc[0] > window_start
+                or now - full_refresh > CACHE_FULL_REFRESH_DAYS * 86400)
+        if not full and (self.trust_cache or now - topped_up < CACHE_FRESH_MINUTES * 60):
+            self.hits += 1
+            PROFILE.add(ticker, cache_hit=1)
+            return cached.tail(days).reset_index(drop=True)
+
+        self.misses += 1
+        PROFILE.add(ticker, cache_miss=1)
+        self.client.rate_limit_pause()
+        if full:
+            df = self.client.get_daily_bars(ticker, days)
+        else:
+            df = self.client.get_daily_bars(ticker, days, start=cached["date"].iloc[-1].to_pydatetime())
+        if df.empty:
+            # Provider failed — fall back to whatever history we have
+            return cached.tail(days).reset_index(drop=True) if not cached.empty else df
+        served = df.attrs.get("provider", provider)
+        self.cache.store(served, ticker, df, full=full)
+        if served == provider or full:
+            return self.cache.load(served, ticker, days)
+        spliced = pd.concat([cached[cached["date"] < df["date"].iloc[0]], df[cached.columns]])
+        return spliced.tail(days).reset_index(drop=True)
+
+    def get_intraday_bars(self, ticker, minutes=INTRADAY_MINUTES, days=INTRADAY_DAYS):
+        # Intraday bars aren't cached: a few days of them is one small request
+        self.client.rate_limit_pause()
+        return self.client.get_intraday_bars(ticker, minutes, days)
+
+    def rate_limit_pause(self):
+        # The wrapped client is throttled only when we actually hit the network
+        pass
+
+
+def fetch_each(client, tickers, fetch, workers=None):
+    """Run fetch(ticker) for every ticker, overlapping requests up to the
+    client's rate limit. Returns {ticker: result}."""
+    workers = workers or client.MAX_WORKERS
+
+    def paced(ticker):
+        client.rate_limit_pause()
+        return fetch(ticker)
+
+    if workers <= 1:
+        return {t: paced(t) for t in tickers}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(tickers, pool.map(paced, tickers)))
+
+
+def fetch_all_bars(client, tickers, workers=None, days=LOOKBACK_DAYS):
+    """Fetch daily bars for every ticker. Returns {ticker: DataFrame} (empty on failure)."""
+    def fetch(ticker):
+        log.info(f"  {ticker}...")
+        with PROFILE.track(ticker, "fetch"):
+            return client.get_daily_bars(ticker, days)
+
+    return fetch_each(client, tickers, fetch, workers)
+
+
+def fetch_all_intraday(client, tickers, workers=None):
+    """Fetch INTRADAY_MINUTES bars for every ticker (--intraday). Returns {ticker: DataFrame}."""
+    def fetch(ticker):
+        with PROFILE.track(ticker, "fetch"):
+            return client.get_intraday_bars(ticker)
+
+    return fetch_each(client, tickers, fetch, workers)
 
 
 # ─── TECHNICAL ANALYSIS ─────────────────────────────────────────────────────────
@@ -349,30 +1396,23 @@ def calc_rsi(series, period=RSI_PERIOD):
     return rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50.0
 
 
-def analyze_stock(df, stock_info, account_size):
-    if df.empty or len(df) < EMA_SLOW + 5:
+def analyze_stock(df, stock_info, account_size, strategy=DEFAULT_STRATEGY, intraday=None):
+    if df.empty or len(df) < strategy.ema_slow + 5:
         return None
 
     close, volume, high, low = df["close"], df["volume"], df["high"], df["low"]
-    ema8, ema21, ema50 = calc_ema(close, EMA_FAST), calc_ema(close, EMA_MID), calc_ema(close, EMA_SLOW)
+    ema8 = calc_ema(close, strategy.ema_fast)
+    ema21 = calc_ema(close, strategy.ema_mid)
+    ema50 = calc_ema(close, strategy.ema_slow)
 
     cp = close.iloc[-1]
     e8, e21, e50 = ema8.iloc[-1], ema21.iloc[-1], ema50.iloc[-1]
-    rsi = calc_rsi(close)
+    rsi = calc_rsi(close, strategy.rsi_period)
 
     recent_vol = volume.iloc[-5:].mean()
     avg_vol = volume.iloc[-20:].mean()
     vol_ratio = recent_vol / avg_vol if avg_vol > 0 else 1.0
 
-    bull_stacked = e8 > e21 and e21 > e50
-    bear_stacked = e8 < e21 and e21 < e50
-    ema_spread = ((e8 - e50) / e50) * 100
-    dist_to_8 = ((cp - e8) / e8) * 100
-    dist_to_21 = ((cp - e21) / e21) * 100
-
-    is_pullback_buy = bull_stacked and -1.5 < dist_to_8 < 0.5
-    is_pullback_sell = bear_stacked and -0.5 < dist_to_8 < 1.5
-
     change_1d = ((close.iloc[-1] - close.iloc[-2]) / close.iloc[-2]) * 100 if len(close) >= 2 else 0
     change_5d = ((close.iloc[-1] - close.iloc[-6]) / close.iloc[-6]) * 100 if len(close) >= 6 else 0
     change_20d = ((close.iloc[-1] - close.iloc[-21]) / close.iloc[-21]) * 100 if len(close) >= 21 else 0
@@ -380,107 +1420,620 @@ def analyze_stock(df, stock_info, account_size):
     resistance = high.iloc[-20:].max()
     support = low.iloc[-20:].min()
 
-    # Signal logic
-    if bull_stacked and is_pullback_buy and vol_ratio < 1.0:
-        signal, strength = "PULLBACK BUY", 5
-        note = f"Price at 8 EMA (${e8:.2f}) in uptrend + declining vol ({vol_ratio:.1f}x). A+ call entry."
-    elif bull_stacked and vol_ratio > 1.3 and rsi < RSI_OVERBOUGHT:
-        signal, strength = "STRONG BUY", 4
-        note = f"Bull stack + volume surge ({vol_ratio:.1f}x). Enter calls on intraday dip."
-    elif bull_stacked:
-        signal, strength = "BUY", 3
-        note = f"Trend up, EMAs stacked. Wait for pullback to 8 EMA (${e8:.2f})."
-    elif e8 > e21 and cp > e21:
-        signal, strength = "LEAN BULL", 2
-        note = "Developing bullish trend. Wait for full EMA stack."
-    elif bear_stacked and is_pullback_sell and vol_ratio < 1.0:
-        signal, strength = "PULLBACK SELL", -5
-        note = f"Price at 8 EMA (${e8:.2f}) in downtrend + low vol ({vol_ratio:.1f}x). A+ put entry."
-    elif bear_stacked and vol_ratio > 1.3 and rsi > RSI_OVERSOLD:
-        signal, strength = "STRONG SELL", -4
-        note = f"Bear stack + volume surge ({vol_ratio:.1f}x). Enter puts on bounce."
-    elif bear_stacked:
-        signal, strength = "SELL", -3
-        note = f"Trend down. Wait for bounce to 8 EMA (${e8:.2f}) for puts."
-    elif e8 < e21 and cp < e21:
-        signal, strength = "LEAN BEAR", -2
-        note = "Bearish momentum developing. Wait for full stack."
-    else:
-        signal, strength = "NEUTRAL", 0
-        note = "No trend — EMAs tangled. Stay flat."
-
-    # Trade math
-    if bull_stacked:
-        stop_loss = min(e21, support * 1.005)
-    elif bear_stacked:
-        stop_loss = max(e21, resistance * 0.995)
-    else:
-        stop_loss = support if strength >= 0 else resistance
+    weekly = resample_close(close.to_numpy(dtype=float), week_keys(df["date"].values))
+    timeframes = [weekly]
+    if intraday is not None and len(intraday):
+        minutes = intraday["close"].to_numpy(dtype=float)
+        timeframes += [resample_close(minutes, hour_keys(intraday["date"].values)), minutes]
+    votes = [_series_vote(pd.Series(c), strategy) for c in timeframes]
+    if intraday is not None and not len(intraday):
+        votes += [float("nan")] * 2
+    mtf = float(mean_vote(np.array(votes).reshape(-1, 1))[0])
+    return build_signal(stock_info, account_size, cp, e8, e21, e50, rsi, vol_ratio,
+                        change_1d, change_5d, change_20d, support, resistance, strategy, mtf)
+
+
+def _series_vote(close, strategy):
+    """trend_vote for one timeframe's closes, the pandas way."""
+    e_fast, e_mid, e_slow = (calc_ema(close, p).iloc[-1] if len(close) else float("nan")
+                             for p in (strategy.ema_fast, strategy.ema_mid, strategy.ema_slow))
+    rsi = calc_rsi(close, strategy.rsi_period) if len(close) > 1 else 50.0
+    return float(trend_vote(e_fast, e_mid, e_slow, rsi, len(close)))
+
+
+def build_signals(stocks, account_size, cp, e8, e21, e50, rsi, vol_ratio,
+                  change_1d, change_5d, change_20d, support, resistance,
+                  strategy=DEFAULT_STRATEGY, mtf=None):
+    """Classify tickers from their latest indicator values → SignalTable.
+
+    `stocks` are the universe rows; every other argument is one value per
+    stock (a list or array), so the whole scan is classified column by column.
+    `mtf` is each stock's multi-timeframe alignment (mtf_alignment), 0 if omitted.
+    """
+    st = strategy
+    cp, e8, e21, e50, rsi, vol_ratio, change_1d, change_5d, change_20d, support, resistance = (
+        np.asarray(x, dtype=float) for x in
+        (cp, e8, e21, e50, rsi, vol_ratio, change_1d, change_5d, change_20d, support, resistance))
+    weight = np.array([s["weight"] for s in stocks], dtype=float)
+    mtf = np.zeros(len(cp)) if mtf is None else np.asarray(mtf, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bull_stacked = (e8 > e21) & (e21 > e50)
+        bear_stacked = (e8 < e21) & (e21 < e50)
+        ema_spread = ((e8 - e50) / e50) * 100
+        dist_to_8 = ((cp - e8) / e8) * 100
+        dist_to_21 = ((cp - e21) / e21) * 100
+
+        is_pullback_buy = bull_stacked & (st.pullback_low < dist_to_8) & (dist_to_8 < st.pullback_high)
+        is_pullback_sell = bear_stacked & (-st.pullback_high < dist_to_8) & (dist_to_8 < -st.pullback_low)
+
+        # Signal logic — first matching rule wins (names/notes in SIGNAL_TYPES)
+        strength = np.select([
+            is_pullback_buy & (vol_ratio < st.vol_quiet),
+            bull_stacked & (vol_ratio > st.vol_surge) & (rsi < st.rsi_overbought),
+            bull_stacked,
+            (e8 > e21) & (cp > e21),
+            is_pullback_sell & (vol_ratio < st.vol_quiet),
+            bear_stacked & (vol_ratio > st.vol_surge) & (rsi > st.rsi_oversold),
+            bear_stacked,
+            (e8 < e21) & (cp < e21),
+        ], [5, 4, 3, 2, -5, -4, -3, -2], 0).astype(np.int8)
+
+        # Trade math (min/max keep the first argument on NaN, like the builtins)
+        bull_stop = support * 1.005
+        bear_stop = resistance * 0.995
+        stop_loss = np.where(bull_stacked, np.where(bull_stop < e21, bull_stop, e21),
+                             np.where(bear_stacked, np.where(bear_stop > e21, bear_stop, e21),
+                                      np.where(strength >= 0, support, resistance)))
+
+        risk_per_share = np.abs(cp - stop_loss)
+        risk_per_share = np.where(risk_per_share < 0.01, cp * 0.02, risk_per_share)
+
+        risk_amount = account_size * st.risk_pct
+        position_size = np.where(risk_per_share > 0, np.trunc(risk_amount / risk_per_share), 0)
+        position_size = np.nan_to_num(position_size, nan=0.0).astype(np.int64)
+
+        direction = np.sign(strength)
+        target_1 = cp + direction * risk_per_share * 2.5
+        target_2 = cp + direction * risk_per_share * 3.5
+
+        # Conviction score (0-100) — drives allocation percentages
+        pullback = is_pullback_buy | is_pullback_sell
+        score = np.zeros(len(cp))
+        score += np.where(bull_stacked | bear_stacked, 25, 0)
+        score += np.where(pullback, 30, 0)
+        score += np.where((np.abs(strength) >= 4) & (vol_ratio > 1.2), 15,
+                          np.where((vol_ratio < st.vol_quiet) & pullback, 20, 0))
+        score += np.where((35 < rsi) & (rsi < 65), 10,
+                          np.where(((strength > 0) & (rsi < st.rsi_overbought))
+                                   | ((strength < 0) & (rsi > st.rsi_oversold)), 5, 0))
+        score += np.where(np.abs(ema_spread) > 3, 10, np.where(np.abs(ema_spread) > 1.5, 5, 0))
+        score += np.where(((strength > 0) & (change_5d > 0)) | ((strength < 0) & (change_5d < 0)), 10, 0)
+        score += np.where(weight > 3, 5, 0)
+        score += MTF_WEIGHT * direction * mtf   # other timeframes agree (+) or oppose (-)
+
+    def text(key):
+        return np.array([s[key] for s in stocks], dtype=object)
+
+    # Prices and percentages to cents in one call; each row is a contiguous column
+    cents = dict(zip(
+        ("current_price", "ema8", "ema21", "ema50", "vol_ratio", "change_1d", "change_5d", "change_20d",
+         "ema_spread", "dist_to_8", "dist_to_21", "stop_loss", "target_1", "target_2",
+         "risk_per_share", "support", "resistance"),
+        np.round(np.stack([cp, e8, e21, e50, vol_ratio, change_1d, change_5d, change_20d,
+                           ema_spread, dist_to_8, dist_to_21, stop_loss, target_1, target_2,
+                           risk_per_share, support, resistance]), 2)))
+    columns = {
+        "ticker": text("ticker"), "name": text("name"), "weight": weight, "sector": text("sector"),
+        "rsi": np.round(rsi, 1),
+        "bull_stacked": bull_stacked, "bear_stacked": bear_stacked,
+        "is_pullback_buy": is_pullback_buy, "is_pullback_sell": is_pullback_sell,
+        "signal_strength": strength, "position_size": position_size,
+        "conviction_score": np.round(np.clip(score, 0, 100), 1),
+        "mtf_alignment": np.round(mtf, 2),
+        **cents,
+        "_ema8": e8, "_vol_ratio": vol_ratio,   # unrounded, for action notes
+        "_risk_per_share": risk_per_share,      # unrounded, for for_account()
+    }
+    return SignalTable(columns)
 
-    risk_per_share = abs(cp - stop_loss)
-    if risk_per_share < 0.01:
-        risk_per_share = cp * 0.02
 
-    risk_amount = account_size * RISK_PCT
-    position_size = int(risk_amount / risk_per_share) if risk_per_share > 0 else 0
+def build_signal(stock_info, account_size, cp, e8, e21, e50, rsi, vol_ratio,
+                 change_1d, change_5d, change_20d, support, resistance,
+                 strategy=DEFAULT_STRATEGY, mtf=0.0):
+    """Classify one ticker from its latest indicator values → StockSignal."""
+    values = (cp, e8, e21, e50, rsi, vol_ratio, change_1d, change_5d, change_20d, support, resistance)
+    return build_signals([stock_info], account_size, *([v] for v in values), strategy, [mtf])[0]
 
-    if strength > 0:
-        target_1 = cp + risk_per_share * 2.5
-        target_2 = cp + risk_per_share * 3.5
-    elif strength < 0:
-        target_1 = cp - risk_per_share * 2.5
-        target_2 = cp - risk_per_share * 3.5
-    else:
-        target_1, target_2 = cp, cp
-
-    # Conviction score (0-100) — drives allocation percentages
-    score = 0.0
-    if bull_stacked or bear_stacked:
-        score += 25
-    if is_pullback_buy or is_pullback_sell:
-        score += 30
-    if abs(strength) >= 4 and vol_ratio > 1.2:
-        score += 15
-    elif vol_ratio < 1.0 and (is_pullback_buy or is_pullback_sell):
-        score += 20
-    if 35 < rsi < 65:
-        score += 10
-    elif (strength > 0 and rsi < RSI_OVERBOUGHT) or (strength < 0 and rsi > RSI_OVERSOLD):
-        score += 5
-    if abs(ema_spread) > 3:
-        score += 10
-    elif abs(ema_spread) > 1.5:
-        score += 5
-    if (strength > 0 and change_5d > 0) or (strength < 0 and change_5d < 0):
-        score += 10
-    if stock_info["weight"] > 3:
-        score += 5
-
-    return StockSignal(
-        ticker=stock_info["ticker"], name=stock_info["name"],
-        weight=stock_info["weight"], sector=stock_info["sector"],
-        current_price=round(cp, 2), ema8=round(e8, 2), ema21=round(e21, 2), ema50=round(e50, 2),
-        rsi=round(rsi, 1), vol_ratio=round(vol_ratio, 2),
-        change_1d=round(change_1d, 2), change_5d=round(change_5d, 2), change_20d=round(change_20d, 2),
-        bull_stacked=bull_stacked, bear_stacked=bear_stacked,
-        ema_spread=round(ema_spread, 2), dist_to_8=round(dist_to_8, 2), dist_to_21=round(dist_to_21, 2),
-        is_pullback_buy=is_pullback_buy, is_pullback_sell=is_pullback_sell,
-        signal=signal, signal_strength=strength, action_note=note,
-        stop_loss=round(stop_loss, 2), target_1=round(target_1, 2), target_2=round(target_2, 2),
-        risk_per_share=round(risk_per_share, 2), position_size=position_size,
-        support=round(support, 2), resistance=round(resistance, 2),
-        conviction_score=round(min(score, 100), 1),
+
+# ─── VECTORIZED ENGINE ──────────────────────────────────────────────────────────
+#
+# Computes the analyze_stock indicators for every ticker in one pass over a
+# dates × tickers array. Each column is right-aligned on its latest bar (shorter
+# histories are NaN-padded at the top), so the recursions see exactly the bars
+# the per-ticker pandas path sees and the numbers match bit for bit.
+
+def stack_arrays(arrays):
+    """Right-align 1-D arrays as the columns of a NaN-padded matrix."""
+    n = max((len(a) for a in arrays), default=0)
+    out = np.full((n, len(arrays)), np.nan)
+    for j, a in enumerate(arrays):
+        if len(a):
+            out[n - len(a):, j] = a
+    return out
+
+
+def stack_columns(frames, column):
+    """Stack one OHLCV column of several DataFrames into a dates × tickers array."""
+    return stack_arrays([df[column].to_numpy(dtype=float) if len(df) else () for df in frames])
+
+
+def ewm_matrix(x, com):
+    """Column-wise equivalent of pandas ewm(com=com, adjust=False).mean().
+
+    Mirrors pandas' update rule (including the skip on unchanged values) so the
+    output is identical, not just close. Leading NaNs mark columns that have no
+    data yet; each column starts at its first observation.
+    """
+    alpha = 1.0 / (1.0 + com)
+    old_wt = 1.0 - alpha
+    out = np.empty_like(x)
+    w = x[0].copy()
+    out[0] = w
+    for i in range(1, len(x)):
+        cur = x[i]
+        upd = (old_wt * w + alpha * cur) / (old_wt + alpha)
+        w = np.where(np.isnan(w), cur, np.where(w != cur, upd, w))
+        out[i] = w
+    return out
+
+
+def _window_mean(x, n):
+    """NaN-skipping mean of the last n rows per column (pandas .iloc[-n:].mean())."""
+    win = np.ascontiguousarray(x[-n:].T)
+    valid = ~np.isnan(win)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid, win, 0.0).sum(axis=1) / valid.sum(axis=1)
+
+
+def wilder_rsi(close, lengths, period=RSI_PERIOD):
+    """Latest Wilder RSI per column (50 for columns shorter than `period`).
+
+    Same gain/loss construction as calc_rsi: a column's first diff is 0 (not
+    NaN), rows before its first bar stay NaN.
+    """
+    delta = np.vstack([np.full((1, close.shape[1]), np.nan), np.diff(close, axis=0)])
+    started = ~np.isnan(close)
+    gain = np.where(started, np.where(delta > 0, delta, 0.0), np.nan)
+    loss = np.where(started, np.where(delta < 0, -delta, 0.0), np.nan)
+    rsi_com = (1 - 1.0 / period) / (1.0 / period)
+    avg_gain = ewm_matrix(gain, rsi_com)[-1]
+    avg_loss = ewm_matrix(loss, rsi_com)[-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsi = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    return np.where(np.isnan(rsi) | (lengths < period), 50.0, rsi)
+
+
+def compute_indicators(frames, strategy=DEFAULT_STRATEGY):
+    """Latest EMA8/21/50, Wilder RSI, volume ratio, 1/5/20-day change and
+    20-day support/resistance for every frame at once. Returns a dict of
+    1-D arrays, one entry per frame."""
+    close = stack_columns(frames, "close")
+    volume = stack_columns(frames, "volume")
+    high = stack_columns(frames, "high")
+    low = stack_columns(frames, "low")
+    lengths = np.array([len(df) for df in frames])
+
+    ema8 = ewm_matrix(close, (strategy.ema_fast - 1) / 2)[-1]
+    ema21 = ewm_matrix(close, (strategy.ema_mid - 1) / 2)[-1]
+    ema50 = ewm_matrix(close, (strategy.ema_slow - 1) / 2)[-1]
+    rsi = wilder_rsi(close, lengths, strategy.rsi_period)
+
+    recent_vol = _window_mean(volume, 5)
+    avg_vol = _window_mean(volume, 20)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vol_ratio = np.where(avg_vol > 0, recent_vol / avg_vol, 1.0)
+
+    def change(n):
+        if len(close) <= n:
+            return np.zeros(close.shape[1])
+        prev = close[-1 - n]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(lengths > n, ((close[-1] - prev) / prev) * 100, 0)
+
+    with np.errstate(invalid="ignore"):
+        resistance = np.nanmax(high[-20:], axis=0)
+        support = np.nanmin(low[-20:], axis=0)
+
+    return {
+        "close": close[-1], "ema8": ema8, "ema21": ema21, "ema50": ema50,
+        "rsi": rsi, "vol_ratio": vol_ratio,
+        "change_1d": change(1), "change_5d": change(5), "change_20d": change(20),
+        "support": support, "resistance": resistance, "length": lengths,
+        "closes": [close[len(close) - n:, j] for j, n in enumerate(lengths)],
+    }
+
+
+def analyze_universe(bars, stocks, account_size, strategy=DEFAULT_STRATEGY, intraday=None):
+    """Vectorized analyze_stock over many tickers.
+
+    bars: {ticker: DataFrame}; stocks: stock_info dicts; intraday: optional
+    {ticker: INTRADAY_MINUTES DataFrame} for the 1h/15m votes. Returns a
+    SignalTable in `stocks` order, skipping tickers with too little history.
+    """
+    usable = [s for s in stocks
+              if s["ticker"] in bars and len(bars[s["ticker"]]) >= strategy.ema_slow + 5]
+    if not usable:
+        return SignalTable.from_records([])
+    frames = [bars[s["ticker"]] for s in usable]
+    ind = compute_indicators(frames, strategy)
+    return build_signals(
+        usable, account_size, ind["close"], ind["ema8"], ind["ema21"], ind["ema50"],
+        ind["rsi"], ind["vol_ratio"], ind["change_1d"], ind["change_5d"], ind["change_20d"],
+        ind["support"], ind["resistance"], strategy,
+        mtf_alignment(frames, _intraday_frames(intraday, usable), strategy, ind["closes"]),
     )
 
 
+# ─── MULTI-TIMEFRAME ────────────────────────────────────────────────────────────
+#
+# A daily BUY inside a weekly bear stack is a weaker trade than one the weekly
+# and intraday trends agree with. Other timeframes are resampled from bars the
+# scan already holds — weekly from the daily window, 1h from the --intraday
+# 15m bars — and only their closes are needed. Every timeframe of every ticker
+# goes through one EMA/RSI pass over a single stacked matrix. The latest
+# period of each timeframe is the one in progress (this week so far).
+
+def week_keys(dates):
+    """Monday-based week number per datetime64 (1970-01-01 was a Thursday)."""
+    return (np.asarray(dates, dtype="datetime64[D]").astype(np.int64) + 3) // 7
+
+
+def hour_keys(dates):
+    """Session-hour number per datetime64: buckets start at :30 past the hour
+    (9:30, 10:30, ...) in UTC, and so in New York time as well."""
+    return (np.asarray(dates, dtype="datetime64[s]").astype(np.int64) - 1800) // 3600
+
+
+def resample_close(close, keys):
+    """Close of each period: the last close in every run of equal keys."""
+    if not len(close):
+        return close
+    return close[np.append(keys[1:] != keys[:-1], True)]
+
+
+def trend_vote(e_fast, e_mid, e_slow, rsi, bars):
+    """One timeframe's vote: +1 bull EMA stack, -1 bear stack, ±0.5 when only
+    the fast EMA has crossed the mid one and RSI is on the same side of 50,
+    NaN with fewer than MTF_MIN_BARS bars."""
+    vote = np.select([
+        (e_fast > e_mid) & (e_mid > e_slow),
+        (e_fast < e_mid) & (e_mid < e_slow),
+        (e_fast > e_mid) & (rsi > 50),
+        (e_fast < e_mid) & (rsi < 50),
+    ], [1.0, -1.0, 0.5, -0.5], 0.0)
+    return np.where(bars >= MTF_MIN_BARS, vote, np.nan)
+
+
+def timeframe_votes(close_sets, strategy=DEFAULT_STRATEGY):
+    """close_sets: one list of close arrays per timeframe, each in the same
+    ticker order → (timeframes × tickers) votes, computed in a single pass."""
+    arrays = [c for closes in close_sets for c in closes]
+    close = stack_arrays(arrays)
+    lengths = np.array([len(c) for c in arrays])
+    e_fast = ewm_matrix(close, (strategy.ema_fast - 1) / 2)[-1]
+    e_mid = ewm_matrix(close, (strategy.ema_mid - 1) / 2)[-1]
+    e_slow = ewm_matrix(close, (strategy.ema_slow - 1) / 2)[-1]
+    rsi = wilder_rsi(close, lengths, strategy.rsi_period)
+    return trend_vote(e_fast, e_mid, e_slow, rsi, lengths).reshape(len(close_sets), -1)
+
+
+def mean_vote(votes):
+    """Column means of (timeframes × tickers) votes, ignoring NaN; 0 where
+    no timeframe voted."""
+    voted = ~np.isnan(votes)
+    return np.where(voted, votes, 0.0).sum(axis=0) / np.maximum(voted.sum(axis=0), 1)
+
+
+def _intraday_frames(intraday, stocks):
+    if intraday is None:
+        return None
+    return [intraday.get(s["ticker"], pd.DataFrame()) for s in stocks]
+
+
+def mtf_alignment(frames, intraday=None, strategy=DEFAULT_STRATEGY, closes=None):
+    """Multi-timeframe alignment per daily frame, from -1 (every other
+    timeframe bear-stacked) to +1 (all bull-stacked).
+
+    The weekly timeframe is resampled from `frames` (their close columns may
+    be passed in as `closes` when already extracted). With `intraday` (one
+    INTRADAY_MINUTES frame per daily frame, possibly empty), the 1h and
+    intraday timeframes vote too.
+    """
+    if closes is None:
+        closes = [df["close"].to_numpy(dtype=float) for df in frames]
+    close_sets = [[resample_close(c, week_keys(df["date"].values)) for c, df in zip(closes, frames)]]
+    if intraday is not None:
+        bars = [(df["close"].to_numpy(dtype=float), df["date"].values) if len(df) else (np.empty(0), ())
+                for df in intraday]
+        close_sets.append([resample_close(c, hour_keys(d)) for c, d in bars])
+        close_sets.append([c for c, _ in bars])
+    return mean_vote(timeframe_votes(close_sets, strategy))
+
+
+# ─── INDICATOR STATE ────────────────────────────────────────────────────────────
+#
+# EMA and Wilder RSI are recursive, so a ticker's indicators only need
+# yesterday's state plus today's bar. State is seeded once from the full cached
+# history (so EMA50 no longer depends on how many bars the provider returned)
+# and persisted in the bar cache. The saved state stops one bar short of the
+# latest: that bar may be a partial intraday bar and is re-applied next run.
+
+def _ewm_step(prev, x, alpha):
+    """One step of pandas ewm(adjust=False), same update rule as ewm_matrix."""
+    if prev is None:
+        return x
+    if prev != x:
+        return ((1.0 - alpha) * prev + alpha * x) / ((1.0 - alpha) + alpha)
+    return prev
+
+
+def _nanmean(values):
+    vals = [v for v in values if v == v]
+    return sum(vals) / len(vals) if vals else float("nan")
+
+
+@dataclass
+class IndicatorState:
+    day: str = ""
+    bars: int = 0
+    ema8: Optional[float] = None
+    ema21: Optional[float] = None
+    ema50: Optional[float] = None
+    avg_gain: Optional[float] = None
+    avg_loss: Optional[float] = None
+    closes: list = field(default_factory=list)   # last 21 (for 1/5/20-day change)
+    volumes: list = field(default_factory=list)  # last 20
+    highs: list = field(default_factory=list)    # last 20
+    lows: list = field(default_factory=list)     # last 20
+
+    def copy(self):
+        return IndicatorState(**{k: list(v) if isinstance(v, list) else v
+                                 for k, v in asdict(self).items()})
+
+    def advance(self, day, high, low, close, volume):
+        """Fold one daily bar into the state — O(1)."""
+        if self.closes:
+            delta = close - self.closes[-1]
+            gain, loss = (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+        else:
+            gain = loss = 0.0
+        rsi_alpha = 1.0 / (1.0 + (1 - 1.0 / RSI_PERIOD) / (1.0 / RSI_PERIOD))
+        self.avg_gain = _ewm_step(self.avg_gain, gain, rsi_alpha)
+        self.avg_loss = _ewm_step(self.avg_loss, loss, rsi_alpha)
+        self.ema8 = _ewm_step(self.ema8, close, 1.0 / (1.0 + (EMA_FAST - 1) / 2))
+        self.ema21 = _ewm_step(self.ema21, close, 1.0 / (1.0 + (EMA_MID - 1) / 2))
+        self.ema50 = _ewm_step(self.ema50, close, 1.0 / (1.0 + (EMA_SLOW - 1) / 2))
+
+        self.closes = (self.closes + [close])[-21:]
+        self.volumes = (self.volumes + [volume])[-20:]
+        self.highs = (self.highs + [high])[-20:]
+        self.lows = (self.lows + [low])[-20:]
+        self.bars += 1
+        self.day = day
+
+    def signal_inputs(self):
+        """Latest values in build_signal's argument order (after account_size)."""
+        cp = self.closes[-1]
+        if self.bars < RSI_PERIOD or self.avg_gain == 0 and self.avg_loss == 0:
+            rsi = 50.0
+        elif self.avg_loss == 0:
+            rsi = 100.0
+        else:
+            rsi = 100.0 - (100.0 / (1.0 + self.avg_gain / self.avg_loss))
+        recent_vol, avg_vol = _nanmean(self.volumes[-5:]), _nanmean(self.volumes)
+        vol_ratio = recent_vol / avg_vol if avg_vol > 0 else 1.0
+
+        def change(n):
+            if len(self.closes) <= n:
+                return 0
+            return ((cp - self.closes[-1 - n]) / self.closes[-1 - n]) * 100
+
+        support = min(v for v in self.lows if v == v)
+        resistance = max(v for v in self.highs if v == v)
+        return (cp, self.ema8, self.ema21, self.ema50, rsi, vol_ratio,
+                change(1), change(5), change(20), support, resistance)
+
+
+def _bar_rows(df):
+    return zip(df["date"].dt.strftime("%Y-%m-%d"), df["high"].tolist(), df["low"].tolist(),
+               df["close"].tolist(), df["volume"].tolist())
+
+
+def _transpose(rows, width):
+    """[(a, b, ...), ...] → ([a, ...], [b, ...], ...); `width` empty lists for no rows."""
+    return list(zip(*rows)) if rows else [()] * width
+
+
+def _optional(x):
+    return None if x != x else x
+
+
+def advance_states(states, pending):
+    """Fold each state's pending bars in, column-wise → (saved, inputs).
+
+    `pending` holds one (days, high, low, close, volume) tuple of arrays per
+    state. Each state's windows and pending bars are stacked into one matrix
+    per field, and the EMAs and RSI averages go through a single ewm_matrix
+    pass seeded with the saved value, the update IndicatorState.advance
+    applies bar by bar. `saved` are the states advanced through all but each
+    ticker's last bar (which may be a partial session); `inputs` are the
+    build_signals columns as of the last bar, with `bars` appended.
+    """
+    k = np.array([len(p[3]) for p in pending])
+    close = stack_arrays([np.concatenate([st.closes, p[3]]) for st, p in zip(states, pending)])
+    volume = stack_arrays([np.concatenate([st.volumes, p[4]]) for st, p in zip(states, pending)])
+    high = stack_arrays([np.concatenate([st.highs, p[1]]) for st, p in zip(states, pending)])
+    low = stack_arrays([np.concatenate([st.lows, p[2]]) for st, p in zip(states, pending)])
+    n = len(close)
+    first = n - k                                   # first pending row of each column
+    cols = np.arange(len(states))
+    is_pending = np.arange(n)[:, None] >= first
+    seed_row = np.maximum(first - 1, 0)
+
+    def seeded(x, attr):
+        x = np.where(is_pending, x, np.nan)
+        seed = np.array([np.nan if getattr(st, attr) is None else getattr(st, attr) for st in states])
+        has_seed = ~np.isnan(seed) & (first > 0)
+        x[seed_row[has_seed], cols[has_seed]] = seed[has_seed]
+        return x
+
+    # Same construction as wilder_rsi: a fresh state's first gain is 0
+    delta = np.vstack([np.full((1, close.shape[1]), np.nan), np.diff(close, axis=0)])
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    rsi_com = (1 - 1.0 / RSI_PERIOD) / (1.0 / RSI_PERIOD)
+    ewm = {
+        "ema8": ewm_matrix(seeded(close, "ema8"), (EMA_FAST - 1) / 2),
+        "ema21": ewm_matrix(seeded(close, "ema21"), (EMA_MID - 1) / 2),
+        "ema50": ewm_matrix(seeded(close, "ema50"), (EMA_SLOW - 1) / 2),
+        "avg_gain": ewm_matrix(seeded(gain, "avg_gain"), rsi_com),
+        "avg_loss": ewm_matrix(seeded(loss, "avg_loss"), rsi_com),
+    }
+
+    before_last = {name: m[-2].tolist() if n > 1 else [] for name, m in ewm.items()}
+    saved = []
+    for j, (st, p) in enumerate(zip(states, pending)):
+        if k[j] < 2:
+            saved.append(st)
+            continue
+
+        def window(m, kept, size):
+            # column j without its last bar, as the last `size` of the kept + pending values
+            rows = len(m)
+            return m[max(rows - kept - k[j], rows - 1 - size):rows - 1, j].tolist()
+
+        saved.append(IndicatorState(
+            day=str(p[0][-2]), bars=st.bars + int(k[j]) - 1,
+            **{name: _optional(v[j]) for name, v in before_last.items()},
+            closes=window(close, len(st.closes), 21), volumes=window(volume, len(st.volumes), 20),
+            highs=window(high, len(st.highs), 20), lows=window(low, len(st.lows), 20)))
+
+    bars = np.array([st.bars for st in states]) + k
+    avg_gain, avg_loss = ewm["avg_gain"][-1], ewm["avg_loss"][-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsi = np.select([(bars < RSI_PERIOD) | ((avg_gain == 0) & (avg_loss == 0)), avg_loss == 0],
+                        [50.0, 100.0], 100.0 - (100.0 / (1.0 + avg_gain / avg_loss)))
+        recent_vol, avg_vol = _window_mean(volume, 5), _window_mean(volume, 20)
+        vol_ratio = np.where(avg_vol > 0, recent_vol / avg_vol, 1.0)
+
+        def change(m):
+            if n <= m:
+                return np.zeros(len(states))
+            prev = close[-1 - m]
+            return np.where(bars > m, ((close[-1] - prev) / prev) * 100, 0)
+
+        support = np.nanmin(low[-20:], axis=0)
+        resistance = np.nanmax(high[-20:], axis=0)
+    inputs = (close[-1], ewm["ema8"][-1], ewm["ema21"][-1], ewm["ema50"][-1], rsi, vol_ratio,
+              change(1), change(5), change(20), support, resistance, bars)
+    return saved, inputs
+
+
+def _bar_arrays(df):
+    """(days, high, low, close, volume) arrays of a bars frame, days as datetime64[D]."""
+    return (df["date"].to_numpy().astype("datetime64[D]"),
+            *(df[c].to_numpy(dtype=float) for c in ("high", "low", "close", "volume")))
+
+
+def analyze_incremental(bars, stocks, account_size, cache, provider, reseed=False,
+                        strategy=DEFAULT_STRATEGY, intraday=None):
+    """analyze_universe backed by persisted IndicatorState.
+
+    Each ticker's state is advanced over only the bars newer than its saved
+    state. It is reseeded from the full cached history when missing, when its
+    close no longer matches the cache (split re-adjustment), or on reseed=True.
+    Tickers with a usable state and reseeded ones are advanced as two
+    column-wise batches (advance_states), so the daily run stacks only a few
+    bars per ticker.
+    """
+    states = {} if reseed else cache.load_states(provider)
+    batches = {True: ([], [], []), False: ([], [], [])}   # seeded? → (stocks, states, pending)
+    for stock in stocks:
+        ticker = stock["ticker"]
+        df = bars.get(ticker)
+        if df is None or df.empty:
+            continue
+        base, pending = states.get(ticker), _bar_arrays(df)
+        if base is not None and base.bars:
+            days, close = pending[0], pending[3]
+            match = int(np.searchsorted(days, np.datetime64(base.day)))
+            if match == len(days) or days[match] != np.datetime64(base.day) or close[match] != base.closes[-1]:
+                base = None
+            else:
+                pending = tuple(a[match + 1:] for a in pending)
+        if base is None or not base.bars:
+            history = cache.load(provider, ticker)
+            if len(history) >= len(df):
+                pending = _bar_arrays(history)
+            base = IndicatorState()
+        batch = batches[bool(base.bars)]
+        batch[0].append(stock)
+        batch[1].append(base)
+        batch[2].append(pending)
+
+    saved, analyzed, columns = {}, [], []
+    for batch_stocks, batch_states, pending in batches.values():
+        if not batch_stocks:
+            continue
+        new_states, inputs = advance_states(batch_states, pending)
+        saved.update((s["ticker"], st) for s, st in zip(batch_stocks, new_states))
+        usable = inputs[-1] >= EMA_SLOW + 5
+        analyzed += [s for s, ok in zip(batch_stocks, usable) if ok]
+        columns.append([x[usable] for x in inputs[:-1]])
+
+    cache.save_states(provider, saved)
+    order = {s["ticker"]: i for i, s in enumerate(stocks)}
+    rank = np.argsort([order[s["ticker"]] for s in analyzed], kind="stable")
+    analyzed = [analyzed[i] for i in rank]
+    inputs = [np.concatenate(c)[rank] for c in zip(*columns)] if columns else [()] * 11
+    mtf = mtf_alignment([bars[s["ticker"]] for s in analyzed], _intraday_frames(intraday, analyzed), strategy)
+    return build_signals(analyzed, account_size, *inputs, strategy, mtf)
+
+
+def analyze_scan(bars, stocks, account_size, client, strategy=DEFAULT_STRATEGY, reseed=False,
+                 intraday=None):
+    """Signals for `stocks` (SPY excluded) and SPY's own signal.
+
+    Uses the persisted indicator state when the bar cache is on and the
+    strategy keeps the default indicator periods, analyze_universe otherwise.
+    """
+    periods = (strategy.ema_fast, strategy.ema_mid, strategy.ema_slow, strategy.rsi_period)
+    if isinstance(client, CachedClient) and periods == (EMA_FAST, EMA_MID, EMA_SLOW, RSI_PERIOD):
+        signals = analyze_incremental(bars, stocks + [SPY_INFO], account_size, client.cache,
+                                      client.PROVIDER, reseed=reseed, strategy=strategy, intraday=intraday)
+        is_spy = signals.column("ticker") == SPY_TICKER
+        return signals.where(~is_spy), next(iter(signals.where(is_spy)), None)
+    signals = analyze_universe(bars, stocks, account_size, strategy, intraday)
+    spy = analyze_universe(bars, [SPY_INFO], account_size, strategy, intraday)
+    return signals, next(iter(spy), None)
+
+
 def determine_regime(signals, spy_signal=None):
-    bull_count = sum(1 for s in signals if s.signal_strength > 0)
-    bear_count = sum(1 for s in signals if s.signal_strength < 0)
-    neutral_count = sum(1 for s in signals if s.signal_strength == 0)
-    avg_rsi = sum(s.rsi for s in signals) / len(signals) if signals else 50
-    actionable = sum(1 for s in signals if abs(s.signal_strength) >= 4)
+    signals = SignalTable.of(signals)
+    strength = signals.column("signal_strength")
+    weight = signals.column("weight")
+    bullish = strength > 0
+    bull_count = int(bullish.sum())
+    bear_count = int((strength < 0).sum())
+    neutral_count = int((strength == 0).sum())
+    avg_rsi = float(signals.column("rsi").mean()) if signals else 50
+    actionable = int((np.abs(strength) >= 4).sum())
     bull_pct = (bull_count / len(signals)) * 100 if signals else 0
     spy_above_21 = spy_signal.current_price > spy_signal.ema21 if spy_signal else None
+    total_weight = float(weight.sum())
+    weighted_bull = (round(float(weight[bullish].sum()) / total_weight * 100, 1)
+                     if total_weight > 0 else None)
 
     if bull_pct > 70:
         regime, mult = "STRONG UPTREND", 1.5
@@ -504,27 +2057,228 @@ def determine_regime(signals, spy_signal=None):
         neutral_count=neutral_count, avg_rsi=round(avg_rsi, 1),
         actionable_count=actionable, sizing_advice=sizing,
         description=desc, regime_multiplier=mult, spy_above_21ema=spy_above_21,
+        weighted_bull_pct=weighted_bull,
     )
 
 
+# ─── ALLOCATOR ──────────────────────────────────────────────────────────────────
+#
+# Splitting capital pro rata by conviction across the top max_positions names
+# routinely bought five Tech stocks that move as one. The allocator picks buys
+# in conviction order but skips a name too correlated with a holding or an
+# earlier pick, or whose sector is full. It then sizes the picks so each adds
+# risk in proportion to its conviction (risk parity with conviction as the
+# budget), under per-sector dollar caps and an optional volatility target.
+# Only the tickers being sized are sliced out of one returns matrix, so a
+# 500-ticker scan allocates in milliseconds.
+
+class RiskModel:
+    """Daily log returns for a universe (sessions × tickers, NaN where a ticker
+    has no bar) and their rolling covariance over the `window` sessions
+    ending at row `end` (default: the latest).
+
+    A scan builds one from its bars and shares it across accounts, the
+    daemon keeps one per session, and the backtester builds one over the
+    whole history and moves `end` day by day with as_of().
+    """
+
+    def __init__(self, tickers, returns, end=None, window=COV_WINDOW):
+        self.tickers = list(tickers)
+        self.index = {t: j for j, t in enumerate(self.tickers)}
+        self.returns = returns
+        self.end = len(returns) - 1 if end is None else end
+        self.window = window
+
+    @classmethod
+    def from_bars(cls, bars, window=COV_WINDOW):
+        """{ticker: DataFrame} → model over the last `window` returns (frames
+        right-aligned on their latest bar, like compute_indicators)."""
+        tickers = [t for t, df in bars.items() if len(df) > 1]
+        close = stack_columns([bars[t] for t in tickers], "close")[-(window + 1):]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return cls(tickers, np.diff(np.log(close), axis=0), window=window)
+
+    def as_of(self, end):
+        """The same returns, with the window ending at row `end`."""
+        view = object.__new__(RiskModel)
+        view.__dict__.update(self.__dict__, end=end)
+        return view
+
+    def covariance(self, tickers):
+        """Daily return covariance of `tickers`, pairwise over the sessions both
+        traded. A ticker with fewer than COV_MIN_RETURNS returns in the window
+        gets the median variance of the rest and no correlation."""
+        cols = np.array([self.index.get(t, -1) for t in tickers], dtype=np.intp)
+        x = self.returns[max(0, self.end + 1 - self.window):self.end + 1][:, np.maximum(cols, 0)]
+        valid = ~np.isnan(x) & (cols >= 0)
+        n = valid.sum(axis=0)
+        mean = np.where(valid, x, 0.0).sum(axis=0) / np.maximum(n, 1)
+        dev = np.where(valid, x - mean, 0.0)
+        pairs = valid.T.astype(float) @ valid
+        cov = (dev.T @ dev) / np.maximum(pairs - 1, 1)
+        unknown = np.flatnonzero(n < COV_MIN_RETURNS)
+        if len(unknown):
+            known = np.diag(cov)[n >= COV_MIN_RETURNS]
+            cov[unknown] = 0.0
+            cov[:, unknown] = 0.0
+            cov[unknown, unknown] = np.median(known) if len(known) else 0.02 ** 2
+        return cov
+
+
+def risk_budget_weights(cov, budgets, sweeps=100, tol=1e-10):
+    """Weights summing to 1 whose risk contributions w_i·(Σw)_i are in
+    proportion to `budgets` (equal budgets: risk parity).
+
+    Cyclical coordinate descent on ½·wᵀΣw − Σ b_i·ln(w_i), which converges
+    for any positive-definite Σ (Griveau-Billion, Richard & Roncalli, 2013).
+    """
+    b = budgets / budgets.sum()
+    var = np.maximum(np.diag(cov), 1e-12)
+    w = b / np.sqrt(var)   # inverse-volatility start
+    for _ in range(sweeps):
+        prev = w.copy()
+        for i in range(len(w)):
+            c = cov[i] @ w - cov[i, i] * w[i]
+            w[i] = (-c + np.sqrt(c * c + 4 * var[i] * b[i])) / (2 * var[i])
+        if np.abs(w - prev).max() <= tol * w.max():
+            break
+    return w / w.sum()
+
+
+def allocate_buys(candidates, slots, available, account_size, risk, strategy=DEFAULT_STRATEGY, held=()):
+    """Choose and size up to `slots` new buys.
+
+    candidates: BUY-or-better signals not already held. held: (ticker,
+    sector, dollars) for the positions being kept. Returns (SignalTable of
+    picks in conviction order, dollars per pick).
+    """
+    pool = candidates.sort("conviction_score", descending=True)
+    if not pool or slots <= 0:
+        return pool[:0], np.zeros(0)
+    h = len(held)
+    cov = risk.covariance([t for t, _, _ in held] + pool.column("ticker").tolist())
+    sd = np.sqrt(np.maximum(np.diag(cov), 1e-12))
+    corr = cov / sd[:, None] / sd
+
+    # Greedy picks: no more than max_sector_pct of the slots in one sector,
+    # nothing over max_correlation with what is held or already picked
+    sectors = pool.column("sector")
+    per_sector = max(1, int(strategy.max_sector_pct * strategy.max_positions + 1e-9))
+    count = {}
+    for _, sector, _ in held:
+        count[sector] = count.get(sector, 0) + 1
+    chosen = list(range(h))
+    for i in range(len(pool)):
+        if len(chosen) - h == slots:
+            break
+        if count.get(sectors[i], 0) >= per_sector:
+            continue
+        if chosen and corr[h + i, chosen].max() > strategy.max_correlation:
+            continue
+        chosen.append(h + i)
+        count[sectors[i]] = count.get(sectors[i], 0) + 1
+    picks = np.array(chosen[h:], dtype=np.intp) - h
+    if not len(picks):
+        return pool[:0], np.zeros(0)
+
+    sub = cov[np.ix_(chosen, chosen)]
+    budgets = np.maximum(pool.column("conviction_score")[picks], 1.0)
+    # 60 sessions can't pin down more than ~60 names' covariance; shrinking
+    # it toward the diagonal keeps the risk-budget solve well posed
+    shrunk = sub[h:, h:] * (1 - COV_SHRINK)
+    np.fill_diagonal(shrunk, np.diag(sub)[h:])
+    dollars = available * risk_budget_weights(shrunk, budgets)
+
+    # Sector caps: trim sectors over max_sector_pct of the account (counting
+    # what is already held there) and hand the excess to the others
+    names, inv = np.unique(sectors[picks], return_inverse=True)
+    held_dollars = dict.fromkeys(names, 0.0)
+    for _, sector, amount in held:
+        if sector in held_dollars:
+            held_dollars[sector] += amount
+    room = np.maximum(strategy.max_sector_pct * account_size - np.array(list(held_dollars.values())), 0.0)
+    capped = np.zeros(len(names), dtype=bool)
+    for _ in range(len(names)):
+        total = np.bincount(inv, dollars, len(names))
+        over = ~capped & (total > room + 0.005)
+        if not over.any():
+            break
+        excess = (total - room)[over].sum()
+        dollars = dollars * np.where(over, room / np.where(over, total, 1.0), 1.0)[inv]
+        capped |= over
+        free = ~capped[inv]
+        if not free.any() or not dollars[free].sum():
+            break
+        dollars[free] += excess * dollars[free] / dollars[free].sum()
+
+    # Volatility target: scale the new buys so held + new stays under it
+    if strategy.vol_target > 0:
+        held_vec = np.array([amount for _, _, amount in held] + [0.0] * len(picks))
+        new_vec = np.concatenate([np.zeros(h), dollars])
+        a, b, c = new_vec @ sub @ new_vec, new_vec @ sub @ held_vec, held_vec @ sub @ held_vec
+        limit = (strategy.vol_target * account_size) ** 2 / 252
+        if a > 0 and a + 2 * b + c > limit:
+            scale = (-b + np.sqrt(max(b * b - a * (c - limit), 0.0))) / a if c < limit else 0.0
+            dollars = dollars * min(max(scale, 0.0), 1.0)
+    return pool[picks], dollars
+
+
 # ─── ORDER BOOK GENERATOR ───────────────────────────────────────────────────────
 
-def generate_orders(signals, regime, account_size):
+class ScanContext:
+    """What generate_orders and format_order_book share for one scan: the
+    signal table, a ticker → row index over it, and the open positions, so
+    portfolio.json is read once and each position is found in O(1).
+
+    positions defaults to load_positions(); the backtester passes its book.
+    With a RiskModel as `risk`, new buys go through allocate_buys instead of
+    the pro-rata conviction split.
+    """
+
+    def __init__(self, signals, positions=None, risk=None):
+        self.signals = SignalTable.of(signals)
+        self.positions = load_positions() if positions is None else positions
+        self.risk = risk
+        tickers = self.signals.column("ticker").tolist()
+        # Reversed so the first row wins if a ticker appears twice
+        self.index = dict(zip(reversed(tickers), range(len(tickers) - 1, -1, -1)))
+
+    def signal(self, ticker):
+        row = self.index.get(ticker)
+        return None if row is None else self.signals[row]
+
+    def rows_of(self, tickers):
+        """Boolean column marking the rows of `tickers` (unknown ones ignored)."""
+        mask = np.zeros(len(self.signals), dtype=bool)
+        mask[[self.index[t] for t in tickers if t in self.index]] = True
+        return mask
+
+
+def generate_orders(signals, regime, account_size, positions=None, strategy=DEFAULT_STRATEGY,
+                    context=None, risk=None):
     """
     The brain — generates explicit BUY/SELL/MANAGE orders.
 
+    positions defaults to the open positions in portfolio.json (load_positions
+    format); the backtester passes its simulated book instead. risk is a
+    RiskModel for correlation- and sector-aware sizing (allocate_buys);
+    without one, capital is split pro rata by conviction. Pass a ScanContext
+    as `context` to reuse its positions and ticker index (it then supplies
+    signals, positions and risk).
+
     Returns:
         buy_orders:    New positions to open with $ amounts and portfolio %
         sell_orders:   Positions to close
         manage_orders: Existing positions to adjust
     """
     buy_orders, sell_orders, manage_orders = [], [], []
-    positions = load_positions()
+    ctx = context or ScanContext(signals, positions, risk)
+    signals, positions = ctx.signals, ctx.positions
 
     # ── 1. CHECK EXISTING POSITIONS ──
     for ticker, pos in positions.items():
-        sig = next((s for s in signals if s.ticker == ticker), None)
-        if not sig:
+        sig = ctx.signal(ticker)
+        if sig is None:
             continue
 
         direction = pos["direction"]
@@ -596,30 +2350,35 @@ def generate_orders(signals, regime, account_size):
             ))
 
     # ── 2. NEW BUY ORDERS ──
-    exit_tickers = {o.ticker for o in sell_orders}
-    open_tickers = set(positions.keys()) - exit_tickers
-    candidates = [
-        s for s in signals
-        if s.signal_strength >= 3
-        and s.ticker not in open_tickers
-        and s.ticker not in exit_tickers
-    ]
-    candidates.sort(key=lambda s: s.conviction_score, reverse=True)
+    # Tickers held now (being kept or exited today) are never bought again
+    held_mask = ctx.rows_of(positions)
+    candidates = signals.where((signals.column("signal_strength") >= 3) & ~held_mask)
 
     keeping = len(positions) - len(sell_orders)
-    open_slots = max(0, MAX_POSITIONS - keeping)
-    to_buy = candidates[:open_slots]
+    open_slots = max(0, strategy.max_positions - keeping)
 
-    if to_buy:
-        total_conviction = sum(s.conviction_score for s in to_buy) or 1
+    # Capital available, adjusted by regime
+    available = account_size * regime.regime_multiplier
+    available = min(available, account_size * strategy.max_portfolio_risk / strategy.risk_pct)
 
-        # Capital available, adjusted by regime
-        available = account_size * regime.regime_multiplier
-        available = min(available, account_size * MAX_PORTFOLIO_RISK / RISK_PCT)
+    if ctx.risk is None:
+        to_buy = candidates.top("conviction_score", open_slots)
+        conviction = to_buy.column("conviction_score")
+        allocations = available * (conviction / (float(conviction.sum()) or 1))
+    else:
+        selling = {o.ticker for o in sell_orders}
+        held_rows = []
+        for ticker, pos in positions.items():
+            if ticker in selling:
+                continue
+            sig = ctx.signal(ticker)
+            price = sig.current_price if sig is not None else pos["entry_price"]
+            held_rows.append((ticker, sig.sector if sig is not None else "", pos["shares"] * price))
+        to_buy, allocations = allocate_buys(candidates, open_slots, available, account_size,
+                                            ctx.risk, strategy, held_rows)
 
-        for priority, sig in enumerate(to_buy, start=1):
-            raw_pct = sig.conviction_score / total_conviction
-            dollar_alloc = available * raw_pct
+    if to_buy:
+        for priority, (sig, dollar_alloc) in enumerate(zip(to_buy, allocations), start=1):
 
             # Dollar-based allocation with fractional shares (Robinhood supports this)
             shares = round(dollar_alloc / sig.current_price, 2) if sig.current_price > 0 else 0
@@ -649,15 +2408,15 @@ def generate_orders(signals, regime, account_size):
 # ─── OUTPUT FORMATTING ──────────────────────────────────────────────────────────
 
 def format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
-                      account_size, weekly=False):
+                      account_size, weekly=False, now=None, context=None, label="Account"):
     L = []
-    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    now = (now or datetime.now()).strftime("%Y-%m-%d %H:%M")
     mode = "WEEKLY REVIEW" if weekly else "DAILY ORDER BOOK"
 
     L.append("")
     L.append("█" * 72)
     L.append(f"  ◈ SPY MOMENTUM SCANNER — {mode}")
-    L.append(f"  {now}  |  Account: ${account_size:,}")
+    L.append(f"  {now}  |  {label}: ${account_size:,}")
     L.append("█" * 72)
 
     # Regime
@@ -665,6 +2424,8 @@ def format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
     L.append(f"  REGIME: {regime.regime}  (sizing: {regime.regime_multiplier}x)")
     L.append(f"  {regime.description}")
     L.append(f"  Bull: {regime.bull_count} | Bear: {regime.bear_count} | Neutral: {regime.neutral_count} | RSI: {regime.avg_rsi}")
+    if regime.weighted_bull_pct is not None:
+        L.append(f"  Breadth: {regime.weighted_bull_pct:.1f}% of index weight bullish")
     spy = f" | SPY {'ABOVE' if regime.spy_above_21ema else 'BELOW'} 21 EMA" if regime.spy_above_21ema is not None else ""
     L.append(f"  → {regime.sizing_advice}{spy}")
 
@@ -740,8 +2501,11 @@ def format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
         L.append("  No actionable setups. 80% of profits come from 20% of trades.")
         L.append("  Patience IS the strategy.")
 
+    ctx = context or ScanContext(signals)
+    signals = ctx.signals
+
     # ── OPEN POSITIONS ──
-    positions = load_positions()
+    positions = ctx.positions
     if positions:
         L.append("")
         L.append("─" * 72)
@@ -750,7 +2514,7 @@ def format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
         L.append(f"  {'TICKER':<8}{'ENTRY':>9}{'NOW':>9}{'P&L':>9}{'STOP':>9}{'TARGET':>9}{'DIR':>7}")
         L.append("  " + "─" * 60)
         for t, p in positions.items():
-            sig = next((s for s in signals if s.ticker == t), None)
+            sig = ctx.signal(t)
             cur = sig.current_price if sig else p["entry_price"]
             pnl = ((cur - p["entry_price"]) / p["entry_price"]) * 100
             if p["direction"] == "SHORT":
@@ -763,15 +2527,19 @@ def format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
     # ── FULL WATCHLIST ──
     L.append("")
     L.append("─" * 72)
-    L.append("  FULL WATCHLIST (sorted by conviction)")
+    if len(signals) > WATCHLIST_DISPLAY_LIMIT:
+        L.append(f"  TOP {WATCHLIST_DISPLAY_LIMIT} OF {len(signals)} (sorted by conviction)")
+    else:
+        L.append("  FULL WATCHLIST (sorted by conviction)")
     L.append("─" * 72)
-    L.append(f"  {'TICKER':<7}{'PRICE':>8}{'1D':>7}{'5D':>7}{'RSI':>5}{'VOL':>5}{'SCORE':>6}{'SIGNAL':>15}")
-    L.append("  " + "─" * 60)
-    for s in sorted(signals, key=lambda x: x.conviction_score, reverse=True):
+    L.append(f"  {'TICKER':<7}{'PRICE':>8}{'1D':>7}{'5D':>7}{'RSI':>5}{'VOL':>5}{'MTF':>5}{'SCORE':>6}"
+             f"{'SIGNAL':>15}")
+    L.append("  " + "─" * 65)
+    for s in signals.top("conviction_score", WATCHLIST_DISPLAY_LIMIT):
         L.append(
             f"  {s.ticker:<7}${s.current_price:>7.2f}"
             f"{s.change_1d:>+6.1f}%{s.change_5d:>+6.1f}%"
-            f"{s.rsi:>4.0f}{s.vol_ratio:>4.1f}x{s.conviction_score:>5.0f}"
+            f"{s.rsi:>4.0f}{s.vol_ratio:>4.1f}x{s.mtf_alignment:>+5.1f}{s.conviction_score:>5.0f}"
             f"{'  ' + s.signal:>15}"
         )
 
@@ -781,17 +2549,24 @@ def format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
         L.append("─" * 72)
         L.append("  SECTOR ROTATION")
         L.append("─" * 72)
-        sectors = {}
-        for s in signals:
-            sectors.setdefault(s.sector, {"bull": 0, "bear": 0, "total": 0, "chg": []})
-            sectors[s.sector]["total"] += 1
-            sectors[s.sector]["chg"].append(s.change_5d)
-            if s.signal_strength > 0: sectors[s.sector]["bull"] += 1
-            elif s.signal_strength < 0: sectors[s.sector]["bear"] += 1
-        for sec, d in sorted(sectors.items(), key=lambda x: sum(x[1]["chg"])/len(x[1]["chg"]), reverse=True):
-            avg = sum(d["chg"]) / len(d["chg"])
-            st = "LEADING ↑" if d["bull"] > d["bear"] else "LAGGING ↓" if d["bear"] > d["bull"] else "MIXED ↔"
-            L.append(f"  {sec:<12} {d['bull']}/{d['total']} bull  |  5D: {avg:+.2f}%  |  {st}")
+        strength = signals.column("signal_strength")
+        names, first, group = np.unique(signals.column("sector"), return_index=True, return_inverse=True)
+
+        def per_sector(values=None):
+            return np.bincount(group, weights=values, minlength=len(names))
+
+        total = per_sector()
+        bull = per_sector(strength > 0)
+        bear = per_sector(strength < 0)
+        above21 = per_sector(signals.column("current_price") > signals.column("ema21"))
+        avg_chg = per_sector(signals.column("change_5d")) / total
+        width = max(12, max(len(sec) for sec in names))
+        # Strongest 5-day move first; ties keep the order sectors first appear in
+        for k in np.lexsort((first, -avg_chg)):
+            st = "LEADING ↑" if bull[k] > bear[k] else "LAGGING ↓" if bear[k] > bull[k] else "MIXED ↔"
+            above = above21[k] / total[k] * 100
+            L.append(f"  {names[k]:<{width}} {bull[k]:.0f}/{total[k]:.0f} bull  |  >21EMA: {above:3.0f}%  |  "
+                     f"5D: {avg_chg[k]:+.2f}%  |  {st}")
 
     L.append("")
     L.append("█" * 72)
@@ -801,10 +2576,10 @@ def format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
     return "\n".join(L)
 
 
-def format_sms(buy_orders, sell_orders, manage_orders, regime):
+def format_sms(buy_orders, sell_orders, manage_orders, regime, now=None):
     """SMS that tells you exactly what to do."""
     L = []
-    L.append(f"◈ {datetime.now().strftime('%m/%d')} {regime.regime} ({regime.regime_multiplier}x)")
+    L.append(f"◈ {(now or datetime.now()).strftime('%m/%d')} {regime.regime} ({regime.regime_multiplier}x)")
     L.append("")
 
     if sell_orders:
@@ -836,14 +2611,15 @@ def format_sms(buy_orders, sell_orders, manage_orders, regime):
 
 # ─── SMS + LOGGING ───────────────────────────────────────────────────────────────
 
-def send_sms(body):
-    if not all([TWILIO_SID, TWILIO_TOKEN, TWILIO_FROM, ALERT_PHONE]):
+def send_sms(body, to=None):
+    to = to or ALERT_PHONE
+    if not all([TWILIO_SID, TWILIO_TOKEN, TWILIO_FROM, to]):
         log.warning("Twilio not configured. Add creds to .env")
         return False
     try:
         from twilio.rest import Client
         msg = Client(TWILIO_SID, TWILIO_TOKEN).messages.create(
-            body=body, from_=TWILIO_FROM, to=ALERT_PHONE)
+            body=body, from_=TWILIO_FROM, to=to)
         log.info(f"SMS sent: {msg.sid}")
         return True
     except ImportError:
@@ -853,26 +2629,398 @@ def send_sms(body):
     return False
 
 
+def scan_record(signals, regime, buy_orders, sell_orders, manage_orders):
+    """One scan as a dict for scan_format.write — the signal table already
+    column-wise, the order lists row-wise."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "regime": asdict(regime),
+        "signals": SignalTable.of(signals).to_columns(),
+        "buy_orders": [asdict(o) for o in buy_orders],
+        "sell_orders": [asdict(o) for o in sell_orders],
+        "manage_orders": [asdict(o) for o in manage_orders],
+    }
+
+
 def save_scan_log(signals, regime, buy_orders, sell_orders, manage_orders,
                   output_dir=None):
     if output_dir is None:
         output_dir = os.path.join(SCRIPT_DIR, "scan_logs")
-    os.makedirs(output_dir, exist_ok=True)
     fp = os.path.join(output_dir, f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-    with open(fp, "w") as f:
-        json.dump({
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "regime": asdict(regime),
-            "signals": [asdict(s) for s in signals],
-            "buy_orders": [asdict(o) for o in buy_orders],
-            "sell_orders": [asdict(o) for o in sell_orders],
-            "manage_orders": [asdict(o) for o in manage_orders],
-        }, f, indent=2, cls=NumpyEncoder)
+    scan_format.write(fp, scan_record(signals, regime, buy_orders, sell_orders, manage_orders),
+                      cls=NumpyEncoder)
     log.info(f"Log: {fp}")
+    if output_dir == os.path.join(SCRIPT_DIR, "scan_logs"):
+        try:
+            import scan_history
+            scan_history.HistoryStore().import_file(fp)
+        except Exception as e:
+            log.warning(f"Scan history index not updated: {e}")
+
+
+def write_latest_scan(signals, regime, buy_orders, sell_orders, manage_orders, path=None):
+    """Atomically write frontend/data/latest-scan.json (+ .gz/.br) for the PWA,
+    or just the JSON to `path`."""
+    latest_path = path or os.path.join(SCRIPT_DIR, "frontend", "data", "latest-scan.json")
+    scan_format.write(latest_path, scan_record(signals, regime, buy_orders, sell_orders, manage_orders),
+                      cls=NumpyEncoder, precompress=path is None)
+    log.info(f"Frontend data: {latest_path}")
+
+
+def _from_record(cls, record):
+    names = {f.name for f in fields(cls)}
+    return cls(**{k: v for k, v in record.items() if k in names})
+
+
+def load_latest_scan(path=None):
+    """Read latest-scan.json back into the scan's dataclasses.
+
+    Returns (scan time, signals, regime, buy_orders, sell_orders, manage_orders).
+    Needs neither pandas nor the network, so --show-last starts instantly."""
+    path = path or os.path.join(SCRIPT_DIR, "frontend", "data", "latest-scan.json")
+    scan = scan_format.load(path)
+    return (
+        datetime.fromisoformat(scan["timestamp"]).astimezone(),
+        SignalTable.from_records(scan.get("signals", [])),
+        _from_record(MarketRegime, scan["regime"]),
+        *([_from_record(Order, o) for o in scan.get(key, [])]
+          for key in ("buy_orders", "sell_orders", "manage_orders")),
+    )
+
+
+# ─── ACCOUNTS ────────────────────────────────────────────────────────────────────
+#
+# --accounts runs several accounts off one fetch. Signals depend on the account
+# only through position_size, so the universe is analyzed once per distinct
+# signal strategy and each account gets a re-sized view of that table. Order
+# generation, the order book, SMS and JSON output then run per account.
+
+@dataclass
+class AccountProfile:
+    name: str
+    account: int
+    strategy: StrategyConfig = DEFAULT_STRATEGY
+    portfolio: str = PORTFOLIO_JOURNAL   # journal; the JSON export sits beside it
+    export: str = PORTFOLIO_FILE
+    phone: str = ""                      # SMS recipient (default ALERT_PHONE_NUMBER)
+
+    def store(self):
+        return portfolio_store.PortfolioStore(self.portfolio, self.export)
+
+    def output_dir(self):
+        return os.path.join(SCRIPT_DIR, "accounts", self.name)
+
+
+def load_account_profiles(path):
+    """Read --accounts profiles: a JSON list (see accounts.example.json).
+
+    Each entry has a name and an account size. It may also have `portfolio`
+    (a journal path relative to the script directory; default: the main
+    portfolio.jsonl), `phone`, and any StrategyConfig field (risk_pct,
+    max_positions, vol_surge, ...). The first profile is the dashboard
+    account: it writes latest-scan.json and scan_logs/ like a single run.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("expected a non-empty JSON list of account profiles")
+    tunable = {f.name for f in fields(StrategyConfig)}
+    profiles, seen = [], set()
+    for n, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"profile {n} is not an object")
+        name = str(entry.get("name", "")).strip()
+        if not name or not all(c.isalnum() or c in "-_" for c in name):
+            raise ValueError(f"profile {n}: name must be letters, digits, '-' or '_'")
+        if name in seen:
+            raise ValueError(f"duplicate profile name {name!r}")
+        seen.add(name)
+        unknown = set(entry) - tunable - {"name", "account", "portfolio", "phone"}
+        if unknown:
+            raise ValueError(f"{name}: unknown key(s) {', '.join(sorted(unknown))}")
+        account = entry.get("account")
+        if isinstance(account, bool) or not isinstance(account, (int, float)) or account <= 0:
+            raise ValueError(f"{name}: account must be a positive number")
+        overrides = {k: v for k, v in entry.items() if k in tunable}
+        for k, v in overrides.items():
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                raise ValueError(f"{name}: {k} must be a number")
+        profile = AccountProfile(name, int(account), replace(DEFAULT_STRATEGY, **overrides),
+                                 phone=str(entry.get("phone", "")))
+        if entry.get("portfolio"):
+            profile.portfolio = os.path.join(SCRIPT_DIR, entry["portfolio"])
+            profile.export = os.path.splitext(profile.portfolio)[0] + ".json"
+        profiles.append(profile)
+    return profiles
+
+
+def signal_key(strategy):
+    """The part of a StrategyConfig that changes signals rather than sizing."""
+    sizing = {f: getattr(DEFAULT_STRATEGY, f) for f in
+              ("risk_pct", "max_portfolio_risk", "max_positions", "max_correlation", "max_sector_pct", "vol_target")}
+    return astuple(replace(strategy, **sizing))
+
+
+def run_account(profile, signals, regime, args, primary=False, risk=None):
+    """Orders, order book, SMS and JSON for one account → (report, sms or None)."""
+    signals = signals.for_account(profile.account, profile.strategy.risk_pct)
+    context = ScanContext(signals, load_positions(profile.store()), risk)
+    buys, sells, manage = generate_orders(signals, regime, profile.account,
+                                          strategy=profile.strategy, context=context)
+    log.info(f"[{profile.name}] BUY: {len(buys)} | SELL: {len(sells)} | MANAGE: {len(manage)}")
+    report = format_order_book(buys, sells, manage, signals, regime, profile.account, args.weekly,
+                               context=context, label=f"Account {profile.name}")
+    sms = None
+    if args.sms:
+        sms = f"[{profile.name}] " + format_sms(buys, sells, manage, regime)
+        send_sms(sms, to=profile.phone)
+    if primary:
+        if args.json:
+            save_scan_log(signals, regime, buys, sells, manage)
+        write_latest_scan(signals, regime, buys, sells, manage)
+    else:
+        out = profile.output_dir()
+        if args.json:
+            save_scan_log(signals, regime, buys, sells, manage, output_dir=os.path.join(out, "scan_logs"))
+        write_latest_scan(signals, regime, buys, sells, manage, path=os.path.join(out, "latest-scan.json"))
+    return report, sms
+
+
+def run_accounts(profiles, bars, stocks, client, args, intraday=None):
+    """Analyze once per signal strategy, then fan the accounts out in parallel.
+    Returns [(report, sms)] in profile order."""
+    analyses = {}
+    with PROFILE.stage("analyze"):
+        for p in profiles:
+            key = signal_key(p.strategy)
+            if key not in analyses:
+                analyses[key] = analyze_scan(bars, stocks, p.account, client, p.strategy,
+                                             reseed=args.refresh_cache, intraday=intraday)
+    if not any(signals for signals, _ in analyses.values()):
+        log.error("No data. Check API.")
+        sys.exit(1)
+    with PROFILE.stage("regime"):
+        regimes = {key: determine_regime(signals, spy_sig) for key, (signals, spy_sig) in analyses.items()}
+    for key, regime in regimes.items():
+        log.info(f"Regime: {regime.regime} ({len(analyses[key][0])} signals)")
+
+    with PROFILE.stage("accounts"), ThreadPoolExecutor(max_workers=len(profiles)) as pool:
+        risk = RiskModel.from_bars(bars)
+        futures = [pool.submit(run_account, p, analyses[signal_key(p.strategy)][0],
+                               regimes[signal_key(p.strategy)], args, primary=(i == 0), risk=risk)
+                   for i, p in enumerate(profiles)]
+        return [f.result() for f in futures]
+
+
+# ─── DAEMON ──────────────────────────────────────────────────────────────────────
+
+def _order_key(o):
+    """An order's identity across polls. Shares, stop and target follow the
+    live price, so they stay out of it (see _order_moved)."""
+    return (o.action, o.ticker)
+
+
+def _order_moved(old, new, tolerance=DAEMON_ALERT_MOVE):
+    """True when the stop or target has moved more than `tolerance` (relative)
+    since the order was last alerted."""
+    return any(abs(b - a) > tolerance * abs(a)
+               for a, b in ((old.stop_loss, new.stop_loss), (old.target, new.target)))
+
+
+class LiveScanner:
+    """Long-running intraday scanner (--daemon).
+
+    Daily history is reduced once to each ticker's IndicatorState through the
+    last completed session and kept in memory, along with its weekly closes.
+    Every poll fetches one intraday bar per ticker and folds it into a copy of
+    that state — O(1) per ticker — and into the current week's close, then
+    re-runs the regime and order logic. An order goes out by SMS when its
+    action is new for that ticker, or when its stop or target has moved more
+    than DAEMON_ALERT_MOVE since it was last sent — price ticks alone never
+    re-alert. latest-scan.json is rewritten on the same changes or when a
+    signal changes. A new session re-bootstraps.
+    """
+
+    def __init__(self, client, stocks, account_size, sms=False, quiet=False, workers=None):
+        self.client = client
+        self.source = getattr(client, "client", client)  # raw client for intraday quotes
+        self.stocks = stocks + [SPY_INFO]
+        self.account_size = account_size
+        self.sms = sms
+        self.quiet = quiet
+        self.workers = workers
+        self.base = {}
+        self.weekly = {}   # ticker → (week keys, weekly closes) through the last session
+        self.session_day = None
+        self.last_orders = {}   # _order_key → the order as last alerted
+        self.last_signals = None
+
+    def bootstrap(self):
+        today = datetime.now(MARKET_TZ).strftime("%Y-%m-%d")
+        bars = fetch_all_bars(self.client, [s["ticker"] for s in self.stocks], self.workers)
+        self.base, self.weekly = {}, {}
+        for ticker, df in bars.items():
+            if df.empty:
+                continue
+            past = df[df["date"].dt.strftime("%Y-%m-%d") < today]
+            keys = week_keys(past["date"].values)
+            self.weekly[ticker] = (keys, resample_close(past["close"].to_numpy(dtype=float), keys))
+            history = df
+            if isinstance(self.client, CachedClient):
+                full = self.client.cache.load(self.client.PROVIDER, ticker)
+                if len(full) >= len(df):
+                    history = full
+            state = IndicatorState()
+            for row in _bar_rows(history):
+                if row[0] >= today:
+                    break  # today's bar comes from intraday polls
+                state.advance(*row)
+            self.base[ticker] = state
+        self.risk = RiskModel.from_bars(bars)
+        self.session_day = today
+        log.info(f"Daemon: {len(self.base)} tickers loaded for {today}")
+
+    def poll(self):
+        if datetime.now(MARKET_TZ).strftime("%Y-%m-%d") != self.session_day:
+            self.bootstrap()
+        today = self.session_day
+        quotes = {}
+        if market_open():
+            quotes = fetch_each(self.source, list(self.base), self.source.get_intraday_bar, self.workers)
+
+        this_week = week_keys(np.datetime64(today))
+        analyzed, inputs, weekly = [], [], []
+        for stock in self.stocks:
+            base = self.base.get(stock["ticker"])
+            if base is None:
+                continue
+            current = base.copy()
+            keys, closes = self.weekly[stock["ticker"]]
+            bar = quotes.get(stock["ticker"])
+            if bar:
+                current.advance(today, bar["high"], bar["low"], bar["close"], bar["volume"])
+                week_so_far = closes[:-1] if len(keys) and keys[-1] == this_week else closes
+                closes = np.append(week_so_far, bar["close"])
+            if current.bars < EMA_SLOW + 5:
+                continue
+            analyzed.append(stock)
+            inputs.append(current.signal_inputs())
+            weekly.append(closes)
+
+        mtf = mean_vote(timeframe_votes([weekly]))
+        signals = build_signals(analyzed, self.account_size, *_transpose(inputs, 11), mtf=mtf)
+        is_spy = signals.column("ticker") == SPY_TICKER
+        spy_sig = next(iter(signals.where(is_spy)), None)
+        signals = signals.where(~is_spy)
+        if not signals:
+            log.error("Daemon: no data this poll")
+            return
+        regime = determine_regime(signals, spy_sig)
+        buys, sells, manage = generate_orders(signals, regime, self.account_size, risk=self.risk)
+
+        current = {}
+        for o in buys + sells + manage:
+            sent = self.last_orders.get(_order_key(o))
+            current[_order_key(o)] = o if sent is None or _order_moved(sent, o) else sent
+        new_buys, new_sells, new_manage = (
+            [o for o in orders if current[_order_key(o)] is o]
+            for orders in (buys, sells, manage))
+        signal_view = {(s.ticker, s.signal) for s in signals}
+        if (new_buys or new_sells or new_manage or current.keys() != self.last_orders.keys()
+                or signal_view != self.last_signals):
+            write_latest_scan(signals, regime, buys, sells, manage)
+        if new_buys or new_sells or new_manage:
+            log.info(f"Daemon: {len(new_buys)} new BUY | {len(new_sells)} new SELL | {len(new_manage)} new MANAGE")
+            sms = format_sms(new_buys, new_sells, new_manage, regime)
+            if not self.quiet:
+                print(sms + "\n")
+            if self.sms:
+                send_sms(sms)
+        self.last_orders = current
+        self.last_signals = signal_view
+
+    def run(self, interval=DAEMON_INTERVAL):
+        self.bootstrap()
+        while True:
+            started = time.monotonic()
+            try:
+                self.poll()
+            except Exception as e:
+                log.error(f"Daemon poll failed: {type(e).__name__}: {e}")
+            time.sleep(max(1.0, interval - (time.monotonic() - started)))
 
 
 # ─── MAIN ────────────────────────────────────────────────────────────────────────
 
+def record_executions(buy_orders, sell_orders):
+    """Ask which orders were executed and record them in the portfolio journal."""
+    if not (buy_orders or sell_orders):
+        return
+    print("\n📝 Record executed orders:")
+    bought = [o for o in buy_orders
+              if input(f"  Executed {o.action} {o.ticker} {o.shares}sh? (y/n): ").strip().lower() == "y"]
+    sold = [o for o in sell_orders
+            if input(f"  Closed {o.ticker}? (y/n): ").strip().lower() == "y"]
+    if not (bought or sold):
+        return
+    # One locked transaction once the answers are in, so the lock isn't held while prompting
+    with open_portfolio().transaction() as tx:
+        for o in bought:
+            tx.open(o.ticker, o.price, o.shares, o.stop_loss, o.target)
+            print(f"    ✓ {o.ticker} recorded")
+        for o in sold:
+            if tx.position(o.ticker) is None:
+                print(f"    ✗ {o.ticker} is not an open position")
+                continue
+            closed = tx.close(o.ticker, o.price)
+            print(f"    ✓ {o.ticker} closed, P&L ${closed['pnl']:+.2f}")
+
+
+def show_last(args):
+    """--show-last: reprint the saved scan (and SMS) without fetching anything."""
+    try:
+        scanned, signals, regime, buy_orders, sell_orders, manage_orders = load_latest_scan()
+    except (OSError, ValueError, KeyError) as e:
+        log.error(f"No saved scan to show: {e}")
+        sys.exit(1)
+    if not args.quiet:
+        print(format_order_book(buy_orders, sell_orders, manage_orders, signals, regime,
+                                args.account, args.weekly, now=scanned))
+    if args.sms:
+        sms = format_sms(buy_orders, sell_orders, manage_orders, regime, now=scanned)
+        if not args.quiet:
+            print("\n--- SMS PREVIEW ---")
+            print(sms)
+            print("--- END SMS ---\n")
+        send_sms(sms)
+    if args.record:
+        record_executions(buy_orders, sell_orders)
+
+
+def _log_fetch_stats(client, registry):
+    if isinstance(client, CachedClient):
+        log.info(f"Bar cache: {client.hits} hit(s), {client.misses} fetch(es)")
+    if any(st.requests or st.skipped for st in registry.stats.values()):
+        log.info("Providers:\n" + registry.format_metrics())
+    if HTTP.timings:
+        log.info("HTTP:\n" + HTTP.format_timings())
+
+
+def _finish_profile(args, cpu_profile):
+    if cpu_profile:
+        cpu_profile.disable()
+        cpu_profile.dump_stats(args.cprofile)
+        log.info(f"cProfile stats: {args.cprofile} (python3 -m pstats {args.cprofile})")
+    if args.profile:
+        print(PROFILE.format_table(), file=sys.stderr)
+        if cpu_profile:
+            import pstats
+            pstats.Stats(cpu_profile, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+    if args.profile_out:
+        PROFILE.write(args.profile_out)
+        log.info(f"Profile: {args.profile_out}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="SPY Momentum Scanner — Daily Order Book")
     parser.add_argument("--sms", action="store_true", help="Send SMS alerts")
@@ -881,100 +3029,208 @@ def main():
     parser.add_argument("--json", action="store_true", help="Save to scan_logs/")
     parser.add_argument("--quiet", action="store_true", help="No console output")
     parser.add_argument("--data-source", choices=["polygon", "yahoo"], default="auto")
+    parser.add_argument("--universe", metavar="FILE",
+                        help="Constituents CSV/JSON (ticker,name,weight,sector) to scan instead of WATCHLIST")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Concurrent fetches (default: per data source, 1 = sequential)")
+    parser.add_argument("--grouped", action="store_true",
+                        help=f"Ingest bars via Polygon grouped-daily (auto for {GROUPED_MIN_TICKERS}+ tickers)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk bar cache")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Re-download the full bar window and rewrite the cache")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running and re-evaluate on intraday quotes, alerting on changed orders")
+    parser.add_argument("--interval", type=int, default=DAEMON_INTERVAL,
+                        help=f"Seconds between --daemon polls (default: {DAEMON_INTERVAL})")
     parser.add_argument("--record", action="store_true",
                         help="After scan, interactively record which orders you executed")
+    parser.add_argument("--no-failover", action="store_true",
+                        help="Use only the chosen data source (no per-ticker fallback)")
+    parser.add_argument("--hedge-after", type=float, default=ProviderRegistry.HEDGE_AFTER, metavar="SECONDS",
+                        help=f"Race the fallback provider after this long (default: "
+                             f"{ProviderRegistry.HEDGE_AFTER}, 0 = off)")
+    parser.add_argument("--history", metavar="TICKER",
+                        help="Print a ticker's logged signals/orders from scan_logs/ and exit")
+    parser.add_argument("--since", default="", metavar="YYYY-MM-DD", help="Start date for --history")
+    parser.add_argument("--show-last", action="store_true",
+                        help="Reprint the last saved scan (frontend/data/latest-scan.json) without fetching")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time each stage and ticker; print a summary table to stderr")
+    parser.add_argument("--profile-out", metavar="FILE",
+                        help="Write profile data as JSON, or Prometheus textfile if FILE ends in .prom")
+    parser.add_argument("--cprofile", metavar="FILE",
+                        help="cProfile the CPU stages (analyze → write) and save pstats to FILE")
+    parser.add_argument("--intraday", action="store_true",
+                        help=f"Also fetch {INTRADAY_MINUTES}m bars so the 1h/{INTRADAY_MINUTES}m trends "
+                             f"count toward conviction (one more request per ticker)")
+    parser.add_argument("--accounts", metavar="FILE",
+                        help="Run every account profile in FILE off one fetch (see accounts.example.json)")
     args = parser.parse_args()
 
+    if args.history:
+        import scan_history
+        store = scan_history.HistoryStore()
+        store.sync()
+        print(scan_history.format_ticker_history(store, args.history, args.since))
+        return
+
     if args.account <= 0:
         parser.error("--account must be a positive integer")
+    profiles = None
+    if args.accounts:
+        if args.daemon or args.record or args.show_last:
+            parser.error("--accounts can't be combined with --daemon, --record or --show-last")
+        try:
+            profiles = load_account_profiles(args.accounts)
+        except (OSError, ValueError) as e:
+            parser.error(f"--accounts: {e}")
+    if args.show_last:
+        show_last(args)
+        return
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.interval < 1:
+        parser.error("--interval must be at least 1 second")
+    if args.hedge_after < 0:
+        parser.error("--hedge-after must be >= 0")
+    if args.daemon and args.intraday:
+        parser.error("--intraday applies to a single scan, not --daemon")
+    if args.daemon and (args.profile or args.profile_out or args.cprofile):
+        parser.error("--profile/--profile-out/--cprofile apply to a single scan, not --daemon")
+    if args.profile or args.profile_out:
+        PROFILE.enable()
 
     if args.data_source == "polygon" or (args.data_source == "auto" and POLYGON_API_KEY):
         if not POLYGON_API_KEY:
             log.error("No POLYGON_API_KEY. Use --data-source yahoo or add to .env")
             sys.exit(1)
-        client = PolygonClient(POLYGON_API_KEY)
+        primary = PolygonClient(POLYGON_API_KEY)
+        fallbacks = [YahooClient()]
         log.info("Data: Polygon.io")
     else:
-        client = YahooClient()
+        primary = YahooClient()
+        fallbacks = [PolygonClient(POLYGON_API_KEY)] if POLYGON_API_KEY else []
         log.info("Data: Yahoo Finance")
+    if args.no_failover:
+        fallbacks = []
+    registry = ProviderRegistry([primary] + fallbacks, hedge_after=args.hedge_after)
+    # One connection per concurrent fetch, plus headroom for hedged requests
+    HTTP.resize(max(HTTP_POOL_SIZE, 2 * (args.workers or primary.MAX_WORKERS)))
+    if fallbacks:
+        log.info(f"Fallback: {', '.join(c.PROVIDER for c in fallbacks)}")
+    client = registry
 
-    account_size = args.account
-    log.info(f"Account: ${account_size:,} | Risk/trade: ${account_size * RISK_PCT:,.0f}")
-
-    signals = []
-    for stock in WATCHLIST:
-        log.info(f"  {stock['ticker']}...")
-        df = client.get_daily_bars(stock["ticker"])
-        client.rate_limit_pause()
-        if df.empty:
-            continue
-        result = analyze_stock(df, stock, account_size)
-        if result:
-            signals.append(result)
-
-    if not signals:
-        log.error("No data. Check API.")
-        sys.exit(1)
-
-    spy_df = client.get_daily_bars(SPY_TICKER)
-    spy_sig = analyze_stock(spy_df, {"ticker": "SPY", "name": "S&P 500", "weight": 100, "sector": "Index"}, account_size) if not spy_df.empty else None
+    try:
+        stocks = WATCHLIST
+        if args.universe:
+            try:
+                stocks = load_universe(args.universe)
+            except (OSError, ValueError) as e:
+                parser.error(f"--universe: {e}")
+            stocks = [s for s in stocks if s["ticker"] != SPY_TICKER]
+            if not stocks:
+                parser.error(f"--universe: no tickers in {args.universe}")
+            log.info(f"Universe: {len(stocks)} tickers from {args.universe}")
+
+        if args.grouped and (args.no_cache or not isinstance(primary, PolygonClient)):
+            parser.error("--grouped needs the Polygon data source and the bar cache")
+        if not args.no_cache:
+            cache = BarCache()
+            if isinstance(primary, PolygonClient) and (args.grouped or len(stocks) >= GROUPED_MIN_TICKERS):
+                with PROFILE.stage("ingest"):
+                    primary.ingest_grouped(cache, refresh=args.refresh_cache)
+                # Grouped ingest already refreshed the window; only fetch tickers it lacks
+                client = CachedClient(client, cache, trust_cache=True)
+            else:
+                client = CachedClient(client, cache, refresh=args.refresh_cache)
+
+        account_size = args.account
+        if profiles:
+            for p in profiles:
+                log.info(f"Account {p.name}: ${p.account:,} | Risk/trade: ${p.account * p.strategy.risk_pct:,.0f}")
+        else:
+            log.info(f"Account: ${account_size:,} | Risk/trade: ${account_size * RISK_PCT:,.0f}")
+
+        if args.daemon:
+            try:
+                LiveScanner(client, stocks, account_size, sms=args.sms, quiet=args.quiet,
+                            workers=args.workers).run(args.interval)
+            except KeyboardInterrupt:
+                log.info("Daemon stopped")
+                log.info("Providers:\n" + registry.format_metrics())
+            return
+
+        tickers = [s["ticker"] for s in stocks] + [SPY_TICKER]
+        with PROFILE.stage("fetch"):
+            bars = fetch_all_bars(client, tickers, args.workers)
+            intraday = fetch_all_intraday(client, tickers, args.workers) if args.intraday else None
+
+        cpu_profile = None
+        if args.cprofile:
+            import cProfile
+            cpu_profile = cProfile.Profile()
+            cpu_profile.enable()
+
+        if profiles:
+            results = run_accounts(profiles, bars, stocks, client, args, intraday)
+            _log_fetch_stats(client, registry)
+            for report, sms in results:
+                if not args.quiet:
+                    print(report)
+                    if sms:
+                        print("\n--- SMS PREVIEW ---")
+                        print(sms)
+                        print("--- END SMS ---\n")
+            _finish_profile(args, cpu_profile)
+            return
+
+        with PROFILE.stage("analyze"):
+            signals, spy_sig = analyze_scan(bars, stocks, account_size, client, reseed=args.refresh_cache,
+                                            intraday=intraday)
+
+        if not signals:
+            log.error("No data. Check API.")
+            sys.exit(1)
 
-    regime = determine_regime(signals, spy_sig)
-    buy_orders, sell_orders, manage_orders = generate_orders(signals, regime, account_size)
+        _log_fetch_stats(client, registry)
 
-    log.info(f"Regime: {regime.regime} | BUY: {len(buy_orders)} | SELL: {len(sell_orders)} | MANAGE: {len(manage_orders)}")
+        with PROFILE.stage("regime"):
+            regime = determine_regime(signals, spy_sig)
+        with PROFILE.stage("orders"):
+            context = ScanContext(signals, risk=RiskModel.from_bars(bars))
+            buy_orders, sell_orders, manage_orders = generate_orders(signals, regime, account_size,
+                                                                     context=context)
 
-    report = format_order_book(buy_orders, sell_orders, manage_orders, signals, regime, account_size, args.weekly)
-    if not args.quiet:
-        print(report)
+        log.info(f"Regime: {regime.regime} | BUY: {len(buy_orders)} | SELL: {len(sell_orders)} | MANAGE: {len(manage_orders)}")
 
-    if args.sms:
-        sms = format_sms(buy_orders, sell_orders, manage_orders, regime)
+        with PROFILE.stage("format"):
+            report = format_order_book(buy_orders, sell_orders, manage_orders, signals, regime, account_size,
+                                       args.weekly, context=context)
         if not args.quiet:
-            print("\n--- SMS PREVIEW ---")
-            print(sms)
-            print("--- END SMS ---\n")
-        send_sms(sms)
-
-    if args.json:
-        save_scan_log(signals, regime, buy_orders, sell_orders, manage_orders)
-
-    # Always write latest-scan.json for the PWA frontend
-    frontend_data_dir = os.path.join(SCRIPT_DIR, "frontend", "data")
-    os.makedirs(frontend_data_dir, exist_ok=True)
-    latest_path = os.path.join(frontend_data_dir, "latest-scan.json")
-    scan_data = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "regime": asdict(regime),
-        "signals": [asdict(s) for s in signals],
-        "buy_orders": [asdict(o) for o in buy_orders],
-        "sell_orders": [asdict(o) for o in sell_orders],
-        "manage_orders": [asdict(o) for o in manage_orders],
-    }
-    fd, tmp_path = tempfile.mkstemp(dir=frontend_data_dir, suffix=".tmp")
-    try:
-        with os.fdopen(fd, "w") as f:
-            json.dump(scan_data, f, indent=2, cls=NumpyEncoder)
-        os.replace(tmp_path, latest_path)
-        log.info(f"Frontend data: {latest_path}")
-    except Exception:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-        raise
-
-    if args.record and (buy_orders or sell_orders):
-        print("\n📝 Record executed orders:")
-        for o in buy_orders:
-            resp = input(f"  Executed {o.action} {o.ticker} {o.shares}sh? (y/n): ").strip().lower()
-            if resp == "y":
-                direction = "LONG"
-                add_position(o.ticker, o.price, o.shares, o.stop_loss, o.target, direction, o.dollar_amount)
-                print(f"    ✓ {o.ticker} recorded")
-        for o in sell_orders:
-            resp = input(f"  Closed {o.ticker}? (y/n): ").strip().lower()
-            if resp == "y":
-                remove_position(o.ticker)
-                print(f"    ✓ {o.ticker} removed")
+            print(report)
+
+        if args.sms:
+            with PROFILE.stage("sms"):
+                sms = format_sms(buy_orders, sell_orders, manage_orders, regime)
+                if not args.quiet:
+                    print("\n--- SMS PREVIEW ---")
+                    print(sms)
+                    print("--- END SMS ---\n")
+                send_sms(sms)
+
+        with PROFILE.stage("write"):
+            if args.json:
+                save_scan_log(signals, regime, buy_orders, sell_orders, manage_orders)
+
+            # Always write latest-scan.json for the PWA frontend
+            write_latest_scan(signals, regime, buy_orders, sell_orders, manage_orders)
+
+        _finish_profile(args, cpu_profile)
+
+        if args.record:
+            record_executions(buy_orders, sell_orders)
+    finally:
+        registry.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+"""
+PortfolioStore's journal: concurrent writers, the portfolio.json export and
+recovery from a half-written last line, each on a journal in a temp dir.
+
+  python3 -m unittest discover tests
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+
+from portfolio_store import PortfolioStore
+
+
+class PortfolioStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.tmp.name, "portfolio.jsonl")
+        self.export_path = os.path.join(self.tmp.name, "data", "portfolio.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def store(self, **kwargs):
+        return PortfolioStore(self.journal, self.export_path, **kwargs)
+
+    def test_concurrent_writers_keep_every_event(self):
+        # Separate stores share only the file lock, like two processes
+        errors = []
+
+        def writer(prefix):
+            store = self.store()
+            try:
+                for i in range(5):
+                    with store.transaction(export=False) as tx:
+                        tx.open(f"{prefix}{i}", 100.0 + i, 1)
+                        time.sleep(0.01)   # hold the lock so the other writer queues up
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(p,)) for p in ("A", "B")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        tickers = sorted(p["ticker"] for p in self.store().load()["positions"])
+        self.assertEqual(tickers, [f"{p}{i}" for p in "AB" for i in range(5)])
+        with open(self.journal) as f:
+            ops = [json.loads(line)["op"] for line in f]
+        self.assertEqual(ops, ["snapshot"] + ["open"] * 10)
+
+    def test_export_round_trip(self):
+        store = self.store()
+        with store.transaction() as tx:
+            tx.open("AAPL", 190.5, 10, stop_loss=180.0)
+            tx.open("MSFT", 410.0, 2)
+        with store.transaction() as tx:
+            closed = tx.close("AAPL", 201.25)
+        self.assertEqual(closed["pnl"], 107.5)
+
+        with open(self.export_path) as f:
+            exported = json.load(f)
+        self.assertEqual(exported, self.store().load())
+        self.assertEqual([p["ticker"] for p in exported["positions"]], ["MSFT"])
+        self.assertEqual([(h["ticker"], h["closePrice"]) for h in exported["history"]], [("AAPL", 201.25)])
+
+        # Compacting to one snapshot, or seeding a new journal from the export, reproduces it
+        store.compact()
+        with open(self.journal) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(self.store().load(), exported)
+        os.remove(self.journal)
+        self.assertEqual(self.store().load(), exported)
+
+    def test_compacts_every_n_events(self):
+        store = self.store(compact_every=3)
+        for i in range(4):
+            with store.transaction(export=False) as tx:
+                tx.open(f"T{i}", 10.0, 1)
+        with open(self.journal) as f:
+            ops = [json.loads(line)["op"] for line in f]
+        self.assertEqual(ops, ["snapshot", "open"])
+        self.assertEqual(len(self.store().load()["positions"]), 4)
+
+    def test_truncated_last_line_is_ignored_then_replaced(self):
+        store = self.store()
+        with store.transaction(export=False) as tx:
+            tx.open("AAPL", 190.5, 10)
+        with open(self.journal, "ab") as f:   # a writer that crashed mid-append
+            f.write(b'{"op":"open","ticker":"TSLA","position":{"ticker":"TS')
+
+        reader = self.store()
+        self.assertEqual([p["ticker"] for p in reader.load()["positions"]], ["AAPL"])
+
+        with reader.transaction(export=False) as tx:
+            tx.open("MSFT", 410.0, 2)
+        with open(self.journal) as f:
+            events = [json.loads(line) for line in f]   # every line parses again
+        self.assertEqual([e["op"] for e in events], ["snapshot", "open", "open"])
+        self.assertEqual([p["ticker"] for p in self.store().load()["positions"]], ["AAPL", "MSFT"])
+
+    def test_failed_transaction_records_nothing(self):
+        store = self.store()
+        with self.assertRaises(ValueError):
+            with store.transaction(export=False) as tx:
+                tx.open("AAPL", 190.5, 10)
+                tx.close("MSFT", 400.0)
+        self.assertFalse(os.path.exists(self.journal))
+        self.assertEqual(store.load()["positions"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
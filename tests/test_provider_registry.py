@@ -0,0 +1,191 @@
+"""
+ProviderRegistry against local stub HTTP servers: retries, failover,
+hedging and the circuit breaker, checked through the registry's stats.
+
+  python3 -m unittest discover tests
+"""
+
+import json
+import time
+import logging
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import spy_momentum_scanner as scanner
+from spy_momentum_scanner import PolygonClient, ProviderRegistry
+
+
+def setUpModule():
+    scanner.log.setLevel(logging.CRITICAL)   # failover/breaker warnings are expected here
+
+
+class StubServer:
+    """Serves Polygon-style daily aggregates on localhost.
+
+    `script` is a list of (status, delay seconds) used one per request; the
+    last entry repeats. Status 200 answers with five bars.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, delay = stub.next_response()
+                time.sleep(delay)
+                body = json.dumps(stub.payload() if status == 200 else {"error": "stub"}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def next_response(self):
+        self.hits += 1
+        return self.script.pop(0) if len(self.script) > 1 else self.script[0]
+
+    @staticmethod
+    def payload():
+        day = 86_400_000
+        start = int(time.time() * 1000) // day * day - 10 * day
+        results = [{"o": 10.0 + i, "h": 11.0 + i, "l": 9.0 + i, "c": 10.5 + i, "v": 1000, "t": start + i * day}
+                   for i in range(5)]
+        return {"resultsCount": len(results), "results": results}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubClient(PolygonClient):
+    RATE_LIMIT = 1000
+    RATE_BURST = 1000
+
+    def __init__(self, name, server):
+        super().__init__("test-key")
+        self.PROVIDER = name
+        self.BASE_URL = server.url
+
+
+class ProviderRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+        self.registries = []
+
+    def tearDown(self):
+        for registry in self.registries:
+            registry.close()
+        for server in self.servers:
+            server.close()
+
+    def registry(self, *scripts, **kwargs):
+        clients = []
+        for i, script in enumerate(scripts):
+            server = StubServer(script)
+            self.servers.append(server)
+            clients.append(StubClient(f"stub{i}", server))
+        kwargs = {"backoff": 0.0, "hedge_after": 0, **kwargs}
+        registry = ProviderRegistry(clients, **kwargs)
+        self.registries.append(registry)
+        return registry
+
+    def test_retries_transient_errors(self):
+        registry = self.registry([(503, 0), (502, 0), (200, 0)], retries=2)
+        df = registry.get_daily_bars("AAA", days=5)
+        self.assertEqual(len(df), 5)
+        st = registry.stats["stub0"]
+        self.assertEqual((st.requests, st.errors, st.retries), (3, 2, 2))
+        self.assertEqual(registry.breakers["stub0"].state, "closed")
+
+    def test_fails_over_on_404_without_retrying(self):
+        registry = self.registry([(404, 0)], [(200, 0)], retries=2)
+        df = registry.get_daily_bars("AAA", days=5)
+        self.assertEqual(len(df), 5)
+        self.assertEqual(df.attrs["provider"], "stub1")
+        primary, fallback = registry.stats["stub0"], registry.stats["stub1"]
+        self.assertEqual((primary.requests, primary.errors, primary.retries), (1, 1, 0))
+        self.assertEqual((fallback.requests, fallback.failovers), (1, 1))
+        # A missing ticker says nothing about the provider's health
+        self.assertEqual(registry.breakers["stub0"].failures, 0)
+
+    def test_hedges_a_slow_provider(self):
+        registry = self.registry([(200, 1.5)], [(200, 0)], hedge_after=0.2)
+        t0 = time.perf_counter()
+        df = registry.get_daily_bars("AAA", days=5)
+        self.assertLess(time.perf_counter() - t0, 1.0)
+        self.assertEqual(df.attrs["provider"], "stub1")
+        fallback = registry.stats["stub1"]
+        self.assertEqual((fallback.hedges, fallback.hedge_wins, fallback.failovers), (1, 1, 0))
+
+    def test_breaker_opens_then_half_opens(self):
+        registry = self.registry([(500, 0)], [(200, 0)], retries=0,
+                                 breaker_threshold=2, breaker_cooldown=0.3)
+        primary, breaker = registry.stats["stub0"], registry.breakers["stub0"]
+        for _ in range(2):
+            self.assertEqual(registry.get_daily_bars("AAA", days=5).attrs["provider"], "stub1")
+        self.assertEqual(breaker.state, "open")
+
+        # While open the primary is skipped without a request
+        self.assertEqual(registry.get_daily_bars("AAA", days=5).attrs["provider"], "stub1")
+        self.assertEqual((primary.requests, primary.skipped), (2, 1))
+
+        # After the cooldown one trial request goes through; a success closes it
+        time.sleep(0.35)
+        self.servers[0].script = [(200, 0)]
+        self.assertEqual(registry.get_daily_bars("AAA", days=5).attrs["provider"], "stub0")
+        self.assertEqual(primary.requests, 3)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_auth_errors_open_the_breaker(self):
+        registry = self.registry([(401, 0)], [(200, 0)], retries=2,
+                                 breaker_threshold=2, breaker_cooldown=60)
+        for _ in range(3):
+            self.assertEqual(registry.get_daily_bars("AAA", days=5).attrs["provider"], "stub1")
+        primary = registry.stats["stub0"]
+        # Not retried, and the third request is skipped outright
+        self.assertEqual((primary.requests, primary.retries, primary.skipped), (2, 0, 1))
+        self.assertEqual(registry.breakers["stub0"].state, "open")
+
+    def test_404s_do_not_reset_failures(self):
+        registry = self.registry([(500, 0), (404, 0), (500, 0)], [(200, 0)], retries=0,
+                                 breaker_threshold=2, breaker_cooldown=60)
+        for _ in range(3):
+            registry.get_daily_bars("AAA", days=5)
+        self.assertEqual(registry.breakers["stub0"].state, "open")
+
+    def test_breaker_allows_one_trial_at_a_time(self):
+        breaker = scanner.CircuitBreaker(threshold=1, cooldown=0.05)
+        breaker.record(False)
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())   # trial in flight
+        breaker.record(False)               # trial failed: open for another cooldown
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state, "open")
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record(None)                # a 404 ends the trial but leaves it open
+        self.assertEqual(breaker.state, "open")
+        self.assertTrue(breaker.allow())
+
+    def test_all_providers_failing_returns_empty(self):
+        registry = self.registry([(500, 0)], [(404, 0)], retries=1)
+        self.assertTrue(registry.get_daily_bars("AAA", days=5).empty)
+        self.assertEqual(registry.stats["stub0"].retries, 1)
+        self.assertEqual(registry.stats["stub1"].errors, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+scan_format on real scans: encode/decode, diffs applied the way the
+frontend's applyScanDiff does, and the precompressed copies. Scans come from
+the benchmark's synthetic bars run through the scanner.
+
+  python3 -m unittest discover tests
+"""
+
+import os
+import json
+import gzip
+import logging
+import tempfile
+import unittest
+
+import scan_format
+import spy_momentum_scanner as scanner
+from benchmark import synthetic_bars, synthetic_stocks
+
+ACCOUNT = 10000
+
+
+def setUpModule():
+    scanner.log.setLevel(logging.CRITICAL)
+
+
+def make_scan(bars, stocks):
+    signals = scanner.analyze_universe(bars, stocks, ACCOUNT)
+    spy = next(iter(scanner.analyze_universe(bars, [scanner.SPY_INFO], ACCOUNT)), None)
+    regime = scanner.determine_regime(signals, spy)
+    positions = {
+        s.ticker: {"entry_price": s.current_price * 0.95, "shares": 10, "stop_loss": s.stop_loss,
+                   "target": s.target_1, "direction": "LONG", "dollar_amount": s.current_price * 9.5,
+                   "entry_date": "2025-12-01"}
+        for s in signals[:3]
+    }
+    orders = scanner.generate_orders(signals, regime, ACCOUNT, positions)
+    return signals, scanner.scan_record(signals, regime, *orders)
+
+
+def as_json(data):
+    """Round trip through the scanner's encoder, as a reader of the file sees it."""
+    return json.loads(json.dumps(data, cls=scanner.NumpyEncoder))
+
+
+def rows(record):
+    """The row-wise scan a reader should get back for a scan_record."""
+    out = dict(record)
+    cols = record["signals"]
+    out["signals"] = [dict(zip(cols, vals)) for vals in zip(*cols.values())]
+    return as_json(out)
+
+
+def apply_diff(scan, diff):
+    """Python port of applyScanDiff in frontend/scan-data.js."""
+    by_ticker = {s["ticker"]: s for s in scan["signals"]}
+    changed = scan_format.decode({"version": 2, "signals": diff["signals"]})["signals"]
+    by_ticker.update((s["ticker"], s) for s in changed)
+    for ticker in diff.get("removed", []):
+        by_ticker.pop(ticker, None)
+    order = diff.get("tickers") or [s["ticker"] for s in scan["signals"]]
+    out = dict(scan, timestamp=diff["to"])
+    out["signals"] = [by_ticker[t] for t in order if t in by_ticker]
+    if diff.get("regime"):
+        out["regime"] = diff["regime"]
+    for key in scan_format.TABLES[1:]:
+        if key in diff:
+            out[key] = scan_format.decode({"version": 2, key: diff[key]})[key]
+    return out
+
+
+class ScanFormatTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.bars = synthetic_bars(12, 120, seed=1)
+        cls.stocks = synthetic_stocks(cls.bars)
+        cls.signals, cls.record = make_scan(cls.bars, cls.stocks)
+
+    def test_encode_decode_round_trip(self):
+        encoded = as_json(scan_format.encode(self.record))
+        self.assertEqual(encoded["version"], scan_format.SCHEMA_VERSION)
+        self.assertIsInstance(encoded["buy_orders"], dict)   # columnar on disk
+        self.assertEqual(scan_format.decode(encoded), rows(self.record))
+        self.assertEqual(scan_format.decode(rows(self.record)), rows(self.record))   # version 1 passes through
+
+    def test_write_then_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "latest-scan.json")
+            scan_format.write(path, self.record, cls=scanner.NumpyEncoder)
+            self.assertEqual(scan_format.load(path), rows(self.record))
+            self.assertEqual(list(scanner.load_latest_scan(path)[1]), list(self.signals))
+
+    def test_diff_reproduces_the_new_scan(self):
+        # Next scan: two tickers get another bar, one drops out, one is new
+        tickers = [s["ticker"] for s in self.stocks]
+        bars = dict(self.bars)
+        for t in tickers[:2]:
+            bars[t] = bars[t].iloc[:-1]
+        old_stocks = [s for s in self.stocks if s["ticker"] != tickers[-1]]
+        new_stocks = [s for s in self.stocks if s["ticker"] != tickers[3]]
+        old = rows(make_scan(bars, old_stocks)[1])
+        new = rows(make_scan(self.bars, new_stocks)[1])
+
+        diff = as_json(scan_format.diff(old, new))
+        self.assertEqual(diff["removed"], [tickers[3]])
+        self.assertLess(len(diff["signals"]["ticker"]), len(new["signals"]))   # unchanged rows are left out
+        self.assertEqual(apply_diff(old, diff), new)
+        self.assertEqual(apply_diff(new, as_json(scan_format.diff(new, new))), new)
+
+    def test_precompressed_copies_match_the_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "latest-scan.json")
+            scan_format.write(path, self.record, cls=scanner.NumpyEncoder, precompress=True)
+            with open(path, "rb") as f:
+                body = f.read()
+            with open(path + ".gz", "rb") as f:
+                self.assertEqual(gzip.decompress(f.read()), body)
+            try:
+                import brotli
+            except ImportError:
+                return
+            with open(path + ".br", "rb") as f:
+                self.assertEqual(brotli.decompress(f.read()), body)
+
+
+if __name__ == "__main__":
+    unittest.main()